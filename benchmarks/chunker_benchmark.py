@@ -0,0 +1,131 @@
+# chunker_benchmark.py
+# Run from the project root: python -m benchmarks.chunker_benchmark [--docs data/documents] [--unit tokens]
+#
+# Compares the in-project RecursiveTextSplitter with LangChain's
+# RecursiveCharacterTextSplitter (needs langchain or langchain-text-splitters
+# installed) on the same texts: throughput and whether the chunks are identical.
+
+import argparse
+import json
+import os
+import random
+import time
+
+from unstructured.embedder import CHUNK_SIZES, get_splitter
+from unstructured.model_registry import EMBED_MODEL, get_tokenizer
+from unstructured.text_splitter import SEPARATORS
+
+WORDS = ("retrieval augmented generation index vector chunk overlap separator token page document "
+         "embedding query answer context model faiss postgres schema v1.2.3 cve-2021-44228").split()
+
+
+def synthetic_texts(n_docs, chars, seed=0):
+    """Documents of words, sentences, lines and paragraphs, with some long unbroken runs."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(n_docs):
+        parts, size = [], 0
+        while size < chars:
+            roll = rng.random()
+            if roll < 0.01:
+                part = "x" * rng.randint(200, 1500)  # no separator at all: forces character splits
+            else:
+                part = " ".join(rng.choice(WORDS) for _ in range(rng.randint(3, 25)))
+                part += rng.choice([". ", ".\n", "\n\n", " ", "\n"])
+            parts.append(part)
+            size += len(part)
+        texts.append("".join(parts))
+    return texts
+
+
+def load_documents(folder):
+    from unstructured.ingest import extract_text
+
+    texts = []
+    for filename in sorted(os.listdir(folder)):
+        try:
+            texts.append(extract_text(os.path.join(folder, filename)))
+        except Exception as e:
+            print(f"⚠ Skipping {filename}: {e}")
+    return texts
+
+
+def langchain_splitter(chunk_size, chunk_overlap, length_function):
+    start = time.perf_counter()
+    try:
+        from langchain_text_splitters import RecursiveCharacterTextSplitter
+    except ImportError:
+        from langchain.text_splitter import RecursiveCharacterTextSplitter
+    import_seconds = time.perf_counter() - start
+    splitter = RecursiveCharacterTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap,
+                                              separators=SEPARATORS, length_function=length_function)
+    return splitter, import_seconds
+
+
+def timed(split, texts):
+    start = time.perf_counter()
+    chunks = [split(text) for text in texts]
+    return chunks, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="In-project recursive splitter vs LangChain: speed and equivalence")
+    parser.add_argument("--docs", help="chunk the documents in this folder instead of synthetic text")
+    parser.add_argument("--synthetic-docs", type=int, default=200)
+    parser.add_argument("--synthetic-chars", type=int, default=50000, help="characters per synthetic document")
+    parser.add_argument("--unit", choices=sorted(CHUNK_SIZES), default="chars")
+    parser.add_argument("--chunk-size", type=int)
+    parser.add_argument("--chunk-overlap", type=int)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    texts = load_documents(args.docs) if args.docs else synthetic_texts(args.synthetic_docs, args.synthetic_chars)
+    megabytes = sum(len(t) for t in texts) / 1e6
+    default_size, default_overlap = CHUNK_SIZES[args.unit]
+    chunk_size = args.chunk_size or default_size
+    chunk_overlap = default_overlap if args.chunk_overlap is None else args.chunk_overlap
+
+    ours = get_splitter(chunk_size, chunk_overlap, args.unit)
+    length_function = len
+    if args.unit == "tokens":
+        tokenizer = get_tokenizer(EMBED_MODEL)
+        length_function = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    theirs, import_seconds = langchain_splitter(chunk_size, chunk_overlap, length_function)
+
+    print(f"📊 {len(texts)} documents, {megabytes:.1f}M characters, chunk_size={chunk_size} "
+          f"overlap={chunk_overlap} ({args.unit})")
+    native_chunks, native_seconds = timed(ours.split_text, texts)
+    langchain_chunks, langchain_seconds = timed(theirs.split_text, texts)
+    identical = sum(a == b for a, b in zip(native_chunks, langchain_chunks))
+
+    report = {
+        "documents": len(texts),
+        "megachars": megabytes,
+        "unit": args.unit,
+        "chunk_size": chunk_size,
+        "chunk_overlap": chunk_overlap,
+        "chunks": sum(len(c) for c in native_chunks),
+        "native_seconds": native_seconds,
+        "langchain_seconds": langchain_seconds,
+        "langchain_import_seconds": import_seconds,
+        "speedup": langchain_seconds / native_seconds if native_seconds else None,
+        "identical_documents": identical,
+    }
+    print(f"⚡ native:    {native_seconds:.2f}s ({megabytes / native_seconds:.1f}M chars/s)")
+    print(f"🐢 langchain: {langchain_seconds:.2f}s ({megabytes / langchain_seconds:.1f}M chars/s), "
+          f"import {import_seconds:.2f}s")
+    print(f"🚀 Speedup x{report['speedup']:.1f}, identical chunks for {identical}/{len(texts)} documents")
+    for text, a, b in zip(texts, native_chunks, langchain_chunks):
+        if a != b:
+            first = next((i for i, (x, y) in enumerate(zip(a, b)) if x != y), min(len(a), len(b)))
+            print(f"⚠ First difference at chunk {first}: {a[first:first + 1]!r} vs {b[first:first + 1]!r}")
+            break
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,160 @@
+# generator_benchmark.py
+# Run from the project root: python -m benchmarks.generator_benchmark [--backends torch int8 onnx] [--model google/flan-t5-base]
+# Without --model a tiny random T5 is built locally, so nothing is downloaded.
+
+import argparse
+import difflib
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+
+from unstructured.query_bot import PROMPT_TEMPLATE
+from unstructured.t5_generator import BACKENDS, MAX_LENGTH, GenerationQueue, T5Generator
+
+WORDS = ("scan port host network packet exploit payload shell access user password hash server "
+         "client request response token session cookie header proxy firewall rule alert log audit").split()
+
+
+def make_tiny_t5(path, seed=0):
+    """Saves a 2-layer random T5 and a word-level tokenizer over WORDS to `path`."""
+    import torch
+    from tokenizers import Tokenizer, models, pre_tokenizers, processors
+    from transformers import PreTrainedTokenizerFast, T5Config, T5ForConditionalGeneration
+
+    template_words = PROMPT_TEMPLATE.replace("{question}", "").replace("{context_text}", "").split()
+    vocab = {"<pad>": 0, "</s>": 1, "<unk>": 2}
+    for word in WORDS + template_words:
+        vocab.setdefault(word, len(vocab))
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.WhitespaceSplit()
+    tokenizer.post_processor = processors.TemplateProcessing(single="$A </s>", special_tokens=[("</s>", 1)])
+    PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="<pad>", eos_token="</s>", unk_token="<unk>",
+                            model_max_length=512).save_pretrained(path)
+
+    torch.manual_seed(seed)
+    config = T5Config(vocab_size=len(vocab), d_model=128, d_kv=32, d_ff=512, num_layers=2, num_decoder_layers=2,
+                      num_heads=4, feed_forward_proj="gated-gelu", pad_token_id=0, eos_token_id=1,
+                      decoder_start_token_id=0)
+    T5ForConditionalGeneration(config).eval().save_pretrained(path)
+    return path
+
+
+def make_prompts(n, seed=0):
+    rng = random.Random(seed)
+    prompts = []
+    for _ in range(n):
+        question = " ".join(rng.choices(WORDS, k=rng.randint(4, 10)))
+        context = " ".join(rng.choices(WORDS, k=rng.randint(60, 300)))
+        prompts.append(PROMPT_TEMPLATE.format(question=question, context_text=context))
+    return prompts
+
+
+def drift(answers, reference):
+    """Share of answers identical to the reference, and their mean word-level similarity."""
+    same = sum(a == r for a, r in zip(answers, reference))
+    similarity = sum(difflib.SequenceMatcher(None, a.split(), r.split()).ratio() for a, r in zip(answers, reference))
+    return same / len(reference), similarity / len(reference)
+
+
+def run_pipeline(model, prompts, max_length):
+    """The previous generator: fp32 transformers pipeline, one prompt at a time."""
+    from transformers import pipeline
+
+    generator = pipeline("text2text-generation", model=model)
+    generator(prompts[0], max_length=max_length, truncation=True)  # warm up
+    start = time.perf_counter()
+    answers = [generator(p, max_length=max_length, truncation=True)[0]["generated_text"] for p in prompts]
+    return answers, time.perf_counter() - start
+
+
+def run_batched(generator, prompts, batch_size):
+    generator.generate(prompts[:1])  # warm up
+    start = time.perf_counter()
+    answers = []
+    for i in range(0, len(prompts), batch_size):
+        answers.extend(generator.generate(prompts[i:i + batch_size]))
+    return answers, time.perf_counter() - start
+
+
+def run_queue(generator, prompts, concurrency):
+    """`concurrency` users submitting prompts at once through the GenerationQueue."""
+    generation_queue = GenerationQueue(generator)
+    answers = [None] * len(prompts)
+    counter = iter(range(len(prompts)))
+    lock = threading.Lock()
+
+    def user():
+        while True:
+            with lock:
+                i = next(counter, None)
+            if i is None:
+                return
+            answers[i] = generation_queue.generate(prompts[i])
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=user) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.perf_counter() - start
+    stats = generation_queue.stats
+    return answers, seconds, stats["prompts"] / stats["batches"] if stats["batches"] else 0.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generator latency and answer drift: fp32 pipeline vs batched/quantized backends")
+    parser.add_argument("--model", help="checkpoint name or path (default: a tiny random T5 built locally)")
+    parser.add_argument("--backends", nargs="+", choices=BACKENDS, default=list(BACKENDS))
+    parser.add_argument("--prompts", type=int, default=32)
+    parser.add_argument("--batch-sizes", type=int, nargs="+", default=[1, 8])
+    parser.add_argument("--concurrency", type=int, default=8, help="concurrent users for the queue run (0 to skip)")
+    parser.add_argument("--num-beams", type=int, default=1)
+    parser.add_argument("--max-length", type=int, default=MAX_LENGTH)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        model = args.model or make_tiny_t5(os.path.join(tmp, "tiny-t5"))
+        prompts = make_prompts(args.prompts)
+        print(f"📊 {len(prompts)} prompts, model {args.model or 'tiny random T5'}, "
+              f"num_beams={args.num_beams}, max_length={args.max_length}")
+
+        reference, seconds = run_pipeline(model, prompts, args.max_length)
+        rows = [{"backend": "pipeline (fp32, one at a time)", "batch": 1, "ms_per_prompt": seconds / len(prompts) * 1000,
+                 "prompts_per_second": len(prompts) / seconds, "identical": 1.0, "similarity": 1.0}]
+
+        for backend in args.backends:
+            generator = T5Generator(model, backend=backend, num_beams=args.num_beams, max_length=args.max_length,
+                                    onnx_dir=os.path.join(tmp, "onnx") if backend == "onnx" else None)
+            name = generator.backend if generator.backend == backend else f"{backend} → {generator.backend}"
+            for batch_size in args.batch_sizes:
+                answers, seconds = run_batched(generator, prompts, batch_size)
+                identical, similarity = drift(answers, reference)
+                rows.append({"backend": name, "batch": batch_size, "ms_per_prompt": seconds / len(prompts) * 1000,
+                             "prompts_per_second": len(prompts) / seconds, "identical": identical,
+                             "similarity": similarity})
+            if args.concurrency:
+                answers, seconds, mean_batch = run_queue(generator, prompts, args.concurrency)
+                identical, similarity = drift(answers, reference)
+                rows.append({"backend": f"{name} queue x{args.concurrency}", "batch": round(mean_batch, 1),
+                             "ms_per_prompt": seconds / len(prompts) * 1000, "prompts_per_second": len(prompts) / seconds,
+                             "identical": identical, "similarity": similarity})
+
+    print(f"\n{'backend':<34} {'batch':>6} {'ms/prompt':>10} {'prompts/s':>10} {'identical':>10} {'similarity':>11}")
+    for row in rows:
+        print(f"{row['backend']:<34} {row['batch']:>6} {row['ms_per_prompt']:>10.1f} {row['prompts_per_second']:>10.2f} "
+              f"{row['identical']:>10.0%} {row['similarity']:>11.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model or "tiny-t5", "prompts": len(prompts), "num_beams": args.num_beams,
+                       "max_length": args.max_length, "rows": rows}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
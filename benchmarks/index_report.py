@@ -0,0 +1,132 @@
+# index_report.py
+# Run from the project root: python -m benchmarks.index_report [--synthetic 200000] [--storages float32 fp16 int8 pq]
+
+import argparse
+import json
+import os
+import time
+
+import faiss
+import numpy as np
+
+from unstructured.chunk_store import ChunkStore
+from unstructured.index_factory import INDEX_KINDS, STORAGES, build_index, rescore, search
+from unstructured.retriever import RESCORE_FACTOR
+from unstructured.snapshots import INDEX_ROOT, STORE_DIR, current_version, snapshot_path
+
+NPROBE_SWEEP = [1, 4, 16, 64]
+EF_SEARCH_SWEEP = [16, 32, 64, 128]
+
+
+def load_vectors(args):
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        # Clustered data behaves more like real embeddings than uniform noise
+        centers = rng.normal(size=(max(1, args.synthetic // 500), args.dim)).astype("float32")
+        labels = rng.integers(0, len(centers), args.synthetic)
+        return centers[labels] + 0.3 * rng.normal(size=(args.synthetic, args.dim)).astype("float32")
+    store_path = args.store or live_store_path(args.root)
+    if store_path is None:
+        raise SystemExit(f"No index snapshot under {args.root}; build one, or pass --store PATH or --synthetic N")
+    vectors = ChunkStore(store_path).vectors()
+    if vectors is None:
+        raise SystemExit(f"{store_path} holds no vectors; rebuild it or use --synthetic N")
+    return vectors
+
+
+def live_store_path(root=INDEX_ROOT):
+    """Chunk store of the live snapshot, or None before the first build."""
+    version = current_version(root)
+    return os.path.join(snapshot_path(version, root), STORE_DIR) if version else None
+
+
+def recall_at_k(found, truth):
+    k = truth.shape[1]
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def measure(index, queries, k, truth, vectors=None, **params):
+    # One query at a time, as retrieve() issues them; with vectors, candidates are
+    # over-fetched and re-scored exactly as retrieve() does for quantized indexes
+    latencies = []
+    found = []
+    for q in queries:
+        start = time.perf_counter()
+        if vectors is None:
+            _, ids = search(index, q[None, :], k, **params)
+        else:
+            _, ids = search(index, q[None, :], k * RESCORE_FACTOR, **params)
+            _, ids = rescore(vectors, q[None, :], ids, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        found.append(ids[0])
+    return {
+        "recall": round(recall_at_k(np.array(found), truth), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k vs latency of each index type against exact Flat search.")
+    parser.add_argument("--root", default=INDEX_ROOT, help="index root whose live snapshot's store is read")
+    parser.add_argument("--store", help="chunk store to read instead of the live snapshot's")
+    parser.add_argument("--synthetic", type=int, default=0, help="use N synthetic vectors instead of the store")
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--kinds", nargs="+", default=list(INDEX_KINDS), choices=INDEX_KINDS)
+    parser.add_argument("--storages", nargs="+", default=["float32"], choices=STORAGES,
+                        help="vector storage; quantized ones are also measured with exact re-scoring")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    vectors = np.asarray(load_vectors(args), dtype="float32")
+    rng = np.random.default_rng(1)
+    rows = rng.choice(len(vectors), min(args.queries, len(vectors)), replace=False)
+    queries = vectors[rows] + 0.05 * rng.normal(size=(len(rows), vectors.shape[1])).astype("float32")
+
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    _, truth = exact.search(queries, args.k)
+
+    print(f"📊 {len(vectors)} vectors, dim {vectors.shape[1]}, {len(queries)} queries, k={args.k}")
+    results = []
+    for kind in args.kinds:
+        for storage in args.storages:
+            if kind == "ivf_pq" and storage != args.storages[0]:
+                continue  # ivf_pq always stores PQ codes
+            start = time.perf_counter()
+            index = build_index(vectors, kind=kind, storage=storage)
+            build_seconds = time.perf_counter() - start
+            size_mb = faiss.serialize_index(index).nbytes / 1024 ** 2
+            # Index memory scaled to a million chunks (the float32 store file is mapped, not loaded)
+            mb_per_million = size_mb * 1_000_000 / len(vectors)
+
+            if kind in ("ivf_flat", "ivf_pq"):
+                sweep = [{"nprobe": n} for n in NPROBE_SWEEP]
+            elif kind == "hnsw":
+                sweep = [{"ef_search": ef} for ef in EF_SEARCH_SWEEP]
+            else:
+                sweep = [{}]
+            rescoring = [False, True] if storage != "float32" or kind == "ivf_pq" else [False]
+
+            for params in sweep:
+                for exact in rescoring:
+                    row = {"kind": kind, "storage": "pq" if kind == "ivf_pq" else storage, "rescore": exact,
+                           **params, "build_s": round(build_seconds, 2), "size_mb": round(size_mb, 1),
+                           "mb_per_million": round(mb_per_million, 1)}
+                    row.update(measure(index, queries, args.k, truth, vectors if exact else None, **params))
+                    results.append(row)
+                    label = f"{row['storage']}{'+rescore' if exact else ''}"
+                    print(f"  {kind:9s} {label:15s} {str(params):20s} recall@{args.k}={row['recall']:.3f} "
+                          f"p50={row['p50_ms']:.3f}ms p99={row['p99_ms']:.3f}ms size={row['size_mb']}MB "
+                          f"({row['mb_per_million']:.0f}MB per 1M chunks)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"vectors": len(vectors), "k": args.k, "results": results}, f, indent=2)
+        print(f"✅ Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# mock_openai_server.py
+# Run from the project root: python -m benchmarks.mock_openai_server [--port 8901 --latency 0.2 --fail-rate 0.1]
+# Then point the app or a benchmark at it: OPENAI_BASE_URL=http://127.0.0.1:8901/v1 OPENAI_API_KEY=mock
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+MOCK_ANSWER = "This is a mock answer generated from the provided context."
+MOCK_SQL = '{"sql": "SELECT 1", "params": []}'
+
+
+class MockOpenAIHandler(BaseHTTPRequestHandler):
+    """
+    Minimal OpenAI-compatible /v1/chat/completions endpoint (plain and
+    stream=True) with configurable latency and injected 429/500 errors.
+    """
+
+    latency = 0.0           # seconds before the response (or first streamed token)
+    token_delay = 0.0       # seconds between streamed tokens
+    fail_rate = 0.0         # share of requests answered with an error
+    retry_after = None      # Retry-After header sent with 429s
+    error_status = None     # 429 or 500 for every injected error; a random mix of both when None
+    stats = {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0}
+    _stats_lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        request = json.loads(self.rfile.read(length) or b"{}")
+        with self._stats_lock:
+            self.stats["requests"] += 1
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send_json(404, {"error": {"message": f"Unknown path {self.path}"}})
+            return
+
+        if random.random() < self.fail_rate:
+            with self._stats_lock:
+                self.stats["errors"] += 1
+            status = self.error_status or (429 if random.random() < 0.5 else 500)
+            if status == 429:
+                headers = {"Retry-After": str(self.retry_after)} if self.retry_after is not None else {}
+                self._send_json(429, {"error": {"message": "Rate limit reached", "type": "rate_limit_error"}}, headers)
+            else:
+                self._send_json(500, {"error": {"message": "Mock server error", "type": "server_error"}})
+            return
+
+        # Counted while "thinking" only, so a request is never counted after its response went out
+        with self._stats_lock:
+            self.stats["in_flight"] += 1
+            self.stats["max_in_flight"] = max(self.stats["max_in_flight"], self.stats["in_flight"])
+        time.sleep(self.latency)
+        with self._stats_lock:
+            self.stats["in_flight"] -= 1
+        prompt = request.get("messages", [{}])[-1].get("content", "")
+        content = MOCK_SQL if "SQL" in prompt else MOCK_ANSWER
+        model = request.get("model", "mock")
+        created = int(time.time())
+        if request.get("stream"):
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.end_headers()
+            for i, token in enumerate(content.split(" ")):
+                delta = {"content": token if i == 0 else " " + token}
+                chunk = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": created,
+                         "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": None}]}
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode("utf-8"))
+                self.wfile.flush()
+                time.sleep(self.token_delay)
+            self.wfile.write(b"data: [DONE]\n\n")
+            return
+
+        n_prompt = len(prompt.split())
+        n_completion = len(content.split())
+        self._send_json(200, {
+            "id": "chatcmpl-mock", "object": "chat.completion", "created": created, "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content},
+                         "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": n_prompt, "completion_tokens": n_completion,
+                      "total_tokens": n_prompt + n_completion},
+        })
+
+
+def start_mock_server(port=0, latency=0.0, token_delay=0.0, fail_rate=0.0, retry_after=None, error_status=None):
+    """
+    Starts the mock server on a daemon thread.
+
+    Returns:
+        (server, base_url): call server.shutdown() to stop it.
+    """
+    handler = type("Handler", (MockOpenAIHandler,), {
+        "latency": latency, "token_delay": token_delay, "fail_rate": fail_rate,
+        "retry_after": retry_after, "error_status": error_status,
+        "stats": {"requests": 0, "errors": 0, "in_flight": 0, "max_in_flight": 0},
+    })
+    server = ThreadingHTTPServer(("127.0.0.1", port), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}/v1"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--port", type=int, default=8901)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.02)
+    parser.add_argument("--fail-rate", type=float, default=0.0)
+    parser.add_argument("--retry-after", type=float, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_mock_server(args.port, args.latency, args.token_delay, args.fail_rate, args.retry_after)
+    print(f"🧪 Mock OpenAI server on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
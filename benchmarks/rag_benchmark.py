@@ -0,0 +1,263 @@
+# rag_benchmark.py
+# Run from the project root: python -m benchmarks.rag_benchmark [--synthetic 200 | --docs data/documents] [--json results.json]
+# Builds a throwaway index (the live one under data/faiss_index is never touched) and answers with a mock LLM.
+
+import argparse
+import json
+import os
+import random
+import resource
+import shutil
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+from unstructured.index_factory import INDEX_KIND, INDEX_KINDS, STORAGE, STORAGES, build_index, index_kind, search
+from unstructured.model_registry import encode, registry_stats
+from unstructured.pipeline import WORKERS, build_vector_store, iter_chunked_documents
+from unstructured.retriever import TOP_K, get_retriever
+
+# Metrics where a higher value is better; for the rest (seconds, ms, MB) lower is better
+HIGHER_IS_BETTER = ("per_second", "recall", "hit_rate")
+
+SYNTHETIC_TOPICS = {
+    "network": "port scan host packet firewall router subnet gateway traffic latency socket protocol",
+    "web": "request response cookie session header proxy injection script browser form endpoint token",
+    "crypto": "cipher hash key certificate signature nonce entropy salt digest block stream padding",
+    "malware": "payload dropper persistence registry beacon loader sandbox obfuscation sample signature hook",
+    "forensics": "disk image timeline artifact memory dump evidence hash volume partition carving log",
+}
+
+
+def make_synthetic_corpus(folder, n_docs, paragraphs=30, seed=0):
+    """Writes n_docs .txt files; each mixes one topic's vocabulary with words unique to the document."""
+    rng = random.Random(seed)
+    topics = list(SYNTHETIC_TOPICS.items())
+    os.makedirs(folder, exist_ok=True)
+    for i in range(n_docs):
+        topic, words = topics[i % len(topics)]
+        vocabulary = words.split() + [f"{topic}{i}x{j}" for j in range(8)]
+        text = "\n\n".join(
+            ". ".join(" ".join(rng.choices(vocabulary, k=rng.randint(8, 16))).capitalize() for _ in range(4)) + "."
+            for _ in range(paragraphs))
+        with open(os.path.join(folder, f"{topic}-{i:05d}.txt"), "w", encoding="utf-8") as f:
+            f.write(text)
+
+
+def percentiles(seconds):
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p95_ms": float(np.percentile(ms, 95)),
+            "p99_ms": float(np.percentile(ms, 99)), "mean_ms": float(ms.mean())}
+
+
+def peak_rss_mb():
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+def sample_questions(store, n, seed=0):
+    """Questions cut from random chunks (a run of 8-12 words), with the chunk's document as gold source."""
+    rng = random.Random(seed)
+    questions = []
+    for i in rng.sample(range(len(store)), min(n, len(store))):
+        words = store.text(i).split()
+        if len(words) < 4:
+            continue
+        length = min(len(words), rng.randint(8, 12))
+        start = rng.randint(0, len(words) - length)
+        questions.append((" ".join(words[start:start + length]), store.metadata(i)["source"]))
+    return questions
+
+
+def measure_ingest(file_paths, workers):
+    """Extract + chunk pass on its own, without embedding."""
+    size = sum(os.path.getsize(p) for p in file_paths)
+    chunks = 0
+    start = time.perf_counter()
+    for _, result, error in iter_chunked_documents(file_paths, workers=workers):
+        if error is None:
+            chunks += len(result[1][0])
+    seconds = time.perf_counter() - start
+    return {"documents": len(file_paths), "chunks": chunks, "seconds": seconds, "mb": size / 1e6,
+            "documents_per_second": len(file_paths) / seconds, "mb_per_second": size / 1e6 / seconds}
+
+
+def measure_queries(snapshot, retriever, questions, k, hybrid, rerank, generate):
+    """Per-stage latencies of every question, one query at a time like the app."""
+    stages = {"embed": [], "search": [], "fetch": [], "retrieve": [], "generate": []}
+    hits = 0
+    for question, gold_source in questions:
+        start = time.perf_counter()
+        query_vec = encode([question], model_name=snapshot.embed_model)
+        stages["embed"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _, ids = search(snapshot.index, query_vec, k)
+        stages["search"].append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        snapshot.store.get([int(i) for i in ids[0] if i >= 0])
+        stages["fetch"].append(time.perf_counter() - start)
+
+        # What the app calls: embed, FAISS (+ BM25 fusion, rescoring, reranking) and fetch together
+        start = time.perf_counter()
+        results = retriever.retrieve(question, k=k, hybrid=hybrid, rerank=rerank)
+        stages["retrieve"].append(time.perf_counter() - start)
+        hits += any(r["source"] == gold_source for r in results)
+
+        if generate is not None:
+            start = time.perf_counter()
+            generate(question, results)
+            stages["generate"].append(time.perf_counter() - start)
+
+    report = {stage: percentiles(seconds) for stage, seconds in stages.items() if seconds}
+    report["source_hit_rate"] = hits / len(questions)
+    return report
+
+
+def measure_recall(snapshot, questions, k):
+    """recall@k of the snapshot's index against exact search over the same vectors."""
+    vectors = np.asarray(snapshot.store.vectors())
+    exact = faiss.IndexFlatL2(vectors.shape[1])
+    exact.add(vectors)
+    query_vecs = encode([q for q, _ in questions], model_name=snapshot.embed_model)
+    _, truth = exact.search(query_vecs, k)
+    _, found = search(snapshot.index, query_vecs, k)
+    return float(np.mean([len(set(f) & set(t)) / k for f, t in zip(found, truth)]))
+
+
+def get_mock_generate(latency, token_delay):
+    """The OpenAI bot's generate_answer pointed at the in-process mock server (no API key or network)."""
+    from benchmarks.mock_openai_server import start_mock_server
+
+    server, base_url = start_mock_server(latency=latency, token_delay=token_delay)
+    # Read when the bot's client is created, so this has to happen before its import
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ["OPENAI_API_KEY"] = "mock"
+    import unstructured.query_bot_openai as bot
+    return lambda question, results: bot.generate_answer(question, results, use_cache=False)
+
+
+def flatten(report, prefix=""):
+    flat = {}
+    for name, value in report.items():
+        key = f"{prefix}{name}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, f"{key}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[key] = value
+    return flat
+
+
+def compare(report, baseline, tolerance):
+    """Metrics that got worse than the baseline run by more than `tolerance` (a fraction)."""
+    current, previous = flatten(report), flatten(baseline)
+    regressions = []
+    for key, old in previous.items():
+        new = current.get(key)
+        if new is None or not old or not any(s in key for s in HIGHER_IS_BETTER + ("seconds", "_ms", "_mb")):
+            continue
+        change = (new - old) / abs(old)
+        worse = change < -tolerance if any(s in key for s in HIGHER_IS_BETTER) else change > tolerance
+        if worse:
+            regressions.append({"metric": key, "baseline": old, "current": new, "change": change})
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end RAG benchmark: ingest, build, per-stage query latency, "
+                                                 "memory and recall, with a mocked LLM")
+    corpus = parser.add_mutually_exclusive_group()
+    corpus.add_argument("--docs", help="folder of documents to index (default: synthetic corpus)")
+    corpus.add_argument("--synthetic", type=int, default=200, help="number of synthetic documents")
+    parser.add_argument("--root", help="index root to build into (default: a temporary folder)")
+    parser.add_argument("--workers", type=int, default=WORKERS)
+    parser.add_argument("--index-kind", default=INDEX_KIND, choices=("auto",) + INDEX_KINDS)
+    parser.add_argument("--storage", default=STORAGE, choices=STORAGES)
+    parser.add_argument("--questions", type=int, default=200, help="questions sampled from the indexed chunks")
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--dense-only", action="store_true", help="skip BM25 fusion")
+    parser.add_argument("--rerank", action="store_true", help="rerank with the cross-encoder")
+    parser.add_argument("--generate", choices=("mock", "none"), default="mock",
+                        help="answer every question with the OpenAI bot against the mock server")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="mock LLM seconds per answer")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results JSON of an earlier run; regressions are reported")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change vs --baseline")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="rag_benchmark_")
+    try:
+        if args.docs:
+            folder = args.docs
+        else:
+            folder = os.path.join(workdir, "documents")
+            make_synthetic_corpus(folder, args.synthetic)
+        file_paths = [os.path.join(folder, f) for f in sorted(os.listdir(folder))
+                      if os.path.isfile(os.path.join(folder, f))]
+        root = args.root or os.path.join(workdir, "faiss_index")
+        report = {"corpus": args.docs or f"synthetic:{args.synthetic}", "index_kind": args.index_kind,
+                  "storage": args.storage, "k": args.k, "hybrid": not args.dense_only, "rerank": args.rerank}
+
+        print(f"📊 {len(file_paths)} documents from {folder}")
+        report["ingest"] = measure_ingest(file_paths, args.workers)
+        print(f"📖 Ingest: {report['ingest']['documents_per_second']:.1f} docs/s, "
+              f"{report['ingest']['mb_per_second']:.2f} MB/s")
+
+        build = build_vector_store(file_paths, root=root, workers=args.workers,
+                                   index_kind=args.index_kind, storage=args.storage)
+        retriever = get_retriever(root)
+        snapshot = retriever.snapshot
+        vectors = np.asarray(snapshot.store.vectors())
+        start = time.perf_counter()
+        index = build_index(vectors, kind=index_kind(snapshot.index), storage=snapshot.storage)
+        index_seconds = time.perf_counter() - start
+        report["build"] = {
+            "chunks": build["chunks"], "seconds": build["total_seconds"], "embed_seconds": build["embed_seconds"],
+            "chunks_per_second": build["chunks"] / build["total_seconds"] if build["total_seconds"] else 0.0,
+            "index_kind": index_kind(snapshot.index), "index_seconds": index_seconds,
+            "index_mb": faiss.serialize_index(index).nbytes / 1e6,
+        }
+        print(f"🏗️ Build: {build['chunks']} chunks in {build['total_seconds']:.2f}s "
+              f"(embed {build['embed_seconds']:.2f}s, {report['build']['index_kind']} index {index_seconds:.2f}s)")
+
+        questions = sample_questions(snapshot.store, args.questions)
+        generate = get_mock_generate(args.llm_latency, 0.0) if args.generate == "mock" else None
+        warmup = retriever.retrieve(questions[0][0], k=args.k, rerank=args.rerank)
+        if generate is not None:
+            generate(questions[0][0], warmup)  # client creation is not part of the latency
+        report["query"] = measure_queries(snapshot, retriever, questions, args.k, not args.dense_only,
+                                          args.rerank, generate)
+        report["recall_at_k"] = measure_recall(snapshot, questions, args.k)
+        report["memory"] = {"peak_rss_mb": peak_rss_mb()}
+        report["embedding"] = registry_stats()
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"\n{'stage':<10} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for stage, stats in report["query"].items():
+        if isinstance(stats, dict):
+            print(f"{stage:<10} {stats['p50_ms']:>9.2f} {stats['p95_ms']:>9.2f} {stats['p99_ms']:>9.2f}")
+    print(f"🎯 recall@{args.k} vs exact search: {report['recall_at_k']:.3f}, "
+          f"gold source in top {args.k}: {report['query']['source_hit_rate']:.1%}")
+    print(f"🧠 Peak RSS: {report['memory']['peak_rss_mb']} MB")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["regressions"] = compare(report, json.load(f), args.tolerance)
+        for r in report["regressions"]:
+            print(f"⚠️ {r['metric']}: {r['baseline']:.4g} → {r['current']:.4g} ({r['change']:+.0%})")
+        if not report["regressions"]:
+            print(f"✅ No regressions beyond {args.tolerance:.0%} vs {args.baseline}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+    if report.get("regressions"):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
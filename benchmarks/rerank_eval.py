@@ -0,0 +1,129 @@
+# rerank_eval.py
+# Run from the project root: python -m benchmarks.rerank_eval eval.jsonl [--baseline-k 5] [--generate openai]
+#
+# eval.jsonl holds one question per line: {"question": "...", "source": "gold.pdf", "answer": "reference answer"}
+# ("source" and "answer" are each optional, but at least one is needed to measure quality).
+
+import argparse
+import json
+import re
+
+from unstructured.retriever import get_retriever
+from unstructured.snapshots import INDEX_ROOT
+
+WORD_RE = re.compile(r"\w+")
+
+
+def count_tokens(text):
+    """Tokens as the OpenAI models count them when tiktoken is installed, else words."""
+    try:
+        import tiktoken
+    except ImportError:
+        return len(WORD_RE.findall(text))
+    return len(tiktoken.get_encoding("o200k_base").encode(text))
+
+
+def answer_recall(reference, text):
+    """Share of the reference answer's words that appear in text."""
+    ref = set(WORD_RE.findall(reference.lower()))
+    return len(ref & set(WORD_RE.findall(text.lower()))) / len(ref) if ref else 0.0
+
+
+def token_f1(prediction, reference):
+    pred, ref = WORD_RE.findall(prediction.lower()), WORD_RE.findall(reference.lower())
+    common = sum(min(pred.count(w), ref.count(w)) for w in set(pred))
+    if not common:
+        return 0.0
+    precision, recall = common / len(pred), common / len(ref)
+    return 2 * precision * recall / (precision + recall)
+
+
+def context_quality(item, chunks):
+    context = "\n\n".join(c["text"] for c in chunks)
+    quality = {"tokens": count_tokens(context)}
+    if item.get("source"):
+        quality["source_hit"] = float(any(c["source"] == item["source"] for c in chunks))
+    if item.get("answer"):
+        quality["answer_recall"] = answer_recall(item["answer"], context)
+    return quality
+
+
+def mean(rows, key):
+    values = [r[key] for r in rows if key in r]
+    return sum(values) / len(values) if values else None
+
+
+def summarize(rows):
+    return {key: mean(rows, key) for key in ("tokens", "source_hit", "answer_recall")}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Context tokens saved by cross-encoder reranking at equal quality")
+    parser.add_argument("eval_file", help="JSONL with question and source and/or answer")
+    parser.add_argument("--root", default=INDEX_ROOT)
+    parser.add_argument("--baseline-k", type=int, default=5, help="chunks sent to the LLM without reranking")
+    parser.add_argument("--generate", choices=["openai", "hf"], help="also generate answers and score them (token F1)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    with open(args.eval_file, "r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    retriever = get_retriever(args.root)
+
+    baseline_rows, reranked = [], []
+    per_k_rows = {k: [] for k in range(1, args.baseline_k + 1)}
+    for item in items:
+        baseline = retriever.retrieve(item["question"], k=args.baseline_k, rerank=False)
+        ranked = retriever.retrieve(item["question"], k=args.baseline_k, rerank=True)
+        reranked.append(ranked)
+        baseline_rows.append(context_quality(item, baseline))
+        for k in per_k_rows:
+            per_k_rows[k].append(context_quality(item, ranked[:k]))
+
+    report = {"questions": len(items), "baseline_k": args.baseline_k, "baseline": summarize(baseline_rows),
+              "reranked": {k: summarize(rows) for k, rows in per_k_rows.items()}}
+    base = report["baseline"]
+    print(f"📊 {len(items)} questions; baseline top-{args.baseline_k} without reranking: {base}")
+    for k, summary in report["reranked"].items():
+        print(f"   reranked top-{k}: {summary}")
+
+    # Smallest reranked k whose context is at least as good as the baseline's
+    metrics = [m for m in ("source_hit", "answer_recall") if base[m] is not None]
+    if not metrics:
+        raise SystemExit("Eval items need a 'source' or an 'answer' to measure quality")
+    equal_k = next((k for k, s in report["reranked"].items()
+                    if all(s[m] >= base[m] - 1e-9 for m in metrics)), None)
+    report["equal_quality_k"] = equal_k
+    if equal_k is None:
+        print(f"⚠ Reranking never matched the baseline's {', '.join(metrics)} within top-{args.baseline_k}")
+    else:
+        saved = base["tokens"] - report["reranked"][equal_k]["tokens"]
+        report["tokens_saved_per_query"] = saved
+        report["tokens_saved_fraction"] = saved / base["tokens"] if base["tokens"] else 0.0
+        print(f"✂️ Reranked top-{equal_k} matches the baseline: {saved:.0f} context tokens saved per query "
+              f"({report['tokens_saved_fraction']:.0%})")
+
+    if args.generate and equal_k is not None:
+        import importlib
+        bot = importlib.import_module("unstructured.query_bot_openai" if args.generate == "openai"
+                                      else "unstructured.query_bot")
+        with_refs = [(item, ranked) for item, ranked in zip(items, reranked) if item.get("answer")]
+        f1_base, f1_rerank = [], []
+        for item, ranked in with_refs:
+            baseline = retriever.retrieve(item["question"], k=args.baseline_k, rerank=False)
+            f1_base.append(token_f1(bot.generate_answer(item["question"], baseline, use_cache=False), item["answer"]))
+            f1_rerank.append(token_f1(bot.generate_answer(item["question"], ranked[:equal_k], use_cache=False),
+                                      item["answer"]))
+        if with_refs:
+            report["answer_f1"] = {"baseline": sum(f1_base) / len(f1_base), "reranked": sum(f1_rerank) / len(f1_rerank)}
+            print(f"💡 Answer token F1: baseline {report['answer_f1']['baseline']:.3f}, "
+                  f"reranked top-{equal_k} {report['answer_f1']['reranked']:.3f}")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+# retrieval_throughput.py
+# Run from the project root: python -m benchmarks.retrieval_throughput questions.txt [--batch-size 64]
+
+import argparse
+import json
+import time
+
+from unstructured.retriever import TOP_K, get_retriever
+from unstructured.snapshots import INDEX_ROOT
+
+
+def load_questions(path):
+    """One question per line; blank lines and lines starting with # are skipped."""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.lstrip().startswith("#")]
+
+
+def run_single(retriever, questions, k, hybrid=True, filters=None):
+    start = time.perf_counter()
+    results = [retriever.retrieve(q, k=k, hybrid=hybrid, filters=filters) for q in questions]
+    return results, time.perf_counter() - start
+
+
+def run_batched(retriever, questions, k, batch_size, hybrid=True, filters=None):
+    start = time.perf_counter()
+    results = []
+    for i in range(0, len(questions), batch_size):
+        results.extend(retriever.retrieve_many(questions[i:i + batch_size], k=k, hybrid=hybrid, filters=filters))
+    return results, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Retrieval throughput: one query at a time vs retrieve_many")
+    parser.add_argument("questions", help="text file with one question per line")
+    parser.add_argument("--root", default=INDEX_ROOT)
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--batch-size", type=int, default=64, help="queries per retrieve_many call")
+    parser.add_argument("--dense-only", action="store_true", help="skip BM25 fusion")
+    parser.add_argument("--skip-single", action="store_true", help="only run the batched pass")
+    parser.add_argument("--source", action="append", help="only search this document (repeatable)")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if not questions:
+        raise SystemExit(f"No questions in {args.questions}")
+
+    retriever = get_retriever(args.root)
+    retriever.retrieve_many(questions[:1], k=args.k)  # warm up the model and index pages
+
+    print(f"📊 {len(questions)} questions, k={args.k}, snapshot {retriever.snapshot.version}")
+    hybrid = not args.dense_only
+    filters = {"source": args.source} if args.source else None
+    report = {"questions": len(questions), "k": args.k, "batch_size": args.batch_size, "hybrid": hybrid,
+              "filters": filters}
+    batched, seconds = run_batched(retriever, questions, args.k, args.batch_size, hybrid, filters)
+    report["batched_qps"] = len(questions) / seconds
+    print(f"⚡ retrieve_many: {seconds:.2f}s ({report['batched_qps']:.1f} queries/s)")
+
+    if not args.skip_single:
+        single, seconds = run_single(retriever, questions, args.k, hybrid, filters)
+        report["single_qps"] = len(questions) / seconds
+        report["speedup"] = report["batched_qps"] / report["single_qps"]
+        same = sum([r["id"] for r in a] == [r["id"] for r in b] for a, b in zip(single, batched))
+        report["identical_results"] = same
+        print(f"🐢 retrieve:      {seconds:.2f}s ({report['single_qps']:.1f} queries/s)")
+        print(f"🚀 Speedup x{report['speedup']:.1f}, identical top-k for {same}/{len(questions)} questions")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=1)
+        print(f"💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+# service_load_test.py
+# Start the service first: python -m unstructured.retrieval_service
+# Run from the project root: python -m benchmarks.service_load_test questions.txt [--concurrency 1 4 16 64]
+
+import argparse
+import asyncio
+import json
+import time
+
+import httpx
+
+from benchmarks.retrieval_throughput import load_questions
+from unstructured.retrieval_service import SERVICE_HOST, SERVICE_PORT
+from unstructured.retriever import TOP_K
+
+
+def percentile(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def run_level(client, questions, concurrency, requests, k):
+    """`requests` POST /retrieve calls with `concurrency` of them in flight; per-request latencies in seconds."""
+    latencies = []
+    errors = 0
+    counter = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            response = await client.post("/retrieve", json={"query": questions[i % len(questions)], "k": k})
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, errors, time.perf_counter() - start
+
+
+async def run(args, questions):
+    limits = httpx.Limits(max_connections=max(args.concurrency), max_keepalive_connections=max(args.concurrency))
+    async with httpx.AsyncClient(base_url=args.url, limits=limits, timeout=120.0) as client:
+        await client.post("/retrieve", json={"query": questions[0], "k": args.k})  # warm up
+        levels = []
+        for concurrency in args.concurrency:
+            before = (await client.get("/stats")).json()["batching"]
+            latencies, errors, seconds = await run_level(client, questions, concurrency, args.requests, args.k)
+            after = (await client.get("/stats")).json()["batching"]
+            batches = after["batches"] - before["batches"]
+            level = {
+                "concurrency": concurrency,
+                "requests": len(latencies),
+                "errors": errors,
+                "throughput_qps": len(latencies) / seconds,
+                "p50_ms": percentile(latencies, 50) * 1000,
+                "p99_ms": percentile(latencies, 99) * 1000,
+                "mean_batch": (after["requests"] - before["requests"]) / batches if batches else 0.0,
+            }
+            levels.append(level)
+            print(f"  {concurrency:>4} {level['throughput_qps']:>10.1f} {level['p50_ms']:>9.1f} "
+                  f"{level['p99_ms']:>9.1f} {level['mean_batch']:>10.1f} {errors:>6}")
+        return levels
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency and throughput of the retrieval service under concurrent load")
+    parser.add_argument("questions", help="text file with one question per line")
+    parser.add_argument("--url", default=f"http://{SERVICE_HOST}:{SERVICE_PORT}")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16, 64],
+                        help="concurrent clients per level")
+    parser.add_argument("--requests", type=int, default=500, help="requests per concurrency level")
+    parser.add_argument("--k", type=int, default=TOP_K)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    questions = load_questions(args.questions)
+    if not questions:
+        raise SystemExit(f"No questions in {args.questions}")
+
+    print(f"📊 {args.requests} requests per level against {args.url}, k={args.k}")
+    print(f"  {'conc':>4} {'queries/s':>10} {'p50 ms':>9} {'p99 ms':>9} {'mean batch':>10} {'errors':>6}")
+    levels = asyncio.run(run(args, questions))
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"url": args.url, "k": args.k, "levels": levels}, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
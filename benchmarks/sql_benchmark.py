@@ -0,0 +1,91 @@
+# sql_benchmark.py
+# Run from the project root against a local PostgreSQL: python -m benchmarks.sql_benchmark [--dsn "host=localhost dbname=company_db user=postgres"]
+# Without --dsn, PG_CONFIG from structured/demo_query.py is used.
+
+import argparse
+import json
+import resource
+import time
+
+import numpy as np
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+
+from structured.query_runner import FETCH_SIZE, close_pools, run_query, stream_query
+
+SMALL_QUERY = "SELECT n, n * 2 AS doubled FROM generate_series(1, $1) AS n"
+LARGE_QUERY = "SELECT n, md5(n::text) AS digest, now() AS at FROM generate_series(1, $1) AS n"
+
+
+def old_run_query(sql, params, db_config):
+    """What run_query used to do: a new connection per query and a dict per row."""
+    conn = psycopg2.connect(**db_config)
+    try:
+        cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+        cur.execute(sql.replace("$1", "%s"), params)
+        return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def latencies(fn, repeat):
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    ms = np.asarray(seconds) * 1000
+    return {"p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99))}
+
+
+def peak_rss_mb():
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    parser = argparse.ArgumentParser(description="query_runner: pooled vs per-query connections, streamed vs materialized rows")
+    parser.add_argument("--dsn", help="libpq connection string (default: PG_CONFIG)")
+    parser.add_argument("--repeat", type=int, default=200, help="small queries per variant")
+    parser.add_argument("--large-rows", type=int, default=500000, help="rows of the large result")
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    if args.dsn:
+        db_config = psycopg2.extensions.parse_dsn(args.dsn)
+    else:
+        from structured.demo_query import PG_CONFIG
+        db_config = PG_CONFIG
+
+    report = {"repeat": args.repeat, "large_rows": args.large_rows, "fetch_size": FETCH_SIZE}
+    run_query(SMALL_QUERY, [10], db_config)  # opens the pool
+    report["small_new_connection"] = latencies(lambda: old_run_query(SMALL_QUERY, [10], db_config), args.repeat)
+    report["small_pooled"] = latencies(lambda: run_query(SMALL_QUERY, [10], db_config), args.repeat)
+    for name in ("small_new_connection", "small_pooled"):
+        print(f"⚡ {name:<22} p50 {report[name]['p50_ms']:.2f} ms  p99 {report[name]['p99_ms']:.2f} ms")
+
+    # Peak RSS only grows, so the streamed pass runs first
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    streamed = sum(len(rows) for _, rows in stream_query(LARGE_QUERY, [args.large_rows], db_config,
+                                                         limit=args.large_rows))
+    report["large_streamed"] = {"rows": streamed, "seconds": time.perf_counter() - start,
+                                "peak_rss_growth_mb": peak_rss_mb() - before}
+    before = peak_rss_mb()
+    start = time.perf_counter()
+    materialized = len(old_run_query(LARGE_QUERY, [args.large_rows], db_config))
+    report["large_fetchall_dicts"] = {"rows": materialized, "seconds": time.perf_counter() - start,
+                                      "peak_rss_growth_mb": peak_rss_mb() - before}
+    for name in ("large_streamed", "large_fetchall_dicts"):
+        r = report[name]
+        print(f"📦 {name:<22} {r['rows']} rows in {r['seconds']:.2f}s, peak RSS +{r['peak_rss_growth_mb']:.0f} MB")
+    close_pools()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"💾 Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
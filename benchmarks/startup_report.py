@@ -0,0 +1,92 @@
+# startup_report.py
+# Run from the project root: python -m benchmarks.startup_report [--scenarios import_bots hf_answer]
+
+import argparse
+import json
+import subprocess
+import sys
+
+QUESTION = "What is FatRat?"
+
+# Each scenario runs in a fresh interpreter so imports and model loads are cold.
+# "eager" reproduces what importing both bots used to do: two retrievers, each
+# with its own embedding model and index copy, plus the flan-t5 pipeline.
+SCENARIOS = {
+    "import_bots": """
+import unstructured.query_bot, unstructured.query_bot_openai
+""",
+    "openai_first_query": """
+import unstructured.query_bot_openai as bot
+bot.retrieve(QUESTION)
+""",
+    "hf_first_query": """
+import unstructured.query_bot as bot
+bot.retrieve(QUESTION)
+""",
+    "both_engines_first_query": """
+import unstructured.query_bot as hf_bot, unstructured.query_bot_openai as openai_bot
+hf_bot.retrieve(QUESTION)
+openai_bot.retrieve(QUESTION)
+""",
+    "hf_answer": """
+import unstructured.query_bot as bot
+bot.generate_answer(QUESTION, bot.retrieve(QUESTION))
+""",
+    "eager": """
+from sentence_transformers import SentenceTransformer
+from transformers import pipeline
+from unstructured.model_registry import EMBED_MODEL
+from unstructured.query_bot import HF_MODEL
+from unstructured.snapshots import INDEX_ROOT, Snapshot, current_version
+version = current_version(INDEX_ROOT)
+copies = [(SentenceTransformer(EMBED_MODEL), Snapshot(version, INDEX_ROOT)) for _ in range(2)]
+generator = pipeline("text2text-generation", model=HF_MODEL)
+""",
+}
+
+_RUNNER = """
+import json, resource, sys, time
+QUESTION = {question!r}
+start = time.perf_counter()
+exec({code!r})
+seconds = time.perf_counter() - start
+rss_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+print("@@" + json.dumps({{"seconds": seconds, "peak_rss_mb": rss_kb / 1024}}))
+"""
+
+
+def run_scenario(name, question=QUESTION):
+    """Runs one scenario in a child interpreter and returns its wall time and peak RSS."""
+    code = _RUNNER.format(question=question, code=SCENARIOS[name])
+    proc = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True)
+    for line in proc.stdout.splitlines():
+        if line.startswith("@@"):
+            return {"scenario": name, **json.loads(line[2:])}
+    error = (proc.stderr.strip().splitlines() or ["no output"])[-1]
+    return {"scenario": name, "error": error}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cold-start time and peak memory of the unstructured bots")
+    parser.add_argument("--scenarios", nargs="+", default=list(SCENARIOS), choices=list(SCENARIOS))
+    parser.add_argument("--question", default=QUESTION)
+    parser.add_argument("--json", help="write results to this file")
+    args = parser.parse_args()
+
+    results = []
+    for name in args.scenarios:
+        result = run_scenario(name, args.question)
+        results.append(result)
+        if "error" in result:
+            print(f"❌ {name:26s} failed: {result['error']}")
+        else:
+            print(f"⏱ {name:26s} {result['seconds']:8.2f} s   peak RSS {result['peak_rss_mb']:8.1f} MB")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=1)
+        print(f"💾 Wrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,154 @@
+# common/openai_client.py
+# Shared async OpenAI access for the document bot and the SQL generator.
+
+import asyncio
+import os
+import random
+import time
+import weakref
+
+from dotenv import load_dotenv
+
+# ==== CONFIG ====
+MAX_CONCURRENCY = 8          # OpenAI calls in flight per event loop
+REQUESTS_PER_MINUTE = 300    # token-bucket refill rate
+BURST = 20                   # requests that may start back to back before the bucket throttles
+MAX_RETRIES = 5              # retries on rate limits, timeouts, connection and 5xx errors
+BACKOFF_BASE = 0.5           # seconds; retry n sleeps uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**n))
+BACKOFF_MAX = 20.0
+DEFAULT_DEADLINE = 60.0      # seconds per call, retries and waits included
+# ================
+
+load_dotenv()
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# One client per event loop: httpx connection pools cannot be shared across loops
+_clients = weakref.WeakKeyDictionary()
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when a call (including its retries) does not finish before its deadline."""
+
+
+class TokenBucket:
+    """Async token bucket: `rate` requests per second on average, bursts up to `capacity`."""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, deadline=None):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+                if deadline is not None and now + wait > deadline:
+                    raise DeadlineExceeded("Deadline reached while waiting for the rate limiter")
+                await asyncio.sleep(wait)
+
+
+def _is_retryable(error):
+    import openai
+
+    if isinstance(error, (openai.RateLimitError, openai.APITimeoutError, openai.APIConnectionError,
+                          openai.InternalServerError, asyncio.TimeoutError)):
+        return True
+    return isinstance(error, openai.APIStatusError) and error.status_code in (408, 409)
+
+
+def _retry_after(error):
+    """Seconds the server asked us to wait (Retry-After header), if any."""
+    response = getattr(error, "response", None)
+    try:
+        return float(response.headers.get("retry-after"))
+    except (AttributeError, TypeError, ValueError):
+        return None
+
+
+class AsyncOpenAIClient:
+    """
+    AsyncOpenAI wrapper shared by every caller on one event loop.
+
+    Every call waits for a concurrency slot and a rate-limiter token, then
+    runs with whatever time is left before its deadline. Rate limits,
+    timeouts, connection errors and 5xx responses are retried with full-jitter
+    exponential backoff (or the server's Retry-After), never past the deadline.
+    The underlying HTTP connections are reused across calls.
+    """
+
+    def __init__(self, api_key=OPENAI_API_KEY, base_url=None, max_concurrency=MAX_CONCURRENCY,
+                 requests_per_minute=REQUESTS_PER_MINUTE, burst=BURST, max_retries=MAX_RETRIES):
+        from openai import AsyncOpenAI
+
+        # The SDK's own retries are disabled so backoff and deadlines are handled in one place
+        self.client = AsyncOpenAI(api_key=api_key, base_url=base_url or os.getenv("OPENAI_BASE_URL"),
+                                  max_retries=0)
+        self.max_retries = max_retries
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._bucket = TokenBucket(requests_per_minute / 60.0, burst)
+        self.stats = {"calls": 0, "retries": 0, "failures": 0}
+
+    async def chat(self, messages, model, deadline=DEFAULT_DEADLINE, **kwargs):
+        """
+        One chat completion with limits, retries and a deadline.
+
+        Args:
+            messages (list): Chat messages.
+            model (str): Model name.
+            deadline (float): Seconds this call may take in total.
+            **kwargs: Passed to chat.completions.create (max_tokens, temperature, ...).
+
+        Returns:
+            The ChatCompletion response.
+        """
+        expires = time.monotonic() + deadline
+        self.stats["calls"] += 1
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    await self._bucket.acquire(expires)
+                    remaining = expires - time.monotonic()
+                    if remaining <= 0:
+                        raise DeadlineExceeded(f"Deadline of {deadline:.1f}s reached")
+                    return await asyncio.wait_for(
+                        self.client.chat.completions.create(model=model, messages=messages,
+                                                            timeout=remaining, **kwargs),
+                        remaining)
+            except DeadlineExceeded:
+                self.stats["failures"] += 1
+                raise
+            except Exception as e:
+                if not _is_retryable(e) or attempt >= self.max_retries:
+                    self.stats["failures"] += 1
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    delay = random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt))
+                if time.monotonic() + delay >= expires:
+                    self.stats["failures"] += 1
+                    raise DeadlineExceeded(f"Deadline of {deadline:.1f}s reached after {attempt + 1} attempts") from e
+                attempt += 1
+                self.stats["retries"] += 1
+                print(f"🔁 OpenAI call failed ({type(e).__name__}), retry {attempt} in {delay:.2f}s")
+                await asyncio.sleep(delay)
+
+    async def close(self):
+        await self.client.close()
+
+
+def get_async_client():
+    """The shared client for the running event loop, created on first use."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = AsyncOpenAIClient()
+    return client
@@ -0,0 +1,214 @@
+# common/tracing.py
+# Timing spans and counters for the ingest, retrieval and SQL paths, exported in Prometheus text format.
+
+import bisect
+import contextvars
+import functools
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# ==== CONFIG ====
+ENABLED = os.getenv("RAG_TRACING", "0") == "1"   # process-wide; trace() turns tracing on for one request only
+METRICS_FILE = os.getenv("RAG_METRICS_FILE")     # written by write_metrics() (node_exporter textfile format)
+METRICS_PORT = int(os.getenv("RAG_METRICS_PORT", "0")) or None   # serve /metrics when set
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)   # seconds
+PREFIX = "rag"
+# ================
+
+_enabled = ENABLED
+_lock = threading.Lock()
+_spans = {}        # name -> {"count", "sum", "buckets"}; buckets[i] counts timings in (BUCKETS[i-1], BUCKETS[i]]
+_counters = {}     # name -> value
+_current_trace = contextvars.ContextVar("trace", default=None)
+
+
+def enable(flag=True):
+    """Turns tracing on or off for the whole process (every user and background thread)."""
+    global _enabled
+    _enabled = bool(flag)
+
+
+def is_enabled():
+    return _enabled
+
+
+def _active():
+    # Off, spans and counters cost one flag check and one context lookup
+    return _enabled or _current_trace.get() is not None
+
+
+def record(name, seconds):
+    """Adds one timing to span `name` (and to the active request trace)."""
+    with _lock:
+        stats = _spans.get(name)
+        if stats is None:
+            stats = _spans[name] = {"count": 0, "sum": 0.0, "buckets": [0] * (len(BUCKETS) + 1)}
+        stats["count"] += 1
+        stats["sum"] += seconds
+        stats["buckets"][bisect.bisect_left(BUCKETS, seconds)] += 1
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, seconds)
+
+
+def count(name, value=1):
+    """Increments counter `name` (e.g. chunks embedded, rows returned)."""
+    if not _active():
+        return
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + value
+
+
+class _Span:
+    __slots__ = ("name", "start")
+
+    def __init__(self, name):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NoopSpan:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name):
+    """Context manager timing a block as span `name`; a shared no-op while tracing is off."""
+    return _Span(name) if _active() else _NOOP
+
+
+def traced(name):
+    """Decorator timing every call of a function as span `name`."""
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _active():
+                return fn(*args, **kwargs)
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                record(name, time.perf_counter() - start)
+        return wrapper
+    return decorate
+
+
+class Trace:
+    """Spans recorded while one request (a question, a SQL run) was handled, in the order they finished."""
+
+    def __init__(self):
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, name, seconds):
+        with self._lock:
+            self.spans.append((name, seconds))
+
+    def breakdown(self):
+        """[(name, calls, total seconds)] per span name, slowest first."""
+        totals = {}
+        for name, seconds in self.spans:
+            calls, total = totals.get(name, (0, 0.0))
+            totals[name] = (calls + 1, total + seconds)
+        return sorted(((name, calls, total) for name, (calls, total) in totals.items()), key=lambda row: -row[2])
+
+
+class trace:
+    """
+    Collects the spans of one request: `with trace() as t: ...` then
+    t.breakdown(). Spans are recorded inside the block even while tracing is
+    off process-wide, so one user can trace their requests without turning
+    it on for everyone. With active=False the block is not traced and t is
+    None. Spans in other threads (the index writer, the generation queue)
+    still reach the metrics but not the request's trace.
+    """
+
+    def __init__(self, active=True):
+        self.active = active
+
+    def __enter__(self):
+        if not self.active:
+            return None
+        self.trace = Trace()
+        self._token = _current_trace.set(self.trace)
+        return self.trace
+
+    def __exit__(self, *exc):
+        if self.active:
+            _current_trace.reset(self._token)
+        return False
+
+
+def _metric_name(name):
+    return "".join(c if c.isalnum() else "_" for c in name)
+
+
+def export_prometheus():
+    """Every span (as a histogram) and counter in Prometheus text exposition format."""
+    with _lock:
+        spans = {name: {**stats, "buckets": list(stats["buckets"])} for name, stats in _spans.items()}
+        counters = dict(_counters)
+    lines = [f"# HELP {PREFIX}_span_seconds Time spent per pipeline stage.",
+             f"# TYPE {PREFIX}_span_seconds histogram"]
+    for name, stats in sorted(spans.items()):
+        cumulative = 0
+        for bound, n in zip(BUCKETS, stats["buckets"]):
+            cumulative += n
+            lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="{bound}"}} {cumulative}')
+        lines.append(f'{PREFIX}_span_seconds_bucket{{span="{name}",le="+Inf"}} {stats["count"]}')
+        lines.append(f'{PREFIX}_span_seconds_sum{{span="{name}"}} {stats["sum"]:.6f}')
+        lines.append(f'{PREFIX}_span_seconds_count{{span="{name}"}} {stats["count"]}')
+    for name, value in sorted(counters.items()):
+        metric = f"{PREFIX}_{_metric_name(name)}_total"
+        lines += [f"# TYPE {metric} counter", f"{metric} {value}"]
+    return "\n".join(lines) + "\n"
+
+
+def write_metrics(path=METRICS_FILE):
+    """Writes export_prometheus() to `path` atomically; does nothing without a path."""
+    if not path:
+        return None
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(export_prometheus())
+    os.replace(tmp_path, path)
+    return path
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.rstrip("/") != "/metrics":
+            self.send_error(404)
+            return
+        data = export_prometheus().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_metrics_server(port=METRICS_PORT, host="0.0.0.0"):
+    """Serves GET /metrics on a daemon thread for Prometheus to scrape. Returns the server."""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"📈 Metrics on http://{host}:{server.server_address[1]}/metrics")
+    return server
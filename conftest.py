@@ -0,0 +1,5 @@
+# Tests live in tests/ and run from the project root: python -m pytest
+# The project root is put on sys.path, so common, structured, unstructured and benchmarks import as packages.
+
+# A manual script (python -m unstructured.test_query), not a pytest module
+collect_ignore = ["unstructured/test_query.py"]
@@ -1,12 +1,9 @@
-import streamlit as st
-import os
-
-# Import both unstructured bot versions
-import unstructured.query_bot as hf_bot
-import unstructured.query_bot_openai as openai_bot
-import unstructured.vector_store_incremental as vector_store_incremental  # Import your incremental updater
 import importlib
+import time
+
+import streamlit as st
 
+from common import tracing
 from structured.sql_generator_openai import generate_sql
 from structured.query_runner import run_query
 from structured.schema_loader import load_schema_yaml, schema_to_description
@@ -14,10 +11,100 @@ from structured.demo_query import PG_CONFIG  # Postgres config
 
 # Schema file for structured mode
 SCHEMA_FILE = "structured/example_schema.yaml"
+SQL_PAGE_SIZE = 100   # result rows shown per page
 
 # Page Config
 st.set_page_config(page_title="RAG Document & SQL Bot", page_icon="📚", layout="wide")
 
+
+# Unstructured bot per engine; each is imported only when first selected
+BOT_MODULES = {
+    "HuggingFace": "unstructured.query_bot",
+    "OpenAI": "unstructured.query_bot_openai",
+}
+
+
+@st.cache_resource
+def get_index_jobs():
+    """One background indexing queue (single index writer) per server process, shared by all sessions."""
+    from unstructured.index_jobs import IndexJobQueue  # Background incremental indexing
+    return IndexJobQueue()
+
+
+@st.cache_resource
+def get_shared_retriever():
+    """
+    The retriever both engines query: the index snapshot and embedder are opened once per process.
+    With RETRIEVAL_SERVICE_URL set, a client of the retrieval service is used instead.
+    """
+    from unstructured.retrieval_client import RetrievalClient, service_url
+    if service_url():
+        return RetrievalClient(service_url())
+    from unstructured.retriever import get_retriever
+    return get_retriever()
+
+
+def get_bot(engine):
+    """Imports the selected engine's bot; its generator backend loads on the first answer."""
+    from unstructured.retrieval_client import service_url
+    if service_url():
+        return get_shared_retriever().bot(engine)  # answered by the retrieval service
+    return importlib.import_module(BOT_MODULES[engine])
+
+
+def document_names():
+    """Documents in the live snapshot, for the source filter."""
+    from unstructured.retrieval_client import service_url
+    if service_url():
+        return get_shared_retriever().documents()
+    from unstructured.snapshots import current_documents
+    return current_documents()
+
+
+def answer_cache_stats():
+    from unstructured.retrieval_client import service_url
+    if service_url():
+        return get_shared_retriever().stats()["answer_cache"]
+    from unstructured.answer_cache import get_answer_cache
+    return get_answer_cache().stats()
+
+
+@st.cache_resource
+def get_metrics_server():
+    """Prometheus /metrics endpoint (RAG_METRICS_PORT), started once per server process."""
+    return tracing.start_metrics_server() if tracing.METRICS_PORT else None
+
+
+def show_timings(request_trace):
+    """Sidebar breakdown of where the last request's time went."""
+    if request_trace is None:
+        return
+    with st.sidebar.expander("⏱ Timing breakdown", expanded=True):
+        rows = request_trace.breakdown()
+        if not rows:
+            st.caption("No spans recorded (the work ran in the retrieval service).")
+        for name, calls, seconds in rows:
+            st.caption(f"`{name}` — {seconds * 1000:.1f} ms" + (f" ({calls} calls)" if calls > 1 else ""))
+        tracing.write_metrics()
+
+
+@st.fragment(run_every=2)
+def show_index_jobs():
+    """Polls this session's indexing jobs without rerunning the whole page."""
+    job_ids = st.session_state.get("index_jobs", [])
+    for job_id in reversed(job_ids[-3:]):
+        status = get_index_jobs().status(job_id)
+        if status is None:
+            continue
+        if status["state"] == "done":
+            st.success(f"✅ Job {job_id}: vector DB updated")
+        elif status["state"] == "failed":
+            st.error(f"❌ Job {job_id} failed: {status['error']}")
+        else:
+            st.progress(status["progress"], text=f"📖 Job {job_id}: {status['state']}")
+        for name, state in status["files"].items():
+            st.caption(f"{name} — {state}")
+
 # App title
 st.title("📚 RAG Document & SQL Bot")
 st.write("Ask questions about uploaded documents **or** query structured databases.")
@@ -25,6 +112,10 @@ st.write("Ask questions about uploaded documents **or** query structured databas
 # Sidebar
 st.sidebar.header("Settings")
 mode = st.sidebar.selectbox("Mode", ["Unstructured", "Structured"])
+# Per session: only this user's requests are traced (RAG_TRACING=1 traces every request process-wide)
+st.sidebar.toggle("⏱ Trace timings", value=tracing.is_enabled(), key="trace_timings",
+                  help="Time every pipeline stage of your requests and show the breakdown")
+get_metrics_server()
 st.sidebar.markdown("---")
 
 # ============================
@@ -32,7 +123,7 @@ st.sidebar.markdown("---")
 # ============================
 if mode == "Unstructured":
     # Engine selector
-    engine = st.sidebar.radio("Choose Engine", ["HuggingFace", "OpenAI"])
+    engine = st.sidebar.radio("Choose Engine", list(BOT_MODULES))
 
     # Upload option
     st.sidebar.subheader("📂 Upload Documents")
@@ -43,44 +134,63 @@ if mode == "Unstructured":
     )
 
     if uploaded_files:
-        DOCS_FOLDER = "data/documents"
-        os.makedirs(DOCS_FOLDER, exist_ok=True)
-
-        for uploaded_file in uploaded_files:
-            save_path = os.path.join(DOCS_FOLDER, uploaded_file.name)
-            with open(save_path, "wb") as f:
-                f.write(uploaded_file.getbuffer())
-            st.sidebar.success(f"✅ Saved: {uploaded_file.name}")
-
-        # Run incremental indexing
-        with st.spinner("📖 Updating vector database with new documents..."):
-            # This will re-run your vector_store_incremental pipeline
-            import importlib
-            importlib.reload(vector_store_incremental)
-
-        st.sidebar.success("✅ Vector DB updated with new documents!")
+        # The uploader keeps its files across reruns, so only queue ones not seen yet
+        submitted = st.session_state.setdefault("submitted_uploads", set())
+        new_uploads = [f for f in uploaded_files if f.file_id not in submitted]
+        if new_uploads:
+            # Saving and indexing run on the background writer; queries keep using the live snapshot
+            job_id = get_index_jobs().submit({f.name: f.getvalue() for f in new_uploads})
+            submitted.update(f.file_id for f in new_uploads)
+            job_ids = st.session_state.setdefault("index_jobs", [])
+            if job_id not in job_ids:
+                job_ids.append(job_id)
+            st.sidebar.info(f"📥 Queued {len(new_uploads)} document(s) for indexing")
+
+    with st.sidebar:
+        show_index_jobs()
 
     # Retrieval + Q&A
     top_k = st.sidebar.slider("Number of Chunks (Top K)", min_value=1, max_value=10, value=3)
+    only_sources = st.sidebar.multiselect("📄 Search only in", document_names(),
+                                          help="Leave empty to search every document")
     question = st.text_input("❓ Enter your question:")
 
     if st.button("Get Answer") and question.strip():
-        with st.spinner("Retrieving answer..."):
-            if engine == "HuggingFace":
-                results = hf_bot.retrieve(question, k=top_k)
-                answer = hf_bot.generate_answer(question, results)
-            else:
-                results = openai_bot.retrieve(question, k=top_k)
-                answer = openai_bot.generate_answer(question, results)
-
+        from unstructured.context_packer import clear_last_report, last_report
+        from unstructured.retriever import format_source
+        from unstructured.streaming import StreamTimer
+
+        with tracing.trace(active=st.session_state.trace_timings) as request_trace:
+            submitted_at = time.perf_counter()
+            with st.spinner("Retrieving context..."):
+                bot = get_bot(engine)
+                filters = {"source": only_sources} if only_sources else None
+                results = get_shared_retriever().retrieve(question, k=top_k, filters=filters)
+
+            # Tokens are rendered as the engine produces them instead of after the whole answer
             st.subheader("💡 Answer:")
-            st.write(answer)
-
-            with st.expander("📚 Retrieved Chunks & Sources"):
-                for r in results:
-                    st.markdown(f"**Source:** `{r['source']}`  — *Distance:* `{r['distance']:.4f}`")
-                    st.write(r["text"])
-                    st.markdown("---")
+            clear_last_report()
+            timer = StreamTimer(bot.stream_answer(question, results), start=submitted_at)
+            with tracing.span("stream_answer"):
+                st.write_stream(timer)
+            caption = f"⏱ First token {timer.ttft:.2f}s · full answer {timer.total:.2f}s"
+            packed = last_report()  # None when the answer came from the cache or the service
+            if packed:
+                caption += (f" · context {packed['tokens']} tokens from {packed['chunks_used']}/{packed['chunks']}"
+                            f" chunks ({packed['saved_tokens']} saved)")
+            st.caption(caption)
+        show_timings(request_trace)
+
+        cache_stats = answer_cache_stats()
+        st.sidebar.caption(f"♻️ Answer cache: {cache_stats['entries']} answers, "
+                           f"hit rate {cache_stats['hit_rate']:.0%}")
+
+        with st.expander("📚 Retrieved Chunks & Sources"):
+            for r in results:
+                distance = "n/a" if r["distance"] is None else f"{r['distance']:.4f}"
+                st.markdown(f"**Source:** `{format_source(r)}`  — *Distance:* `{distance}`")
+                st.write(r["text"])
+                st.markdown("---")
 
 
 # ============================
@@ -95,20 +205,38 @@ elif mode == "Structured":
 
     question = st.text_area("📝 Enter your request:")
 
-    if st.button("Run SQL") and question.strip():
-        with st.spinner("Generating SQL..."):
-            sql, params = generate_sql(schema_desc, question)
-
-        if not sql:
-            st.error("No SQL could be generated for your question.")
-        else:
+    with tracing.trace(active=st.session_state.trace_timings) as request_trace:
+        if st.button("Run SQL") and question.strip():
+            with st.spinner("Generating SQL..."):
+                sql, params = generate_sql(schema_desc, question)
+            # Kept across reruns so the result pages below can be browsed
+            st.session_state["sql_query"] = (sql, params) if sql else None
+            st.session_state["sql_page"] = 0
+            if not sql:
+                st.error("No SQL could be generated for your question.")
+
+        if st.session_state.get("sql_query"):
+            sql, params = st.session_state["sql_query"]
+            page = st.session_state.get("sql_page", 0)
             st.code(sql, language="sql")
             st.write("**Params:**", params)
 
             try:
                 with st.spinner("Running query..."):
-                    rows = run_query(sql, params, PG_CONFIG)
-                st.success(f"Retrieved {len(rows)} rows.")
-                st.dataframe(rows)
+                    result = run_query(sql, params, PG_CONFIG, limit=SQL_PAGE_SIZE, offset=page * SQL_PAGE_SIZE)
+                first = page * SQL_PAGE_SIZE
+                st.success(f"Rows {first + 1 if len(result) else 0}–{first + len(result)}"
+                           + (" (more available)" if result.truncated else ""))
+                st.dataframe(result.to_arrow())
             except Exception as e:
+                result = None
                 st.error(f"Query failed: {e}")
+
+            previous_col, next_col = st.columns(2)
+            if previous_col.button("⬅️ Previous page", disabled=page == 0):
+                st.session_state["sql_page"] = page - 1
+                st.rerun()
+            if next_col.button("Next page ➡️", disabled=result is None or not result.truncated):
+                st.session_state["sql_page"] = page + 1
+                st.rerun()
+    show_timings(request_trace)
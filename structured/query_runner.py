@@ -1,8 +1,21 @@
 # structured/query_runner.py
-import json
 import re
+import threading
+import uuid
+from contextlib import contextmanager
+
 import psycopg2
-import psycopg2.extras
+import psycopg2.pool
+
+from common.tracing import count, span, traced
+
+# ==== CONFIG ====
+POOL_MIN_CONNECTIONS = 1
+POOL_MAX_CONNECTIONS = 8       # concurrent queries per database; more wait for a free connection
+STATEMENT_TIMEOUT_MS = 15000   # per query, enforced by PostgreSQL
+FETCH_SIZE = 500               # rows per round trip from the server-side cursor
+MAX_ROWS = 1000                # default row cap of run_query
+# ================
 
 # optional strong parser
 try:
@@ -37,57 +50,195 @@ def validate_sql_ast(sql):
     else:
         return simple_validate_select(sql)
 
-def run_query(sql, params, db_config, limit=1000):
-    """
-    Executes a parameterized SELECT safely against PostgreSQL.
-    db_config should be a dict: 
-        {
-            "dbname": "your_db",
-            "user": "your_user",
-            "password": "your_password",
-            "host": "localhost",
-            "port": 5432
-        }
-    """
-    # Validate query is safe
-    validate_sql_ast(sql)
+class BlockingConnectionPool(psycopg2.pool.ThreadedConnectionPool):
+    """ThreadedConnectionPool that makes callers wait for a free connection instead of raising PoolError."""
 
-    # Count placeholders BEFORE replacing
-    placeholder_matches = re.findall(r"\$\d+", sql)
-    num_placeholders = len(set(placeholder_matches))
+    def __init__(self, minconn, maxconn, *args, **kwargs):
+        self._slots = threading.BoundedSemaphore(maxconn)
+        super().__init__(minconn, maxconn, *args, **kwargs)
 
-    if num_placeholders != len(params or []):
-        raise ValueError(
-            f"Mismatch: SQL expects {num_placeholders} params but got {len(params or [])}: {params}"
-        )
+    def getconn(self, key=None):
+        self._slots.acquire()
+        try:
+            return super().getconn(key)
+        except Exception:
+            self._slots.release()
+            raise
 
-    # Convert $1, $2... style placeholders to psycopg2's %s
-    sql = re.sub(r"\$\d+", "%s", sql)
+    def putconn(self, conn=None, key=None, close=False):
+        try:
+            super().putconn(conn, key, close)
+        finally:
+            self._slots.release()
 
-    # Enforce a LIMIT for safety (if not already in query)
-    if "limit" not in sql.lower():
-        sql = sql.rstrip("; ") + f" LIMIT {limit}"
 
-    # Connect to Postgres
-    conn = psycopg2.connect(**db_config)
-    cur = conn.cursor(cursor_factory=psycopg2.extras.RealDictCursor)
+# One pool per database config, shared by every session of the process
+_pools = {}
+_pools_lock = threading.Lock()
 
-    try:
-        print("DEBUG running query:", sql)
-        print("DEBUG params:", params, type(params))
-        # Count %s placeholders AFTER replacement
-        placeholder_count = sql.count("%s")
-        if placeholder_count != len(params or []):
-            raise ValueError(
-                f"SQL expects {placeholder_count} placeholders but got {len(params or [])} params: {params}"
-                )
 
-        cur.execute(sql, params or None)
+def get_pool(db_config):
+    """The process-wide connection pool for db_config, created on first use."""
+    key = tuple(sorted(db_config.items()))
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = BlockingConnectionPool(
+                    POOL_MIN_CONNECTIONS, POOL_MAX_CONNECTIONS, **db_config)
+    return pool
 
 
-        rows = cur.fetchall()
-    finally:
-        conn.close()
+def close_pools():
+    with _pools_lock:
+        for pool in _pools.values():
+            pool.closeall()
+        _pools.clear()
 
-    return rows
 
+@contextmanager
+def pooled_connection(db_config, timeout_ms=STATEMENT_TIMEOUT_MS):
+    """
+    A pooled connection inside a read-only transaction whose statements time
+    out after timeout_ms. The transaction is rolled back when the block ends,
+    so the connection goes back to the pool clean; a broken one is discarded.
+    """
+    pool = get_pool(db_config)
+    with span("run_query.connect"):
+        conn = pool.getconn()
+    try:
+        conn.readonly = True
+        with conn.cursor() as cur:
+            # SET LOCAL only lasts for this transaction, so the timeout never leaks to the next user
+            cur.execute("SET LOCAL statement_timeout = %s", (int(timeout_ms),))
+        yield conn
+    finally:
+        if not conn.closed:
+            try:
+                conn.rollback()
+            except psycopg2.Error:
+                pass
+        pool.putconn(conn, close=bool(conn.closed))
+
+
+def has_order_by(sql):
+    """True if the query itself ends in ORDER BY (one inside a subquery or a string does not count)."""
+    sql = re.sub(r"'(?:[^']|'')*'|\"(?:[^\"]|\"\")*\"", "''", sql)
+    depth = 0
+    for i, c in enumerate(sql):
+        if c == "(":
+            depth += 1
+        elif c == ")":
+            depth -= 1
+        elif depth == 0 and c in "oO" and (i == 0 or not (sql[i - 1].isalnum() or sql[i - 1] == "_")):
+            if re.match(r"order\s+by\b", sql[i:], re.IGNORECASE):
+                return True
+    return False
+
+
+def prepare_query(sql, params, limit=MAX_ROWS, offset=0):
+    """
+    Validates a generated SELECT and turns it into psycopg2 form: $1, $2...
+    placeholders become %s (params are repeated where a placeholder is), and
+    the query is wrapped so at most `limit` rows from `offset` are returned.
+    Without an ORDER BY of its own the rows are ordered by all their columns,
+    so consecutive pages neither repeat nor skip rows.
+    Returns (sql, params), with params None when the query takes none.
+    """
+    validate_sql_ast(sql)
+    params = list(params or [])
+    numbers = [int(n) for n in re.findall(r"\$(\d+)", sql)]
+    if len(set(numbers)) != len(params):
+        raise ValueError(f"Mismatch: SQL expects {len(set(numbers))} params but got {len(params)}: {params}")
+    missing = sorted({n for n in numbers if not 1 <= n <= len(params)})
+    if missing:
+        raise ValueError(f"SQL uses ${missing[0]} but only {len(params)} params were given: {params}")
+    sql = sql.strip().rstrip(";").strip()
+    ordered = [params[n - 1] for n in numbers]
+    if ordered:
+        # With params psycopg2 %-formats the query, so literal % (LIKE '%x%', modulo) must be doubled
+        sql = re.sub(r"\$\d+", "%s", sql.replace("%", "%%"))
+    # PostgreSQL only keeps a row order that the query asks for; ordering by the
+    # whole row (the subquery alias) compares every column left to right
+    order = "" if has_order_by(sql) else " ORDER BY _result"
+    # Wrapping also leaves a LIMIT the query already has in force; limit/offset are
+    # inlined as ints so a query without params is sent as-is, with params=None
+    return (f"SELECT * FROM ({sql}) AS _result{order} LIMIT {int(limit)} OFFSET {int(offset)}",
+            ordered or None)
+
+
+class QueryResult:
+    """Rows of a query as tuples, with the column names once instead of a dict per row."""
+
+    def __init__(self, columns, rows, truncated=False):
+        self.columns = columns
+        self.rows = rows
+        self.truncated = truncated   # more rows were available than were fetched
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __iter__(self):
+        return iter(self.rows)
+
+    def records(self):
+        """Rows as dicts, for callers that want the old RealDictCursor shape."""
+        return [dict(zip(self.columns, row)) for row in self.rows]
+
+    def to_arrow(self):
+        """Columnar pyarrow Table (pyarrow comes with Streamlit)."""
+        import pyarrow as pa
+        return pa.table({name: [row[i] for row in self.rows] for i, name in enumerate(self.columns)})
+
+
+def stream_query(sql, params, db_config, limit=MAX_ROWS, offset=0, fetch_size=FETCH_SIZE,
+                 timeout_ms=STATEMENT_TIMEOUT_MS):
+    """
+    Runs a generated SELECT on a named server-side cursor and yields
+    (columns, rows) batches of up to fetch_size tuples, so a large result is
+    never held in memory at once. The pooled connection is returned when the
+    generator is exhausted or closed.
+    """
+    sql, params = prepare_query(sql, params, limit, offset)
+    with pooled_connection(db_config, timeout_ms) as conn:
+        # Named cursor: rows stay on the server until fetched
+        with conn.cursor(name=f"rag_{uuid.uuid4().hex}") as cur:
+            cur.itersize = fetch_size
+            with span("run_query.execute"):
+                cur.execute(sql, params)
+            fetched = False
+            while True:
+                with span("run_query.fetch"):
+                    rows = cur.fetchmany(fetch_size)
+                # A named cursor only has a description once something was fetched
+                columns = [column.name for column in cur.description or ()]
+                if not rows:
+                    if not fetched:
+                        yield columns, []   # still report the columns of an empty result
+                    break
+                fetched = True
+                count("sql_rows", len(rows))
+                yield columns, rows
+
+
+@traced("run_query")
+def run_query(sql, params, db_config, limit=MAX_ROWS, offset=0, timeout_ms=STATEMENT_TIMEOUT_MS):
+    """
+    Executes a parameterized SELECT safely against PostgreSQL and returns
+    up to `limit` rows starting at `offset` as a QueryResult.
+    db_config should be a dict:
+        {
+            "dbname": "your_db",
+            "user": "your_user",
+            "password": "your_password",
+            "host": "localhost",
+            "port": 5432
+        }
+    """
+    columns, rows = [], []
+    # One extra row tells whether there is more to page through
+    for columns, batch in stream_query(sql, params, db_config, limit=limit + 1, offset=offset,
+                                       timeout_ms=timeout_ms):
+        rows.extend(batch)
+    return QueryResult(columns, rows[:limit], truncated=len(rows) > limit)
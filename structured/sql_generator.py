@@ -90,6 +90,9 @@ Output:
 import json
 import re
 
+from common.tracing import traced
+
+@traced("generate_sql")
 def generate_sql(schema_description, question, max_new_tokens=256):
     prompt = PROMPT_TEMPLATE.format(schema_description=schema_description, question=question)
     res = ollama_generate(prompt).strip()
@@ -2,13 +2,19 @@
 import os
 import json
 import re
-from openai import OpenAI
+import threading
 from dotenv import load_dotenv
 
+from common.openai_client import DEFAULT_DEADLINE, MAX_RETRIES, get_async_client
+from common.tracing import traced
+
 # Load API key from .env
 load_dotenv()
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-client = OpenAI(api_key=OPENAI_API_KEY)
+
+# Created on first use, so importing this module costs nothing
+_client = None
+_client_lock = threading.Lock()
 
 OPENAI_MODEL = "gpt-4o-mini"   # fast + cost-effective; change to "gpt-4o" if you want higher accuracy
 
@@ -45,20 +51,50 @@ User: {question}
 Output:
 """
 
-def generate_sql(schema_description, question, max_tokens=256):
+def get_client():
+    """Creates the OpenAI client once per process, on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=OPENAI_API_KEY, max_retries=MAX_RETRIES, timeout=DEFAULT_DEADLINE)
+    return _client
+
+def _messages(schema_description, question):
     prompt = PROMPT_TEMPLATE.format(schema_description=schema_description, question=question)
+    return [
+        {"role": "system", "content": "You are a precise SQL generator for PostgreSQL."},
+        {"role": "user", "content": prompt}
+    ]
 
-    response = client.chat.completions.create(
+@traced("generate_sql")
+def generate_sql(schema_description, question, max_tokens=256):
+    response = get_client().chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=_messages(schema_description, question),
+        max_tokens=max_tokens,
+        temperature=0
+    )
+    return parse_sql_response(response.choices[0].message.content)
+
+async def agenerate_sql(schema_description, question, max_tokens=256, deadline=DEFAULT_DEADLINE):
+    """
+    Async generate_sql through the shared OpenAI client layer (concurrency
+    and rate limits, retries with backoff, `deadline` seconds per call).
+    """
+    response = await get_async_client().chat(
+        _messages(schema_description, question),
         model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a precise SQL generator for PostgreSQL."},
-            {"role": "user", "content": prompt}
-        ],
+        deadline=deadline,
         max_tokens=max_tokens,
         temperature=0
     )
+    return parse_sql_response(response.choices[0].message.content)
 
-    res = response.choices[0].message.content.strip()
+def parse_sql_response(res):
+    """Extracts (sql, params) from the model's reply and repairs literal placeholders."""
+    res = res.strip()
 
     # --- Force JSON extraction ---
     start, end = res.find("{"), res.rfind("}")
@@ -0,0 +1,73 @@
+# AnswerCache with a stand-in embedder, so no sentence-transformers model is loaded.
+import asyncio
+import os
+import threading
+import types
+
+import numpy as np
+import pytest
+
+import unstructured.answer_cache as ac
+
+SNAPSHOT = types.SimpleNamespace(version="v1", embed_model="stand-in")
+CHUNKS = [{"id": 3, "text": "FatRat is a remote access tool."}]
+
+
+@pytest.fixture(autouse=True)
+def fake_encode(monkeypatch):
+    """A random vector per question text; records the thread each encode ran on."""
+    threads = []
+
+    def encode(texts, model_name=None):
+        threads.append(threading.current_thread())
+        return np.array([np.random.default_rng(sum(map(ord, t))).normal(size=16) for t in texts], dtype="float32")
+
+    monkeypatch.setattr(ac, "encode", encode)
+    return threads
+
+
+def test_answers_are_saved_after_the_delay_not_per_add(tmp_path):
+    cache = ac.AnswerCache(str(tmp_path), save_delay=60)
+    for i in range(3):
+        cache.get_or_generate("engine", f"question {i}", CHUNKS, SNAPSHOT, lambda q, c: f"answer to {q}")
+    assert not os.path.exists(tmp_path / "entries.json")   # nothing written while generating
+    cache.flush()
+    reloaded = ac.AnswerCache(str(tmp_path))
+    assert reloaded.stats()["entries"] == 3 and reloaded.stats()["misses"] == 3
+
+
+def test_timer_saves_a_burst_once(tmp_path, monkeypatch):
+    writes = []
+    cache = ac.AnswerCache(str(tmp_path), save_delay=0.1)
+    original = cache._write
+    monkeypatch.setattr(cache, "_write", lambda data, vectors: (writes.append(len(data["entries"])),
+                                                                 original(data, vectors)))
+    for i in range(5):
+        cache.get_or_generate("engine", f"question {i}", CHUNKS, SNAPSHOT, lambda q, c: "answer")
+    cache._save_timer.join(2)
+    assert writes == [5]
+    assert ac.AnswerCache(str(tmp_path)).stats()["entries"] == 5
+
+
+def test_hit_returns_cached_answer(tmp_path):
+    cache = ac.AnswerCache(str(tmp_path), save_delay=60)
+    calls = []
+    generate = lambda q, c: calls.append(q) or "fresh"
+    assert cache.get_or_generate("engine", "same question", CHUNKS, SNAPSHOT, generate) == "fresh"
+    assert cache.get_or_generate("engine", "same question", CHUNKS, SNAPSHOT, generate) == "fresh"
+    assert len(calls) == 1 and cache.stats()["hits"] == 1
+
+
+def test_async_lookup_encodes_off_the_event_loop(tmp_path, fake_encode):
+    cache = ac.AnswerCache(str(tmp_path), save_delay=60)
+
+    async def agenerate(question, chunks):
+        return "async answer"
+
+    async def main():
+        return await cache.aget_or_generate("engine", "question", CHUNKS, SNAPSHOT, agenerate), \
+            threading.current_thread()
+
+    answer, loop_thread = asyncio.run(main())
+    assert answer == "async answer"
+    assert fake_encode and fake_encode[0] is not loop_thread
@@ -0,0 +1,127 @@
+# AsyncOpenAIClient against the in-process mock server (no API key or network).
+import asyncio
+import random
+import time
+
+import openai
+import pytest
+
+import common.openai_client as oc
+from benchmarks.mock_openai_server import MOCK_ANSWER, start_mock_server
+
+MESSAGES = [{"role": "user", "content": "Hello"}]
+
+
+@pytest.fixture
+def mock_server():
+    """start(**options) -> (server stats, base_url); servers are shut down after the test."""
+    servers = []
+
+    def start(**options):
+        server, base_url = start_mock_server(**options)
+        servers.append(server)
+        return server.RequestHandlerClass.stats, base_url
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture(autouse=True)
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr(oc, "BACKOFF_BASE", 0.01)
+
+
+def run_calls(base_url, n=1, deadline=10.0, **client_options):
+    """Runs n concurrent chat calls on one client; returns (results or exceptions, client stats, seconds)."""
+    async def main():
+        client = oc.AsyncOpenAIClient(api_key="mock", base_url=base_url, **client_options)
+        try:
+            return await asyncio.gather(*(client.chat(MESSAGES, model="mock", deadline=deadline) for _ in range(n)),
+                                        return_exceptions=True), client.stats
+        finally:
+            await client.close()
+
+    start = time.perf_counter()
+    results, stats = asyncio.run(main())
+    return results, stats, time.perf_counter() - start
+
+
+@pytest.mark.parametrize("status", [429, 500])
+def test_retries_until_success(mock_server, status):
+    random.seed(0)
+    server_stats, base_url = mock_server(fail_rate=0.5, error_status=status, retry_after=0)
+    results, stats, _ = run_calls(base_url, n=12, max_retries=20)
+    assert all(r.choices[0].message.content == MOCK_ANSWER for r in results)
+    assert server_stats["errors"] > 0
+    assert stats["retries"] == server_stats["errors"] and stats["failures"] == 0
+
+
+def test_gives_up_after_max_retries(mock_server):
+    server_stats, base_url = mock_server(fail_rate=1.0, error_status=500)
+    results, stats, _ = run_calls(base_url, max_retries=2)
+    assert isinstance(results[0], openai.InternalServerError)
+    assert server_stats["requests"] == 3 and stats["retries"] == 2 and stats["failures"] == 1
+
+
+def test_respects_retry_after(mock_server, monkeypatch):
+    monkeypatch.setattr(oc, "BACKOFF_BASE", 0.0)   # any wait comes from the header
+    server_stats, base_url = mock_server(fail_rate=1.0, error_status=429, retry_after=0.3)
+    results, _, seconds = run_calls(base_url, max_retries=2)
+    assert isinstance(results[0], openai.RateLimitError)
+    assert server_stats["requests"] == 3
+    assert seconds >= 0.6
+
+
+def test_retry_after_past_deadline_raises_deadline_exceeded(mock_server):
+    server_stats, base_url = mock_server(fail_rate=1.0, error_status=429, retry_after=5)
+    results, stats, seconds = run_calls(base_url, deadline=1.0)
+    assert isinstance(results[0], oc.DeadlineExceeded)
+    assert server_stats["requests"] == 1 and stats["failures"] == 1
+    assert seconds < 1.0   # fails at once instead of sleeping into the deadline
+
+
+def test_slow_response_raises_deadline_exceeded(mock_server):
+    _, base_url = mock_server(latency=2.0)
+    results, _, seconds = run_calls(base_url, deadline=0.3)
+    assert isinstance(results[0], oc.DeadlineExceeded)
+    assert seconds < 1.5
+
+
+def test_caps_calls_in_flight(mock_server):
+    server_stats, base_url = mock_server(latency=0.1)
+    results, _, seconds = run_calls(base_url, n=6, max_concurrency=2)
+    assert not any(isinstance(r, Exception) for r in results)
+    assert server_stats["max_in_flight"] == 2
+    assert seconds >= 0.3
+
+
+def test_token_bucket_limits_request_rate(mock_server):
+    _, base_url = mock_server()
+    # Two requests start at once, the other three wait 0.1s each for a token
+    results, _, seconds = run_calls(base_url, n=5, requests_per_minute=600, burst=2)
+    assert not any(isinstance(r, Exception) for r in results)
+    assert seconds >= 0.25
+
+
+def test_agenerate_answer_and_sql_end_to_end(mock_server, monkeypatch):
+    random.seed(1)
+    _, base_url = mock_server(fail_rate=0.3, retry_after=0)
+    monkeypatch.setenv("OPENAI_BASE_URL", base_url)
+    monkeypatch.setenv("OPENAI_API_KEY", "mock")
+    from structured.sql_generator_openai import agenerate_sql
+    from unstructured.query_bot_openai import agenerate_answer
+
+    chunks = [{"id": 0, "text": "FatRat is a remote access tool.", "source": "tools.txt", "distance": 0.1}]
+
+    async def main():
+        answers = asyncio.gather(*(agenerate_answer(f"What is FatRat? ({i})", chunks, use_cache=False)
+                                   for i in range(5)))
+        queries = asyncio.gather(*(agenerate_sql("employees(id, name)", f"List employees ({i})")
+                                   for i in range(5)))
+        return await answers, await queries
+
+    answers, queries = asyncio.run(main())
+    assert answers == [MOCK_ANSWER] * 5
+    assert queries == [("SELECT 1", [])] * 5
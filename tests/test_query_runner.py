@@ -0,0 +1,239 @@
+# Stand-in connections replace PostgreSQL, so these run without a database server.
+import re
+import threading
+from collections import namedtuple
+
+import psycopg2
+import psycopg2.extensions
+import pytest
+
+import structured.query_runner as qr
+
+Column = namedtuple("Column", "name")
+
+
+class FakeCursor:
+    """Cursor of FakeConnection: formats params like psycopg2 and applies the wrapper's LIMIT/OFFSET."""
+
+    def __init__(self, conn, name=None):
+        self.conn = conn
+        self.name = name
+        self.itersize = 2000
+        self.description = None
+        self._rows = []
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def execute(self, sql, params=None):
+        if params is not None:
+            sql = sql % tuple(repr(p) for p in params)   # psycopg2 %-formats only when params are given
+        self.conn.executed.append((self.name, sql))
+        self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INTRANS
+        if self.conn.fail:
+            self.conn.status = psycopg2.extensions.TRANSACTION_STATUS_INERROR
+            raise psycopg2.errors.QueryCanceled("canceling statement due to statement timeout")
+        match = re.search(r"LIMIT (\d+) OFFSET (\d+)$", sql)
+        if match:
+            limit, offset = int(match.group(1)), int(match.group(2))
+            self._rows = self.conn.rows[offset:offset + limit]
+
+    def fetchmany(self, size):
+        self.conn.fetches.append(size)
+        # Like a named cursor, the description is only known once something was fetched
+        self.description = [Column(name) for name in self.conn.columns]
+        rows, self._rows = self._rows[:size], self._rows[size:]
+        return rows
+
+
+class FakeConnection:
+    def __init__(self, columns=("n", "doubled"), rows=None):
+        self.columns = columns
+        self.rows = rows if rows is not None else [(n, n * 2) for n in range(1, 11)]
+        self.readonly = False
+        self.closed = 0
+        self.fail = False
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+        self.executed, self.fetches, self.cursors = [], [], []
+        self.rollbacks = 0
+
+    @property
+    def info(self):
+        return type("Info", (), {"transaction_status": self.status})()
+
+    def cursor(self, name=None):
+        cursor = FakeCursor(self, name)
+        self.cursors.append(cursor)
+        return cursor
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = 1
+
+
+DB = {"dbname": "test_db", "user": "test", "host": "localhost"}
+
+
+@pytest.fixture
+def connections(monkeypatch):
+    """Every connection the pools open, in order."""
+    opened = []
+
+    def connect(*args, **kwargs):
+        conn = FakeConnection()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(psycopg2, "connect", connect)
+    yield opened
+    qr.close_pools()
+
+
+# ---- prepare_query ----
+
+def test_prepare_query_orders_and_repeats_params():
+    sql, params = qr.prepare_query(
+        "SELECT * FROM emp WHERE dept = $2 AND salary > $1 OR manager_dept = $2", [50000, "HR"])
+    assert sql.count("%s") == 3 and "$" not in sql
+    assert params == ["HR", 50000, "HR"]
+
+
+@pytest.mark.parametrize("sql, params", [
+    ("SELECT * FROM emp WHERE dept = $1", []),                      # missing
+    ("SELECT * FROM emp WHERE dept = $1", ["HR", 10]),              # extra
+    ("SELECT * FROM emp WHERE dept = $1 AND salary > $3", ["HR", 10]),   # gap in numbering
+])
+def test_prepare_query_rejects_param_mismatch(sql, params):
+    with pytest.raises(ValueError):
+        qr.prepare_query(sql, params)
+
+
+def test_prepare_query_wraps_subqueries_with_limit_and_offset():
+    sql, params = qr.prepare_query(
+        "SELECT name FROM emp WHERE dept_id IN (SELECT id FROM dept WHERE name = $1) LIMIT 5", ["HR"],
+        limit=20, offset=40)
+    assert sql == ("SELECT * FROM (SELECT name FROM emp WHERE dept_id IN (SELECT id FROM dept WHERE name = %s) "
+                   "LIMIT 5) AS _result ORDER BY _result LIMIT 20 OFFSET 40")
+    assert params == ["HR"]
+
+
+def test_prepare_query_keeps_the_query_order():
+    sql, _ = qr.prepare_query("SELECT name, salary FROM emp ORDER BY salary DESC, id", None, limit=10, offset=10)
+    assert sql == "SELECT * FROM (SELECT name, salary FROM emp ORDER BY salary DESC, id) AS _result LIMIT 10 OFFSET 10"
+
+
+@pytest.mark.parametrize("sql, expected", [
+    ("SELECT a FROM t ORDER BY a", True),
+    ("select a from t\norder\n  by a desc limit 5", True),
+    ("SELECT a FROM (SELECT a FROM t ORDER BY a) AS s", False),           # subquery only
+    ("SELECT a, row_number() OVER (ORDER BY a) FROM t", False),           # window only
+    ("SELECT 'order by' AS label FROM t", False),                         # string literal
+    ('SELECT a AS "order by" FROM t', False),                             # quoted identifier
+    ("SELECT border_by, x_order FROM t", False),
+])
+def test_has_order_by(sql, expected):
+    assert qr.has_order_by(sql) is expected
+
+
+def test_prepare_query_rejects_non_select():
+    with pytest.raises(ValueError):
+        qr.prepare_query("DELETE FROM emp", [])
+
+
+def test_prepare_query_without_params_keeps_percent_signs():
+    # Regression: LIMIT/OFFSET used to be bound params, so psycopg2 %-formatted queries like this one
+    sql, params = qr.prepare_query("SELECT name FROM emp WHERE name LIKE '%smith%' AND id % 2 = 0", None)
+    assert params is None
+    assert "LIKE '%smith%' AND id % 2 = 0" in sql
+
+
+def test_prepare_query_with_params_escapes_percent_signs():
+    sql, params = qr.prepare_query("SELECT name FROM emp WHERE name LIKE '%smith%' AND dept = $1", ["HR"])
+    assert sql % tuple(repr(p) for p in params) == (
+        "SELECT * FROM (SELECT name FROM emp WHERE name LIKE '%smith%' AND dept = 'HR') AS _result "
+        f"ORDER BY _result LIMIT {qr.MAX_ROWS} OFFSET 0")
+
+
+# ---- run_query / QueryResult ----
+
+def test_run_query_pages_and_reports_truncation(connections):
+    first = qr.run_query("SELECT n, n * 2 AS doubled FROM t", [], DB, limit=4)
+    assert first.columns == ["n", "doubled"]
+    assert [row[0] for row in first] == [1, 2, 3, 4] and first.truncated
+    last = qr.run_query("SELECT n, n * 2 AS doubled FROM t", [], DB, limit=4, offset=8)
+    assert [row[0] for row in last] == [9, 10] and not last.truncated
+    assert last.records() == [{"n": 9, "doubled": 18}, {"n": 10, "doubled": 20}]
+
+
+def test_run_query_empty_result_keeps_columns(connections):
+    result = qr.run_query("SELECT n, n * 2 AS doubled FROM t", [], DB, offset=100)
+    assert result.columns == ["n", "doubled"] and len(result) == 0 and not result.truncated
+
+
+def test_run_query_with_literal_percent(connections):
+    result = qr.run_query("SELECT n FROM t WHERE label LIKE '%a%'", None, DB, limit=2)
+    assert len(result) == 2
+    _, sql = connections[0].executed[-1]
+    assert "LIKE '%a%'" in sql
+
+
+# ---- pool and server-side cursors ----
+
+def test_stream_query_uses_named_cursor_in_a_readonly_timed_transaction(connections):
+    batches = list(qr.stream_query("SELECT n, n * 2 AS doubled FROM t", [], DB, limit=10, fetch_size=4,
+                                   timeout_ms=1234))
+    assert [len(rows) for _, rows in batches] == [4, 4, 2]
+    conn = connections[0]
+    assert conn.readonly
+    assert conn.executed[0] == (None, "SET LOCAL statement_timeout = 1234")
+    name, _ = conn.executed[1]
+    assert name and name.startswith("rag_")
+    assert conn.fetches == [4, 4, 4, 4]
+    assert conn.rollbacks == 1   # transaction ended before the connection went back
+
+
+def test_pool_blocks_when_exhausted(connections):
+    pool = qr.BlockingConnectionPool(0, 1, **DB)
+    conn = pool.getconn()
+    got = []
+    waiter = threading.Thread(target=lambda: got.append(pool.getconn()))
+    waiter.start()
+    waiter.join(0.2)
+    assert waiter.is_alive() and not got   # waits instead of raising PoolError
+    pool.putconn(conn)
+    waiter.join(2)
+    assert got and not waiter.is_alive()
+    pool.putconn(got[0])
+    pool.closeall()
+
+
+def test_failed_query_rolls_back_and_returns_connection(connections, monkeypatch):
+    monkeypatch.setattr(qr, "POOL_MAX_CONNECTIONS", 1)
+    connections_before = len(connections)
+    with pytest.raises(psycopg2.errors.QueryCanceled):
+        with qr.pooled_connection(DB) as conn:
+            conn.fail = True
+            with conn.cursor() as cur:
+                cur.execute("SELECT pg_sleep(60)")
+    assert conn.rollbacks == 1 and not conn.closed
+    conn.fail = False
+    # The only slot is free again, and the same connection is reused
+    result = qr.run_query("SELECT n FROM t", [], DB, limit=1)
+    assert len(result) == 1
+    assert len(connections) == connections_before + 1 and connections[-1] is conn
+
+
+def test_broken_connection_is_discarded(connections, monkeypatch):
+    monkeypatch.setattr(qr, "POOL_MAX_CONNECTIONS", 1)
+    with pytest.raises(psycopg2.OperationalError):
+        with qr.pooled_connection(DB) as conn:
+            conn.close()
+            raise psycopg2.OperationalError("server closed the connection unexpectedly")
+    qr.run_query("SELECT n FROM t", [], DB, limit=1)
+    assert len(connections) == 2 and connections[1] is not conn
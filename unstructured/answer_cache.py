@@ -0,0 +1,271 @@
+# answer_cache.py
+
+import asyncio
+import atexit
+import json
+import os
+import threading
+import time
+
+import numpy as np
+
+from .model_registry import encode
+
+# ==== CONFIG ====
+CACHE_DIR = "data/answer_cache"
+SIMILARITY_THRESHOLD = 0.92     # cosine similarity of query embeddings needed for a hit
+TTL_SECONDS = 24 * 3600         # answers older than this are regenerated
+MAX_ENTRIES = 5000              # least recently used answers are evicted above this
+SAVE_DELAY_SECONDS = 5.0        # new answers reach disk at most this long after they were added (and at exit)
+# ================
+
+_cache = None
+_lock = threading.Lock()
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    A question hits when an earlier one for the same engine had a query
+    embedding within SIMILARITY_THRESHOLD (cosine) *and* retrieved exactly
+    the same chunk ids, so a near-duplicate wording is only served the old
+    answer if the answer was built from the same context. Every entry
+    belongs to one index snapshot; when a new snapshot goes live the whole
+    cache is dropped, since its chunk ids may now point at other content.
+
+    On disk the cache is two files, both replaced atomically when it is
+    saved. Saving happens on a background timer SAVE_DELAY_SECONDS after
+    the first unsaved answer, so a burst of answers costs one write and
+    generators never wait for the disk, and once more at exit:
+        vectors.npy   normalized float32 query embeddings, one row per entry
+        entries.json  snapshot version, stats and per-entry engine, chunk ids,
+                      answer and created/last-used times
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, threshold=SIMILARITY_THRESHOLD,
+                 ttl=TTL_SECONDS, max_entries=MAX_ENTRIES, save_delay=SAVE_DELAY_SECONDS):
+        self.path = cache_dir
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.save_delay = save_delay
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()   # one writer of the files at a time
+        self._save_timer = None
+        self._dirty = False
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+        atexit.register(self.flush)
+
+    # ---- persistence ----
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _reset(self, snapshot=None):
+        self.snapshot = snapshot
+        self.entries = []
+        self.vectors = None
+
+    def _load(self):
+        self.hits = self.misses = 0
+        self._reset()
+        try:
+            with open(self._file("entries.json"), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            vectors = np.load(self._file("vectors.npy"))
+        except (FileNotFoundError, ValueError):
+            return
+        if len(vectors) != len(data["entries"]):
+            print("⚠ Answer cache is inconsistent, resetting it")
+            return
+        self.snapshot = data["snapshot"]
+        self.entries = data["entries"]
+        self.vectors = vectors if len(vectors) else None
+        self.hits = data.get("hits", 0)
+        self.misses = data.get("misses", 0)
+
+    def _write(self, data, vectors):
+        # Both files are staged first; a crash between the two renames is caught by the length check
+        vectors = vectors if vectors is not None else np.empty((0, 0), dtype="float32")
+        tmp = self._file("vectors.tmp.npy")
+        np.save(tmp, vectors)
+        tmp_json = self._file("entries.json.tmp")
+        with open(tmp_json, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_json, self._file("entries.json"))
+        os.replace(tmp, self._file("vectors.npy"))
+
+    def _schedule_save(self):
+        # Called with self._lock held
+        self._dirty = True
+        if self._save_timer is None:
+            self._save_timer = threading.Timer(self.save_delay, self.flush)
+            self._save_timer.daemon = True
+            self._save_timer.start()
+
+    def flush(self):
+        """Writes unsaved changes to disk now."""
+        with self._save_lock:
+            with self._lock:
+                if self._save_timer is not None:
+                    self._save_timer.cancel()
+                    self._save_timer = None
+                if not self._dirty:
+                    return
+                self._dirty = False
+                # Copied under the lock, written without it: vectors is replaced (never modified) on change
+                data = {"snapshot": self.snapshot, "hits": self.hits, "misses": self.misses,
+                        "entries": [dict(e) for e in self.entries]}
+                vectors = self.vectors
+            self._write(data, vectors)
+
+    # ---- cache operations ----
+    def _check_snapshot(self, snapshot):
+        if snapshot != self.snapshot:
+            if self.entries:
+                print(f"🧽 Index snapshot changed, dropping {len(self.entries)} cached answers")
+            self._reset(snapshot)
+
+    def _drop(self, keep):
+        keep = np.asarray(keep, dtype=bool)
+        self.entries = [e for e, k in zip(self.entries, keep) if k]
+        self.vectors = self.vectors[keep] if keep.any() else None
+
+    def lookup(self, engine, query_vec, chunk_ids, snapshot):
+        """
+        Returns the cached answer for this engine, context and a similar enough
+        query, or None.
+        """
+        now = time.time()
+        chunk_ids = sorted(chunk_ids)
+        with self._lock:
+            self._check_snapshot(snapshot)
+            answer = None
+            if self.entries:
+                sims = self.vectors @ query_vec
+                for i in np.argsort(-sims):
+                    if sims[i] < self.threshold:
+                        break
+                    entry = self.entries[i]
+                    if now - entry["created"] > self.ttl:
+                        continue
+                    if entry["engine"] == engine and entry["chunk_ids"] == chunk_ids:
+                        entry["last_used"] = now
+                        answer = entry["answer"]
+                        break
+            if answer is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+            self._dirty = True   # stats and last-used times are saved with the next answer or at exit
+            return answer
+
+    def add(self, engine, query_vec, chunk_ids, snapshot, answer):
+        """Stores a generated answer, expiring and evicting old entries as needed."""
+        now = time.time()
+        with self._lock:
+            self._check_snapshot(snapshot)
+            self.entries.append({"engine": engine, "chunk_ids": sorted(chunk_ids), "answer": answer,
+                                 "created": now, "last_used": now})
+            row = query_vec[None, :].astype("float32")
+            self.vectors = row if self.vectors is None else np.vstack([self.vectors, row])
+
+            self._drop([now - e["created"] <= self.ttl for e in self.entries])
+            if len(self.entries) > self.max_entries:
+                last_used = np.array([e["last_used"] for e in self.entries])
+                keep = np.zeros(len(self.entries), dtype=bool)
+                keep[np.argsort(-last_used)[:self.max_entries]] = True
+                self._drop(keep)
+            self._schedule_save()
+
+    def _key(self, question, context_chunks, snapshot):
+        query_vec = encode([question], model_name=snapshot.embed_model)[0]
+        query_vec /= max(np.linalg.norm(query_vec), 1e-12)
+        return query_vec, [c["id"] for c in context_chunks]
+
+    def get_or_generate(self, engine, question, context_chunks, snapshot, generate):
+        """
+        Returns a cached answer for (question, context_chunks) or calls
+        generate(question, context_chunks) and caches its result.
+
+        Args:
+            engine (str): Generator identity, e.g. "openai:gpt-4o-mini"; engines never share answers.
+            snapshot: The index Snapshot the chunks were retrieved from.
+            generate (callable): The uncached answer function.
+        """
+        if snapshot is None:
+            return generate(question, context_chunks)
+        query_vec, chunk_ids = self._key(question, context_chunks, snapshot)
+
+        answer = self.lookup(engine, query_vec, chunk_ids, snapshot.version)
+        if answer is not None:
+            print(f"♻️ Answer cache hit (hit rate {self.hit_rate():.0%})")
+            return answer
+        answer = generate(question, context_chunks)
+        self.add(engine, query_vec, chunk_ids, snapshot.version, answer)
+        return answer
+
+    async def aget_or_generate(self, engine, question, context_chunks, snapshot, agenerate):
+        """Async variant of get_or_generate; agenerate is awaited on a miss."""
+        if snapshot is None:
+            return await agenerate(question, context_chunks)
+        # The query embedding is a model forward pass; keep it off the event loop
+        query_vec, chunk_ids = await asyncio.get_running_loop().run_in_executor(
+            None, self._key, question, context_chunks, snapshot)
+
+        answer = self.lookup(engine, query_vec, chunk_ids, snapshot.version)
+        if answer is not None:
+            return answer
+        answer = await agenerate(question, context_chunks)
+        self.add(engine, query_vec, chunk_ids, snapshot.version, answer)
+        return answer
+
+    def stream_or_generate(self, engine, question, context_chunks, snapshot, stream):
+        """
+        Streaming variant of get_or_generate: yields a cached answer in one
+        piece, or the pieces of stream(question, context_chunks), caching the
+        joined answer once the stream completes.
+        """
+        if snapshot is None:
+            yield from stream(question, context_chunks)
+            return
+        query_vec, chunk_ids = self._key(question, context_chunks, snapshot)
+
+        answer = self.lookup(engine, query_vec, chunk_ids, snapshot.version)
+        if answer is not None:
+            print(f"♻️ Answer cache hit (hit rate {self.hit_rate():.0%})")
+            yield answer
+            return
+        pieces = []
+        for piece in stream(question, context_chunks):
+            pieces.append(piece)
+            yield piece
+        # Only reached when the stream was read to the end, so partial answers are never cached
+        self.add(engine, query_vec, chunk_ids, snapshot.version, "".join(pieces))
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
+
+    def stats(self):
+        """Entries, hits, misses and hit rate since the cache was created."""
+        with self._lock:
+            return {"entries": len(self.entries), "hits": self.hits, "misses": self.misses,
+                    "hit_rate": round(self.hit_rate(), 3), "snapshot": self.snapshot}
+
+    def clear(self):
+        with self._lock:
+            self._reset(self.snapshot)
+            self._dirty = True
+        self.flush()
+
+
+def get_answer_cache():
+    """Process-wide answer cache shared by both bots."""
+    global _cache
+    if _cache is None:
+        with _lock:
+            if _cache is None:
+                _cache = AnswerCache()
+    return _cache
@@ -0,0 +1,243 @@
+# chunk_store.py
+
+import json
+import mmap
+import os
+import pickle
+
+import numpy as np
+
+# Metadata columns: name -> (dtype, dictionary-encoded)
+# Dictionary-encoded columns store a small integer code per chunk plus one shared value list.
+# page_start/page_end are 1-based PDF pages a chunk spans; 0 for formats without pages.
+COLUMNS = {
+    "source": ("uint32", True),
+    "page_start": ("uint32", False),
+    "page_end": ("uint32", False),
+}
+
+
+class ChunkStore:
+    """
+    Append-only, memory-mapped store of chunk texts and metadata.
+
+    A store is a directory of flat files:
+        texts.bin     UTF-8 chunk texts, back to back
+        offsets.bin   uint64 end offset of each chunk in texts.bin
+        <column>.bin  one fixed-width value per chunk for each metadata column
+        vectors.bin   float32 embedding of each chunk (used to train and rebuild indexes)
+        meta.json     committed row count, vector dim, column dtypes and dictionaries
+
+    Row i of the store is vector i of the FAISS index. Readers only touch
+    the rows they fetch, and appends write to the end of each file before
+    atomically replacing meta.json, so nothing is rewritten and a reader
+    never sees a half-written row.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._maps = []
+        self._load()
+
+    # ---- opening ----
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _load(self):
+        self.close()
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        else:
+            meta = {"count": 0, "text_bytes": 0, "columns": {}, "dictionaries": {}}
+        self.count = meta["count"]
+        self.text_bytes = meta["text_bytes"]
+        self.dim = meta.get("dim")
+        self.columns = meta["columns"]
+        self.dictionaries = meta["dictionaries"]
+        self._codes = {name: {v: i for i, v in enumerate(values)} for name, values in self.dictionaries.items()}
+
+        self._offsets = self._texts = self._vectors = None
+        self._columns = {}
+        if self.count:
+            self._offsets = np.memmap(self._file("offsets.bin"), dtype="uint64", mode="r", shape=(self.count,))
+            if self.text_bytes:
+                with open(self._file("texts.bin"), "rb") as f:
+                    self._texts = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self._maps.append(self._texts)
+            for name, dtype in self.columns.items():
+                self._columns[name] = np.memmap(self._file(f"{name}.bin"), dtype=dtype, mode="r",
+                                                shape=(self.count,))
+            if self.dim:
+                self._vectors = np.memmap(self._file("vectors.bin"), dtype="float32", mode="r",
+                                          shape=(self.count, self.dim))
+
+    def close(self):
+        for m in getattr(self, "_maps", []):
+            m.close()
+        self._maps = []
+
+    def __len__(self):
+        return self.count
+
+    # ---- reading ----
+    def text(self, i):
+        start = int(self._offsets[i - 1]) if i > 0 else 0
+        end = int(self._offsets[i])
+        return self._texts[start:end].decode("utf-8") if end > start else ""
+
+    def metadata(self, i):
+        meta = {}
+        for name, column in self._columns.items():
+            value = column[i].item()
+            meta[name] = self.dictionaries[name][value] if name in self.dictionaries else value
+        return meta
+
+    def get(self, ids):
+        """Fetches (text, metadata) for the given row ids only."""
+        return [(self.text(i), self.metadata(i)) for i in ids]
+
+    def column(self, name):
+        """Returns the raw (memory-mapped) values of a metadata column."""
+        return self._columns[name]
+
+    def vectors(self):
+        """Returns the (memory-mapped) float32 embeddings of all rows, or None if not stored."""
+        return self._vectors
+
+    def values(self, name):
+        """Returns the distinct values seen so far in a dictionary-encoded column."""
+        return list(self.dictionaries.get(name, []))
+
+    # ---- writing ----
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({
+                "count": self.count,
+                "text_bytes": self.text_bytes,
+                "dim": self.dim,
+                "columns": self.columns,
+                "dictionaries": self.dictionaries,
+            }, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _truncate_uncommitted(self):
+        """Drops bytes past the committed row count (left by an interrupted append)."""
+        sizes = {"texts.bin": self.text_bytes, "offsets.bin": 8 * self.count,
+                 "vectors.bin": 4 * (self.dim or 0) * self.count}
+        for name, dtype in self.columns.items():
+            sizes[f"{name}.bin"] = np.dtype(dtype).itemsize * self.count
+        for name, size in sizes.items():
+            file_path = self._file(name)
+            if os.path.exists(file_path) and os.path.getsize(file_path) != size:
+                with open(file_path, "r+b") as f:
+                    f.truncate(size)
+
+    def _ensure_column(self, name):
+        if name in self.columns:
+            return
+        if name not in COLUMNS:
+            raise ValueError(f"Unknown chunk metadata field: {name}")
+        dtype, dictionary = COLUMNS[name]
+        # Existing rows get a zero value for a newly introduced column
+        np.zeros(self.count, dtype=dtype).tofile(self._file(f"{name}.bin"))
+        self.columns[name] = dtype
+        if dictionary:
+            self.dictionaries[name] = []
+            self._codes[name] = {}
+
+    def _encode(self, name, value):
+        if name not in self.dictionaries:
+            return value
+        codes = self._codes[name]
+        if value not in codes:
+            codes[value] = len(self.dictionaries[name])
+            self.dictionaries[name].append(value)
+        return codes[value]
+
+    def append(self, texts, metadatas, vectors=None):
+        """
+        Appends chunks, their metadata dicts and (optionally) their embeddings.
+
+        Returns:
+            int: row id of the first new chunk.
+        """
+        first_id = self.count
+        if not texts:
+            return first_id
+        if vectors is not None and self.dim is None and self.count:
+            vectors = None  # legacy store migrated without its index stays text-only
+        if vectors is not None:
+            vectors = np.ascontiguousarray(vectors, dtype="float32")
+            if self.dim is None and self.count == 0:
+                self.dim = int(vectors.shape[1])
+            if vectors.shape != (len(texts), self.dim):
+                raise ValueError(f"Expected vectors of shape {(len(texts), self.dim)}, got {vectors.shape}")
+        elif self.dim is not None:
+            raise ValueError("This store keeps embeddings; pass vectors to append()")
+        os.makedirs(self.path, exist_ok=True)
+        self.close()
+        self._truncate_uncommitted()
+
+        for name in {k for m in metadatas for k in m}:
+            self._ensure_column(name)
+
+        encoded = [t.encode("utf-8") for t in texts]
+        offsets = self.text_bytes + np.cumsum([len(b) for b in encoded], dtype="uint64")
+        with open(self._file("texts.bin"), "ab") as f:
+            f.write(b"".join(encoded))
+        with open(self._file("offsets.bin"), "ab") as f:
+            f.write(offsets.tobytes())
+        for name, dtype in self.columns.items():
+            values = [self._encode(name, m[name]) if name in m else 0 for m in metadatas]
+            with open(self._file(f"{name}.bin"), "ab") as f:
+                f.write(np.asarray(values, dtype=dtype).tobytes())
+        if vectors is not None:
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(vectors.tobytes())
+
+        self.count += len(texts)
+        self.text_bytes = int(offsets[-1])
+        self._write_meta()
+        self._load()
+        return first_id
+
+
+def migrate_pickle(pickle_path, store_path, faiss_path=None):
+    """
+    Converts a legacy {"texts": [...], "metadata": [...]} pickle into a chunk store.
+    When the matching flat FAISS index is given, its vectors are copied into the store too.
+    """
+    with open(pickle_path, "rb") as f:
+        data = pickle.load(f)
+
+    vectors = None
+    if faiss_path and os.path.exists(faiss_path):
+        import faiss
+
+        index = faiss.read_index(faiss_path)
+        if index.ntotal == len(data["texts"]):
+            vectors = index.reconstruct_n(0, index.ntotal)
+
+    store = ChunkStore(store_path)
+    store.append(data["texts"], data["metadata"], vectors=vectors)
+    print(f"📦 Migrated {len(store)} chunks from {pickle_path} to {store_path}")
+    return store
+
+
+def load_chunk_store(store_path, legacy_pickle=None, faiss_path=None):
+    """Opens the chunk store, migrating the legacy pickle on first use if one exists."""
+    if not os.path.exists(os.path.join(store_path, "meta.json")) and legacy_pickle and os.path.exists(legacy_pickle):
+        return migrate_pickle(legacy_pickle, store_path, faiss_path=faiss_path)
+    return ChunkStore(store_path)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) not in (3, 4):
+        print("Usage: python -m unstructured.chunk_store <legacy.pkl> <store_dir> [faiss.index]")
+        sys.exit(1)
+    migrate_pickle(*sys.argv[1:])
@@ -0,0 +1,120 @@
+# context_packer.py
+
+import threading
+
+# ==== CONFIG ====
+MAX_OVERLAP_CHARS = 200   # longest chunk overlap looked for when merging neighbours (splitter uses 50)
+MIN_OVERLAP_CHARS = 8     # shorter suffix/prefix matches are treated as coincidence
+# ================
+
+_local = threading.local()
+
+
+def approx_token_count(text):
+    """Rough token count (~4 characters per token) when no tokenizer is available."""
+    return len(text) // 4 + 1
+
+
+def tiktoken_counter(model):
+    """Token counter for an OpenAI model; falls back to approx_token_count without tiktoken."""
+    try:
+        import tiktoken
+    except ImportError:
+        return approx_token_count
+    try:
+        encoding = tiktoken.encoding_for_model(model)
+    except KeyError:
+        encoding = tiktoken.get_encoding("o200k_base")
+    return lambda text: len(encoding.encode(text, disallowed_special=()))
+
+
+def strip_overlap(previous, text):
+    """Removes the prefix of text that repeats the end of previous (the splitter's chunk overlap)."""
+    for size in range(min(MAX_OVERLAP_CHARS, len(previous), len(text)), MIN_OVERLAP_CHARS - 1, -1):
+        if previous.endswith(text[:size]):
+            return text[size:]
+    return None
+
+
+def merge_adjacent(chunks):
+    """
+    Groups retrieved chunks that are neighbours in the same document
+    (same source, consecutive store ids) and joins each group into one
+    passage with the repeated overlap removed.
+
+    Returns:
+        List[dict]: groups in order of their best-ranked member, each with
+        "text", "source", "ids" and "rank".
+    """
+    ranked = [dict(c, rank=rank) for rank, c in enumerate(chunks)]
+    by_position = sorted(ranked, key=lambda c: (c["source"], c["id"]))
+    groups = []
+    for chunk in by_position:
+        last = groups[-1] if groups else None
+        if last and last["source"] == chunk["source"] and chunk["id"] == last["ids"][-1] + 1:
+            rest = strip_overlap(last["text"], chunk["text"])
+            last["text"] += rest if rest is not None else "\n" + chunk["text"]
+            last["ids"].append(chunk["id"])
+            last["members"].append(chunk)
+            last["rank"] = min(last["rank"], chunk["rank"])
+        else:
+            groups.append({"text": chunk["text"], "source": chunk["source"], "ids": [chunk["id"]],
+                           "members": [chunk], "rank": chunk["rank"]})
+    return sorted(groups, key=lambda g: g["rank"])
+
+
+def pack_context(chunks, count_tokens=approx_token_count, budget=None, separator="\n\n"):
+    """
+    Builds the context for the LLM prompt from retrieved chunks.
+
+    Neighbouring chunks of the same document are merged without their
+    overlap, then passages are added in order of relevance while they fit
+    within `budget` tokens (a passage that does not fit is replaced by its
+    most relevant chunk if that fits). The report is also kept for the
+    calling thread, see last_report().
+
+    Args:
+        chunks (List[dict]): Retrieved chunks ("id", "text", "source"), most relevant first.
+        count_tokens (callable): Token counter of the engine's tokenizer.
+        budget (int): Maximum context tokens; None packs everything.
+
+    Returns:
+        (str, dict): the context text and a report of tokens before/after packing.
+    """
+    naive_tokens = count_tokens(separator.join(c["text"] for c in chunks)) if chunks else 0
+    sep_tokens = count_tokens(separator) if chunks else 0
+    used, parts, total = [], [], 0
+    for group in merge_adjacent(chunks):
+        candidates = [group]
+        if len(group["members"]) > 1:
+            best = min(group["members"], key=lambda c: c["rank"])
+            candidates.append({"text": best["text"], "ids": [best["id"]]})
+        for candidate in candidates:
+            tokens = count_tokens(candidate["text"]) + (sep_tokens if parts else 0)
+            if budget is None or total + tokens <= budget:
+                parts.append(candidate["text"])
+                used.extend(candidate["ids"])
+                total += tokens
+                break
+
+    context = separator.join(parts)
+    packed_tokens = count_tokens(context) if parts else 0
+    report = {
+        "chunks": len(chunks),
+        "chunks_used": len(used),
+        "naive_tokens": naive_tokens,
+        "tokens": packed_tokens,
+        "saved_tokens": naive_tokens - packed_tokens,
+        "budget": budget,
+    }
+    _local.report = report
+    return context, report
+
+
+def last_report():
+    """Report of the last pack_context() call in this thread, or None."""
+    return getattr(_local, "report", None)
+
+
+def clear_last_report():
+    _local.report = None
@@ -3,57 +3,159 @@
 
 # embedder.py
 
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from sentence_transformers import SentenceTransformer
 import faiss
 import os
-import pickle
+import shutil
+from bisect import bisect_right
 import numpy as np
+from .model_registry import EMBED_MODEL, ENCODE_BATCH_SIZE, encode, get_tokenizer
+from .embedding_cache import get_embedding_cache
+from .chunk_store import ChunkStore
+from .index_factory import INDEX_KIND, build_index
+from .text_splitter import RecursiveTextSplitter, token_length_function
+from common.tracing import count, traced
 
-def chunk_text(text, chunk_size=500, chunk_overlap=50):
+# ==== CONFIG ====
+CHUNK_UNIT = "chars"          # "tokens" measures chunks with the embedding model's tokenizer
+CHUNK_SIZES = {               # default (chunk_size, chunk_overlap) per unit
+    "chars": (500, 50),
+    "tokens": (200, 20),      # all-MiniLM-L6-v2 truncates inputs at 256 tokens
+}
+CHUNK_WINDOW_CHARS = 32768    # text buffered before chunking when streaming pages
+# ================
+
+_splitters = {}
+
+def get_splitter(chunk_size=None, chunk_overlap=None, unit=CHUNK_UNIT):
+    """Shared RecursiveTextSplitter for a chunk size/overlap in "chars" or "tokens"."""
+    default_size, default_overlap = CHUNK_SIZES[unit]
+    key = (chunk_size or default_size, default_overlap if chunk_overlap is None else chunk_overlap, unit)
+    splitter = _splitters.get(key)
+    if splitter is None:
+        length_function = token_length_function(get_tokenizer(EMBED_MODEL)) if unit == "tokens" else None
+        splitter = _splitters[key] = RecursiveTextSplitter(key[0], key[1], length_function=length_function)
+    return splitter
+
+@traced("chunk_text")
+def chunk_text(text, chunk_size=None, chunk_overlap=None, unit=CHUNK_UNIT):
     """
     Splits text into overlapping chunks to fit within LLM context limits.
 
     Args:
         text (str): Full extracted text from a document.
-        chunk_size (int): Target size of each chunk (characters).
+        chunk_size (int): Target size of each chunk (characters or tokens, see unit).
         chunk_overlap (int): Overlap between chunks to preserve context.
+        unit (str): "chars" or "tokens" (embedding-model tokenizer).
 
     Returns:
         List[str]: List of text chunks.
     """
-    splitter = RecursiveCharacterTextSplitter(
-        chunk_size=chunk_size,
-        chunk_overlap=chunk_overlap,
-        separators=["\n\n", "\n", ".", " ", ""],  # priority of where to split
-    )
-    chunks = splitter.split_text(text)
-    return chunks
+    return get_splitter(chunk_size, chunk_overlap, unit).split_text(text)
+
+def chunk_pages(pages, chunk_size=None, chunk_overlap=None, unit=CHUNK_UNIT, window=CHUNK_WINDOW_CHARS):
+    """
+    Chunks a stream of (page_number, text) pieces without ever holding the
+    whole document: pages are buffered until `window` characters, chunked,
+    and the last (possibly unfinished) chunk is carried into the next window.
+
+    Yields:
+        (chunk, page_start, page_end): page numbers are None for unpaged text.
+    """
+    splitter = get_splitter(chunk_size, chunk_overlap, unit)
+    buffer, buffer_start = "", 0        # buffer[0] is character buffer_start of the document
+    page_starts, page_numbers = [], []  # document offset where each buffered page begins
+
+    def page_at(offset):
+        return page_numbers[bisect_right(page_starts, offset) - 1]
+
+    def flush(final):
+        nonlocal buffer, buffer_start
+        spans = splitter.split_spans(buffer)
+        done = spans if final else spans[:-1]
+        for start, end in done:
+            yield buffer[start:end], page_at(buffer_start + start), page_at(buffer_start + end - 1)
+        cut = len(buffer) if final or not spans else spans[-1][0]
+        buffer_start += cut
+        buffer = buffer[cut:]
+        # Forget pages that ended before the carried-over text
+        first = max(bisect_right(page_starts, buffer_start) - 1, 0)
+        del page_starts[:first], page_numbers[:first]
+
+    for number, text in pages:
+        page_starts.append(buffer_start + len(buffer))
+        page_numbers.append(number)
+        buffer += text
+        if len(buffer) >= window:
+            yield from flush(final=False)
+    if buffer.strip():
+        yield from flush(final=True)
+
+@traced("chunk_document")
+def chunk_document(file_path, chunk_size=None, chunk_overlap=None, unit=CHUNK_UNIT):
+    """
+    Extracts and chunks a document page by page.
+
+    Returns:
+        (chunks, metadata): chunk texts and, per chunk, a dict with the
+        page_start/page_end it spans (empty for formats without pages).
+    """
+    from .ingest import iter_pages  # document parsers are only needed when ingesting
+
+    chunks, metadata = [], []
+    for chunk, page_start, page_end in chunk_pages(iter_pages(file_path), chunk_size, chunk_overlap, unit):
+        chunks.append(chunk)
+        metadata.append({"page_start": page_start, "page_end": page_end} if page_start else {})
+    return chunks, metadata
 
-def embed_chunks(chunks, model_name="all-MiniLM-L6-v2"):
+@traced("embed_chunks")
+def embed_chunks(chunks, model_name=EMBED_MODEL, batch_size=ENCODE_BATCH_SIZE, use_cache=True):
     """
-    Generates embeddings for each chunk using a sentence transformer.
+    Generates embeddings for each chunk using the shared sentence transformer.
+    Pass the chunks of many documents at once so they are encoded in large
+    cross-document batches. Chunks already in the embedding cache for
+    model_name are reused, so only new or changed text is encoded.
 
     Returns:
-        embeddings: List of vectors
+        embeddings: float32 array of vectors
         chunks: Original text chunks
     """
-    model = SentenceTransformer(model_name)
-    embeddings = model.encode(chunks, convert_to_numpy=True)
-    return embeddings, chunks
+    if not use_cache:
+        return encode(chunks, model_name=model_name, batch_size=batch_size, report=True), chunks
 
+    cache = get_embedding_cache(model_name)
+    rows = cache.lookup(chunks)
+    hit = rows >= 0
+    cached = cache.vectors(rows[hit])  # gather before add() can evict these rows
 
-def save_to_faiss(embeddings, chunk_texts, faiss_path, metadata_path, metadata=None):
-    dim = len(embeddings[0])
-    index = faiss.IndexFlatL2(dim)
+    missing = np.flatnonzero(~hit)
+    missing_texts = [chunks[i] for i in missing]
+    if missing_texts or cache.dim is None:
+        new_vectors = encode(missing_texts, model_name=model_name, batch_size=batch_size, report=True)
+    else:
+        new_vectors = np.empty((0, cache.dim), dtype="float32")  # all cached: skip loading the model
+    cache.add(missing_texts, new_vectors)
+    cache.flush()
+    print(f"♻️ Reused {int(hit.sum())}/{len(chunks)} cached embeddings")
+    count("chunks_embedded", len(missing_texts))
+    count("embeddings_reused", int(hit.sum()))
 
-    index.add(np.array(embeddings).astype('float32'))
+    embeddings = np.empty((len(chunks), new_vectors.shape[1]), dtype="float32")
+    if len(cached):
+        embeddings[hit] = cached
+    embeddings[missing] = new_vectors
+    return embeddings, chunks
 
-    faiss.write_index(index, faiss_path)
 
+def save_to_faiss(embeddings, chunk_texts, faiss_path, metadata_path, metadata=None, index_kind=INDEX_KIND):
+    """
+    Builds an index of index_kind ("auto" picks one from the corpus size) and
+    writes it with a chunk store holding the texts, metadata and vectors.
+    """
+    embeddings = np.asarray(embeddings, dtype="float32")
+    index = build_index(embeddings, kind=index_kind)
+    faiss.write_index(index, faiss_path)
 
-    with open(metadata_path, 'wb') as f:
-        pickle.dump({
-            "texts": chunk_texts,
-            "metadata": metadata
-        }, f)
\ No newline at end of file
+    # metadata_path is a chunk store directory (see chunk_store.py)
+    if os.path.exists(metadata_path):
+        shutil.rmtree(metadata_path)
+    ChunkStore(metadata_path).append(chunk_texts, metadata or [{} for _ in chunk_texts], vectors=embeddings)
@@ -0,0 +1,191 @@
+# embedding_cache.py
+
+import hashlib
+import json
+import os
+import re
+import threading
+import time
+
+import numpy as np
+
+# ==== CONFIG ====
+CACHE_DIR = "data/embedding_cache"      # One sub-folder per embedding model
+MAX_CACHE_BYTES = 2 * 1024 ** 3         # Evict least recently used rows above this size
+EVICT_TO_FRACTION = 0.8                 # Shrink to this fraction of MAX_CACHE_BYTES when evicting
+# ================
+
+KEY_BYTES = 16  # blake2b digest of the chunk text
+
+_caches = {}
+_lock = threading.Lock()
+
+
+def text_key(text):
+    """Content address of a chunk: 16-byte blake2b digest of its UTF-8 text."""
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=KEY_BYTES).digest()
+
+
+class EmbeddingCache:
+    """
+    Persistent embedding cache for one model, keyed by chunk-text hash.
+
+    On disk the cache is four flat files, all append-only except stamps.bin:
+        keys.bin     16-byte text digests, one per row
+        vectors.bin  float32 vectors, one row of `dim` values per key (memory-mapped)
+        stamps.bin   int64 last-used time per row, used for LRU eviction
+        meta.json    model name, dim and committed row count
+
+    meta.json is replaced atomically after each append, so rows past its
+    count (left by a crash mid-write) are discarded on the next open.
+    """
+
+    def __init__(self, model_name, cache_dir=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.model_name = model_name
+        self.path = os.path.join(cache_dir, re.sub(r"[^A-Za-z0-9_.-]", "_", model_name))
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        os.makedirs(self.path, exist_ok=True)
+        self._load()
+
+    # ---- file layout ----
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _row_bytes(self):
+        return KEY_BYTES + 4 * self.dim + 8
+
+    def _load(self):
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.dim = meta["dim"]
+            self.count = meta["count"]
+        else:
+            self.dim = None
+            self.count = 0
+
+        # Drop any uncommitted tail left by an interrupted append; a file shorter
+        # than the committed count means an interrupted eviction, so start over
+        sizes = {"keys.bin": KEY_BYTES, "vectors.bin": 4 * (self.dim or 0), "stamps.bin": 8}
+        file_sizes = {name: os.path.getsize(self._file(name)) if os.path.exists(self._file(name)) else 0
+                      for name in sizes}
+        if any(file_sizes[name] < self.count * width for name, width in sizes.items()):
+            print(f"⚠ Embedding cache for {self.model_name} is inconsistent, resetting it")
+            self.count = 0
+        for name, width in sizes.items():
+            file_path = self._file(name)
+            if file_sizes[name] != self.count * width:
+                with open(file_path, "r+b") as f:
+                    f.truncate(self.count * width)
+
+        self._rows = {}
+        if self.count:
+            with open(self._file("keys.bin"), "rb") as f:
+                keys = f.read(self.count * KEY_BYTES)
+            self._rows = {keys[i * KEY_BYTES:(i + 1) * KEY_BYTES]: i for i in range(self.count)}
+        self._vectors = None
+        self._stamps = None
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"model": self.model_name, "dim": self.dim, "count": self.count}, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def _mapped(self):
+        if self._vectors is None and self.count:
+            self._vectors = np.memmap(self._file("vectors.bin"), dtype="float32", mode="r",
+                                      shape=(self.count, self.dim))
+            self._stamps = np.memmap(self._file("stamps.bin"), dtype="int64", mode="r+",
+                                     shape=(self.count,))
+        return self._vectors, self._stamps
+
+    # ---- public API ----
+    def lookup(self, texts):
+        """Returns the cache row for each text, or -1 when it has not been embedded yet."""
+        with self._lock:
+            return np.array([self._rows.get(text_key(t), -1) for t in texts], dtype="int64")
+
+    def vectors(self, rows):
+        """Gathers cached vectors for rows returned by lookup() and marks them as recently used."""
+        with self._lock:
+            vectors, stamps = self._mapped()
+            if vectors is None or len(rows) == 0:
+                return np.empty((0, self.dim or 0), dtype="float32")
+            stamps[rows] = time.time_ns()
+            return np.asarray(vectors[rows], dtype="float32")
+
+    def add(self, texts, vectors):
+        """Appends embeddings for texts not already cached, evicting old rows if over budget."""
+        vectors = np.asarray(vectors, dtype="float32")
+        if len(texts) == 0:
+            return
+        with self._lock:
+            if self.dim is None:
+                self.dim = int(vectors.shape[1])
+            elif vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding dim {vectors.shape[1]} does not match cache dim {self.dim}")
+
+            new_keys, new_rows = [], []
+            for i, t in enumerate(texts):
+                key = text_key(t)
+                if key not in self._rows:
+                    self._rows[key] = self.count + len(new_keys)
+                    new_keys.append(key)
+                    new_rows.append(i)
+            if not new_keys:
+                return
+
+            if self._stamps is not None:
+                self._stamps.flush()
+            self._vectors = self._stamps = None
+            now = np.full(len(new_keys), time.time_ns(), dtype="int64")
+            with open(self._file("keys.bin"), "ab") as f:
+                f.write(b"".join(new_keys))
+            with open(self._file("vectors.bin"), "ab") as f:
+                f.write(np.ascontiguousarray(vectors[new_rows]).tobytes())
+            with open(self._file("stamps.bin"), "ab") as f:
+                f.write(now.tobytes())
+            self.count += len(new_keys)
+            self._write_meta()
+
+            if self.count * self._row_bytes() > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Rewrites the cache keeping only the most recently used rows."""
+        keep_rows = int(self.max_bytes * EVICT_TO_FRACTION) // self._row_bytes()
+        _, stamps = self._mapped()
+        keep = np.sort(np.argsort(stamps, kind="stable")[-keep_rows:]) if keep_rows else np.empty(0, dtype="int64")
+
+        keys = np.fromfile(self._file("keys.bin"), dtype=np.uint8, count=self.count * KEY_BYTES)
+        keys = keys.reshape(self.count, KEY_BYTES)[keep]
+        vectors = np.asarray(self._vectors[keep])
+        kept_stamps = np.asarray(stamps[keep])
+        self._vectors = self._stamps = None
+
+        for name, data in (("keys.bin", keys), ("vectors.bin", vectors), ("stamps.bin", kept_stamps)):
+            tmp = self._file(name + ".tmp")
+            data.tofile(tmp)
+            os.replace(tmp, self._file(name))
+        print(f"🧹 Evicted {self.count - len(keep)} cached embeddings for {self.model_name}")
+        self.count = len(keep)
+        self._write_meta()
+        self._load()
+
+    def flush(self):
+        """Persists last-used stamps written since the last append."""
+        with self._lock:
+            if self._stamps is not None:
+                self._stamps.flush()
+
+
+def get_embedding_cache(model_name, cache_dir=CACHE_DIR):
+    """Returns the process-wide cache for model_name."""
+    key = (model_name, cache_dir)
+    with _lock:
+        if key not in _caches:
+            _caches[key] = EmbeddingCache(model_name, cache_dir=cache_dir)
+        return _caches[key]
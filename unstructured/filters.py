@@ -0,0 +1,137 @@
+# filters.py
+
+import datetime
+import os
+import threading
+from collections import OrderedDict
+
+import faiss
+import numpy as np
+
+# ==== CONFIG ====
+EXACT_FILTER_ROWS = 4096   # filters matching at most this many chunks are searched exactly (IVF/HNSW)
+FILTER_CACHE_SIZE = 64     # resolved filters kept per snapshot
+# ================
+
+# retrieve(filters={...}) keys. Every filter is a property of a whole document:
+#   source           file name, or a list of them
+#   file_type        extension ("pdf", ".docx", ...), or a list of them
+#   uploaded_after   date/datetime/ISO string/epoch seconds; documents modified at or after it
+#   uploaded_before  date/datetime/ISO string/epoch seconds; documents modified before it
+FILTER_KEYS = ("source", "file_type", "uploaded_after", "uploaded_before")
+
+
+def file_type(source):
+    """Lowercase extension of a document name without the dot ("pdf")."""
+    return os.path.splitext(source)[1].lower().lstrip(".")
+
+
+def _timestamp(value):
+    if value is None or isinstance(value, (int, float)):
+        return value
+    if isinstance(value, datetime.datetime):
+        return value.timestamp()
+    if isinstance(value, datetime.date):
+        return datetime.datetime.combine(value, datetime.time()).timestamp()
+    if isinstance(value, str):
+        return datetime.datetime.fromisoformat(value).timestamp()  # "2026-10-12" from JSON clients
+    raise TypeError(f"Expected a date, datetime, ISO string or epoch seconds, got {value!r}")
+
+
+def _as_set(value, normalize=str):
+    if value is None:
+        return None
+    values = [value] if isinstance(value, str) else value
+    return {normalize(v) for v in values}
+
+
+def _cache_key(filters):
+    unknown = set(filters) - set(FILTER_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown filter(s): {sorted(unknown)} (expected {FILTER_KEYS})")
+    return tuple((name, tuple(sorted(_as_set(filters[name]))) if name in ("source", "file_type")
+                  else _timestamp(filters[name]))
+                 for name in FILTER_KEYS if filters.get(name) is not None)
+
+
+class FilterMatch:
+    """The live chunks of one snapshot matching a filter: a row mask and its FAISS IDSelector."""
+
+    def __init__(self, mask):
+        self.mask = mask
+        self.count = int(mask.sum())
+        # FAISS keeps a pointer to the bitmap, so it lives as long as the selector
+        self._bits = np.packbits(mask, bitorder="little")
+        self.selector = faiss.IDSelectorBitmap(len(mask), faiss.swig_ptr(self._bits))
+
+    def rows(self):
+        return np.flatnonzero(self.mask)
+
+
+class FilterIndex:
+    """
+    Resolves metadata filters to the matching chunks of one snapshot.
+
+    The manifest already records, per document, its modification time and
+    the store row ranges of its chunks, so a filter only picks documents
+    and their id ranges are set in a bitmap; no per-chunk metadata is
+    scanned. Snapshots without a manifest fall back to the store's source
+    column. Resolved filters are cached, so repeated filters cost nothing.
+    """
+
+    def __init__(self, manifest, store, live=None):
+        self.files = manifest.get("files") if manifest else None
+        self.store = store
+        self.live = live
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def documents(self, filters):
+        """Names of the (live) documents matching the filters."""
+        sources = _as_set(filters.get("source"))
+        types = _as_set(filters.get("file_type"), lambda t: t.lower().lstrip("."))
+        after = _timestamp(filters.get("uploaded_after"))
+        before = _timestamp(filters.get("uploaded_before"))
+        names = self.files if self.files is not None else self.store.values("source")
+        matched = []
+        for name in names:
+            if sources is not None and name not in sources:
+                continue
+            if types is not None and file_type(name) not in types:
+                continue
+            if after is not None or before is not None:
+                mtime = self.files[name].get("mtime") if self.files is not None else None
+                if mtime is None or (after is not None and mtime < after) or (before is not None and mtime >= before):
+                    continue
+            matched.append(name)
+        return matched
+
+    def match(self, filters):
+        """FilterMatch for a filters dict (see FILTER_KEYS); every given filter must hold."""
+        key = _cache_key(filters)
+        with self._lock:
+            match = self._cache.get(key)
+            if match is not None:
+                self._cache.move_to_end(key)
+                return match
+
+        n = len(self.store)
+        names = self.documents(filters)
+        if self.files is not None:
+            mask = np.zeros(n, dtype=bool)
+            for name in names:
+                for start, end in self.files[name]["ids"]:
+                    mask[start:min(end, n)] = True
+        else:
+            wanted = set(names)
+            codes = [code for code, source in enumerate(self.store.values("source")) if source in wanted]
+            mask = np.isin(np.asarray(self.store.column("source")), codes) if n else np.zeros(0, dtype=bool)
+            if self.live is not None:
+                mask &= self.live
+        match = FilterMatch(mask)
+
+        with self._lock:
+            self._cache[key] = match
+            while len(self._cache) > FILTER_CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return match
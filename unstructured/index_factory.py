@@ -0,0 +1,224 @@
+# index_factory.py
+
+import math
+
+import faiss
+import numpy as np
+
+# ==== CONFIG ====
+INDEX_KIND = "auto"          # "auto", "flat", "ivf_flat", "ivf_pq" or "hnsw"
+STORAGE = "float32"          # vector codes: "float32", "fp16", "int8" (scalar quantized) or "pq"
+TRAIN_SAMPLE = 100_000       # Max vectors used to train IVF coarse quantizers / PQ codebooks
+ADD_BATCH = 65_536           # Vectors added per call when building from a memory-mapped array
+HNSW_M = 32                  # Graph degree for HNSW
+HNSW_EF_CONSTRUCTION = 200
+DEFAULT_NPROBE = 16          # IVF lists scanned per query unless overridden in retrieve()
+DEFAULT_EF_SEARCH = 64       # HNSW candidate list size unless overridden in retrieve()
+# ================
+
+INDEX_KINDS = ("flat", "ivf_flat", "ivf_pq", "hnsw")
+STORAGES = ("float32", "fp16", "int8", "pq")
+_SQ_TYPES = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}
+
+
+def choose_index_kind(n_vectors):
+    """Picks an index type from the corpus size."""
+    if n_vectors < 20_000:
+        return "flat"       # exact search is already fast enough
+    if n_vectors < 200_000:
+        return "hnsw"       # best latency/recall, memory is still affordable
+    if n_vectors < 2_000_000:
+        return "ivf_flat"
+    return "ivf_pq"         # compressed codes once full vectors stop fitting in RAM
+
+
+def _nlist(n_vectors):
+    # ~4*sqrt(n) lists, but keep at least 39 training points per centroid
+    return max(1, min(int(4 * math.sqrt(n_vectors)), n_vectors // 39))
+
+
+def _pq_m(dim):
+    # Sub-quantizers must divide dim; aim for ~8 dimensions per 8-bit code
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def _pq_nbits(n_vectors):
+    # 8-bit codes need ~39 * 256 training points; use fewer bits on small corpora
+    return max(4, min(8, int(math.log2(max(2, n_vectors // 39)))))
+
+
+def create_index(kind, dim, n_vectors, storage=STORAGE):
+    """
+    Creates an empty, untrained index of the given kind.
+
+    Args:
+        kind (str): One of INDEX_KINDS or "auto".
+        dim (int): Embedding dimension.
+        n_vectors (int): Expected corpus size, used for "auto" and IVF list counts.
+        storage (str): How vectors are stored, one of STORAGES. fp16 halves and
+            int8 quarters the memory of float32 vectors; pq keeps ~1 byte per
+            8 dimensions. ivf_pq always uses PQ codes.
+    """
+    if kind == "auto":
+        kind = choose_index_kind(n_vectors)
+    if storage not in STORAGES:
+        raise ValueError(f"Unknown storage: {storage} (expected one of {STORAGES})")
+    sq_type = _SQ_TYPES.get(storage)
+    if kind == "flat":
+        if sq_type is not None:
+            return faiss.IndexScalarQuantizer(dim, sq_type, faiss.METRIC_L2)
+        if storage == "pq":
+            return faiss.IndexPQ(dim, _pq_m(dim), _pq_nbits(n_vectors))
+        return faiss.IndexFlatL2(dim)
+    if kind == "ivf_flat":
+        if sq_type is not None:
+            return faiss.IndexIVFScalarQuantizer(faiss.IndexFlatL2(dim), dim, _nlist(n_vectors), sq_type)
+        if storage == "pq":
+            kind = "ivf_pq"
+        else:
+            return faiss.IndexIVFFlat(faiss.IndexFlatL2(dim), dim, _nlist(n_vectors))
+    if kind == "ivf_pq":
+        return faiss.IndexIVFPQ(faiss.IndexFlatL2(dim), dim, _nlist(n_vectors), _pq_m(dim), _pq_nbits(n_vectors))
+    if kind == "hnsw":
+        if sq_type is not None:
+            index = faiss.IndexHNSWSQ(dim, sq_type, HNSW_M)
+        elif storage == "pq":
+            index = faiss.IndexHNSWPQ(dim, _pq_m(dim), HNSW_M, _pq_nbits(n_vectors))
+        else:
+            index = faiss.IndexHNSWFlat(dim, HNSW_M)
+        index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+        return index
+    raise ValueError(f"Unknown index kind: {kind} (expected one of {INDEX_KINDS} or 'auto')")
+
+
+def train_index(index, vectors, sample_size=TRAIN_SAMPLE, seed=0):
+    """Trains IVF/PQ indexes on a random sample of vectors; no-op for indexes that need no training."""
+    if index.is_trained:
+        return
+    n = len(vectors)
+    if n > sample_size:
+        rows = np.sort(np.random.default_rng(seed).choice(n, sample_size, replace=False))
+        sample = np.asarray(vectors[rows], dtype="float32")
+    else:
+        sample = np.asarray(vectors, dtype="float32")
+    index.train(sample)
+
+
+def build_index(vectors, kind=INDEX_KIND, ids=None, storage=STORAGE):
+    """
+    Builds and fills an index from a (possibly memory-mapped) float32 array.
+
+    The index is wrapped in an IndexIDMap so every vector carries its stable
+    chunk id (its chunk-store row; ids defaults to 0..n-1). Vectors are added
+    in ADD_BATCH slices so a memory-mapped corpus is never copied into RAM
+    all at once.
+    """
+    n, dim = vectors.shape
+    ids = np.arange(n, dtype="int64") if ids is None else np.asarray(ids, dtype="int64")
+    index = faiss.IndexIDMap(create_index(kind, dim, n, storage=storage))
+    train_index(index.index, vectors)
+    for start in range(0, n, ADD_BATCH):
+        batch = np.ascontiguousarray(vectors[start:start + ADD_BATCH], dtype="float32")
+        index.add_with_ids(batch, ids[start:start + ADD_BATCH])
+    return index
+
+
+def remove_ids(index, ids):
+    """
+    Removes vectors by chunk id. Returns False when the index type cannot
+    delete in place (HNSW), in which case the caller must rebuild it.
+    """
+    if len(ids) == 0:
+        return True
+    if index_kind(index) == "hnsw":
+        return False
+    index.remove_ids(faiss.IDSelectorBatch(np.asarray(ids, dtype="int64")))
+    return True
+
+
+def index_kind(index):
+    """Returns the INDEX_KINDS name of a built index."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        return "hnsw"
+    if isinstance(index, faiss.IndexIVFPQ):
+        return "ivf_pq"
+    if isinstance(index, faiss.IndexIVF):
+        return "ivf_flat"
+    return "flat"
+
+
+def index_storage(index):
+    """Returns the STORAGES name of how a built index stores its vectors."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexIDMap):
+        index = faiss.downcast_index(index.index)
+    if isinstance(index, faiss.IndexHNSW):
+        index = faiss.downcast_index(index.storage)
+    if isinstance(index, (faiss.IndexScalarQuantizer, faiss.IndexIVFScalarQuantizer)):
+        for name, sq_type in _SQ_TYPES.items():
+            if index.sq.qtype == sq_type:
+                return name
+        return "int8"
+    if isinstance(index, (faiss.IndexPQ, faiss.IndexIVFPQ)):
+        return "pq"
+    return "float32"
+
+
+def rescore(vectors, query_vecs, ids, k):
+    """
+    Exact re-scoring of quantized search results: L2 distances of the
+    candidate ids are recomputed from full-precision vectors (the chunk
+    store's memory-mapped float32 file, only the candidate rows are read)
+    and the best k kept.
+
+    Returns:
+        (distances, ids) shaped like index.search() output, padded with -1.
+    """
+    n_queries = len(query_vecs)
+    out_dist = np.full((n_queries, k), np.inf, dtype="float32")
+    out_ids = np.full((n_queries, k), -1, dtype="int64")
+    wanted = np.unique(ids[ids >= 0])
+    if not len(wanted):
+        return out_dist, out_ids
+    rows = np.asarray(vectors[wanted], dtype="float32")  # sorted reads from the memory map
+    for q in range(n_queries):
+        candidates = ids[q][ids[q] >= 0]
+        diffs = rows[np.searchsorted(wanted, candidates)] - query_vecs[q]
+        dists = np.einsum("ij,ij->i", diffs, diffs)
+        order = np.argsort(dists, kind="stable")[:k]
+        out_dist[q, :len(order)] = dists[order]
+        out_ids[q, :len(order)] = candidates[order]
+    return out_dist, out_ids
+
+
+def search_params(index, nprobe=None, ef_search=None, selector=None):
+    """
+    Builds per-query search parameters for the index type.
+
+    Passing parameters per call (instead of setting index.nprobe) keeps
+    concurrent queries with different settings from interfering. A
+    selector (faiss.IDSelector over chunk ids) restricts the search to
+    those chunks.
+    """
+    kind = index_kind(index)
+    if kind in ("ivf_flat", "ivf_pq"):
+        return faiss.SearchParametersIVF(nprobe=nprobe or DEFAULT_NPROBE, sel=selector)
+    if kind == "hnsw":
+        return faiss.SearchParametersHNSW(efSearch=ef_search or DEFAULT_EF_SEARCH, sel=selector)
+    if selector is not None:
+        return faiss.SearchParameters(sel=selector)
+    return None
+
+
+def search(index, query_vecs, k, nprobe=None, ef_search=None, selector=None):
+    """index.search with per-query tunables for IVF (nprobe) and HNSW (efSearch) and an optional id selector."""
+    params = search_params(index, nprobe=nprobe, ef_search=ef_search, selector=selector)
+    if params is None:
+        return index.search(query_vecs, k)
+    return index.search(query_vecs, k, params=params)
@@ -0,0 +1,141 @@
+# index_jobs.py
+
+import itertools
+import os
+import threading
+import time
+from collections import OrderedDict
+
+from .snapshots import INDEX_ROOT
+from .vector_store_incremental import DOCS_FOLDER, update_index
+
+# ==== CONFIG ====
+COALESCE_SECONDS = 2.0   # uploads arriving within this window share one index update
+KEEP_JOBS = 50           # finished jobs kept for status polling
+# ================
+
+
+class IndexJobQueue:
+    """
+    In-process background queue for indexing work with a single writer thread.
+
+    submit() saves nothing itself; it records the uploaded files and returns
+    a job id immediately. While a job is still queued, further uploads are
+    coalesced into it, and the writer waits COALESCE_SECONDS after the last
+    one before running a single update_index(). Because only this thread
+    writes documents and snapshots, concurrent uploads never race, and
+    readers keep querying the live snapshot until the new one is published.
+    """
+
+    def __init__(self, docs_folder=DOCS_FOLDER, root=INDEX_ROOT, coalesce_seconds=COALESCE_SECONDS):
+        self.docs_folder = docs_folder
+        self.root = root
+        self.coalesce_seconds = coalesce_seconds
+        self._jobs = OrderedDict()
+        self._queued = None          # id of the job still accepting uploads
+        self._ids = itertools.count(1)
+        self._cond = threading.Condition()
+        self._worker = threading.Thread(target=self._run, name="index-writer", daemon=True)
+        self._worker.start()
+
+    def submit(self, uploads):
+        """
+        Queues uploaded documents for indexing.
+
+        Args:
+            uploads (dict): filename -> file bytes.
+
+        Returns:
+            int: id of the (possibly shared) job that will index them.
+        """
+        with self._cond:
+            if self._queued is None:
+                job_id = next(self._ids)
+                self._jobs[job_id] = {
+                    "id": job_id, "state": "queued", "files": {}, "uploads": {},
+                    "submitted": time.time(), "last_upload": 0.0,
+                    "started": None, "finished": None, "snapshot": None, "error": None,
+                }
+                self._queued = job_id
+            job = self._jobs[self._queued]
+            for name, data in uploads.items():
+                name = os.path.basename(name)
+                job["uploads"][name] = data
+                job["files"][name] = "queued"
+            job["last_upload"] = time.monotonic()
+            self._cond.notify()
+            return job["id"]
+
+    def status(self, job_id):
+        """Returns a copy of a job's state, per-document progress and result."""
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            status = {k: v for k, v in job.items() if k != "uploads"}
+            status["files"] = dict(job["files"])
+            done = sum(s in ("indexed", "unchanged", "failed") for s in status["files"].values())
+            status["progress"] = done / len(status["files"]) if status["files"] else 1.0
+            return status
+
+    def jobs(self):
+        """Status of all recent jobs, newest first."""
+        with self._cond:
+            ids = list(self._jobs)
+        return [self.status(job_id) for job_id in reversed(ids)]
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._queued is not None:
+                    job = self._jobs[self._queued]
+                    wait = job["last_upload"] + self.coalesce_seconds - time.monotonic()
+                    if wait <= 0:
+                        self._queued = None
+                        job["state"] = "running"
+                        job["started"] = time.time()
+                        return job
+                    self._cond.wait(wait)
+                else:
+                    self._cond.wait()
+
+    def _run(self):
+        while True:
+            job = self._next_job()
+            try:
+                os.makedirs(self.docs_folder, exist_ok=True)
+                for name, data in job.pop("uploads").items():
+                    with open(os.path.join(self.docs_folder, name), "wb") as f:
+                        f.write(data)
+                    self._set_file(job, name, "saved")
+
+                stats = update_index(self.docs_folder, self.root,
+                                     on_progress=lambda name, state: self._set_file(job, name, state))
+                with self._cond:
+                    # Uploaded files identical to what is already indexed need no work
+                    for name, state in job["files"].items():
+                        if state == "saved":
+                            job["files"][name] = "unchanged"
+                    job["snapshot"] = stats["snapshot"]
+                    job["state"] = "done"
+            except Exception as e:
+                print(f"❌ Index job {job['id']} failed: {e}")
+                with self._cond:
+                    job["state"] = "failed"
+                    job["error"] = str(e)
+                    for name, state in job["files"].items():
+                        if state not in ("indexed", "unchanged"):
+                            job["files"][name] = "failed"
+            finally:
+                with self._cond:
+                    job.pop("uploads", None)
+                    job["finished"] = time.time()
+                    while len(self._jobs) > KEEP_JOBS:
+                        oldest = next(iter(self._jobs))
+                        if oldest == self._queued:
+                            break
+                        self._jobs.pop(oldest)
+
+    def _set_file(self, job, name, state):
+        with self._cond:
+            job["files"][name] = state
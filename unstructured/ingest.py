@@ -9,12 +9,16 @@ from docx import Document
 import pypandoc
 import os
 
-def extract_text_from_pdf(file_path):
-    text = ""
+from common.tracing import traced
+
+def iter_pdf_pages(file_path):
+    """Yields (page_number, text) for each page (1-based), one page in memory at a time."""
     with fitz.open(file_path) as doc:
         for page in doc:
-            text += page.get_text()
-    return text
+            yield page.number + 1, page.get_text()
+
+def extract_text_from_pdf(file_path):
+    return "".join(text for _, text in iter_pdf_pages(file_path))
 
 def extract_text_from_docx(file_path):
     doc = Document(file_path)
@@ -27,6 +31,7 @@ def extract_text_from_txt(file_path):
     with open(file_path, "r", encoding="utf-8") as f:
         return f.read()
 
+@traced("extract_text")
 def extract_text(file_path):
     if not os.path.exists(file_path):
         raise FileNotFoundError(f"File not found: {file_path}")
@@ -42,6 +47,19 @@ def extract_text(file_path):
     else:
         raise ValueError("Unsupported file format")
 
+def iter_pages(file_path):
+    """
+    Yields (page_number, text) pieces of a document for incremental chunking.
+    PDFs are streamed page by page; other formats have no pages and come as
+    a single (None, text) piece.
+    """
+    if file_path.endswith(".pdf"):
+        if not os.path.exists(file_path):
+            raise FileNotFoundError(f"File not found: {file_path}")
+        yield from iter_pdf_pages(file_path)
+    else:
+        yield None, extract_text(file_path)
+
 # Example usage
 if __name__ == "__main__":
     text = extract_text("data/documents/UserStories-FYP-doc.odt")
@@ -0,0 +1,263 @@
+# lexical_index.py
+
+import hashlib
+import json
+import os
+import re
+import shutil
+from collections import Counter
+
+import numpy as np
+
+# ==== CONFIG ====
+BM25_K1 = 1.2
+BM25_B = 0.75
+MAX_SEGMENTS = 8        # segments are merged into one above this count
+BUILD_BATCH = 8192      # store rows tokenized per segment when building from a store
+DENSE_ACCUMULATE_RATIO = 8  # score into a corpus-sized array once postings exceed 1/8 of the rows
+# ================
+
+# Lowercased words, keeping internal dashes and dots so that identifiers such as
+# "cve-2021-44228", "v1.2.3" or "x86_64" stay single terms ("--force" -> "force").
+TOKEN_RE = re.compile(r"\w+(?:[-.]\w+)*")
+SEGMENT_FILES = ("terms", "indptr", "docs", "tfs", "impacts", "doclen")
+
+
+def tokenize(text):
+    return TOKEN_RE.findall(text.lower())
+
+
+def term_hash(term):
+    """Stable 64-bit id of a term (a vocabulary of strings is never stored)."""
+    return int.from_bytes(hashlib.blake2b(term.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+def _build_segment(texts, start):
+    """Tokenizes texts (store rows start, start+1, ...) into CSR postings arrays."""
+    hashes = {}
+    terms, docs, tfs, doclen = [], [], [], np.zeros(len(texts), dtype="uint32")
+    for i, text in enumerate(texts):
+        tokens = tokenize(text)
+        doclen[i] = len(tokens)
+        for token, tf in Counter(tokens).items():
+            h = hashes.get(token)
+            if h is None:
+                h = hashes[token] = term_hash(token)
+            terms.append(h)
+            docs.append(start + i)
+            tfs.append(tf)
+    return _to_csr(np.array(terms, dtype="uint64"), np.array(docs, dtype="uint32"),
+                   np.minimum(np.array(tfs, dtype="int64"), np.iinfo("uint16").max).astype("uint16"),
+                   doclen, start)
+
+
+def _to_csr(terms, docs, tfs, doclen, start):
+    order = np.lexsort((docs, terms))
+    terms, docs, tfs = terms[order], docs[order], tfs[order]
+    unique_terms, first = np.unique(terms, return_index=True)
+    indptr = np.append(first, len(terms)).astype("int64")
+
+    # BM25 term-frequency part of every posting, so a query only multiplies by idf.
+    # avgdl is the segment's own; merging recomputes it over the merged rows.
+    avgdl = max(float(doclen.mean()), 1.0) if len(doclen) else 1.0
+    tf = tfs.astype("float32")
+    dl = doclen[docs - start].astype("float32")
+    impacts = tf * (BM25_K1 + 1) / (tf + BM25_K1 * (1 - BM25_B + BM25_B * dl / avgdl))
+    return {"terms": unique_terms, "indptr": indptr, "docs": docs, "tfs": tfs,
+            "impacts": impacts.astype("float16"), "doclen": doclen}
+
+
+class LexicalIndex:
+    """
+    BM25 inverted index over chunk-store rows, kept on disk as immutable segments.
+
+    Each segment covers a contiguous range of store rows and is six .npy
+    files read through memory maps:
+        terms    sorted uint64 term hashes
+        indptr   int64 offsets: postings of terms[i] are docs/tfs[indptr[i]:indptr[i+1]]
+        docs     uint32 store row ids
+        tfs      uint16 term frequencies
+        impacts  float16 BM25 term-frequency weight of each posting (scaled by idf at query time)
+        doclen   uint32 token count of every row in the segment's range
+    meta.json lists the segments and corpus statistics and is replaced
+    atomically. New rows become a new segment and segments are merged above
+    MAX_SEGMENTS, so an update writes work proportional to the new rows and
+    snapshots can hard-link the segments they share with their parent.
+
+    Rows of deleted documents stay in their segment until the store is
+    compacted (which rebuilds the index); search() drops them via `live`.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        meta_file = self._file("meta.json")
+        if os.path.exists(meta_file):
+            with open(meta_file, "r", encoding="utf-8") as f:
+                self.meta = json.load(f)
+        else:
+            self.meta = {"segments": [], "docs": 0, "total_len": 0, "next_segment": 0}
+        self.segments = [self._open_segment(s) for s in self.meta["segments"]]
+
+    def _file(self, name):
+        return os.path.join(self.path, name)
+
+    def _open_segment(self, segment):
+        arrays = {name: np.load(self._file(f"{segment['name']}.{name}.npy"), mmap_mode="r")
+                  for name in SEGMENT_FILES}
+        return {**segment, **arrays}
+
+    def _write_meta(self):
+        tmp = self._file("meta.json.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp, self._file("meta.json"))
+
+    def __len__(self):
+        return self.meta["docs"]
+
+    # ---- writing ----
+    def _save_segment(self, arrays, start, end):
+        name = f"seg-{self.meta['next_segment']:06d}"
+        self.meta["next_segment"] += 1
+        for key in SEGMENT_FILES:
+            np.save(self._file(f"{name}.{key}.npy"), arrays[key])
+        return {"name": name, "start": int(start), "end": int(end)}
+
+    def add(self, texts, start):
+        """Indexes texts as store rows start, start+1, ... in a new segment."""
+        if not texts:
+            return
+        arrays = _build_segment(texts, start)
+        segment = self._save_segment(arrays, start, start + len(texts))
+        self.meta["segments"].append(segment)
+        self.meta["docs"] += len(texts)
+        self.meta["total_len"] += int(arrays["doclen"].sum())
+        self._write_meta()
+        self.segments.append(self._open_segment(segment))
+        if len(self.segments) > MAX_SEGMENTS:
+            self.merge()
+
+    def merge(self):
+        """Merges all segments into one (postings are re-sorted, nothing is re-tokenized)."""
+        if len(self.segments) < 2:
+            return
+        old = self.segments
+        terms = np.concatenate([np.repeat(np.asarray(s["terms"]), np.diff(s["indptr"])) for s in old])
+        docs = np.concatenate([np.asarray(s["docs"]) for s in old])
+        tfs = np.concatenate([np.asarray(s["tfs"]) for s in old])
+        doclen = np.concatenate([np.asarray(s["doclen"]) for s in old])
+        start = old[0]["start"]
+        segment = self._save_segment(_to_csr(terms, docs, tfs, doclen, start), start, old[-1]["end"])
+        self.meta["segments"] = [segment]
+        self._write_meta()
+        self.segments = [self._open_segment(segment)]
+        for s in old:
+            for key in SEGMENT_FILES:
+                os.remove(self._file(f"{s['name']}.{key}.npy"))
+
+    # ---- searching ----
+    def search(self, query, k, live=None):
+        """
+        Top-k rows by BM25 score for a query.
+
+        Args:
+            live (np.ndarray): Optional boolean mask over store rows; rows where it is False are skipped.
+
+        Returns:
+            (ids, scores): int64 row ids and float32 scores, best first.
+        """
+        hashes = np.unique(np.array([term_hash(t) for t in tokenize(query)], dtype="uint64"))
+        if not len(hashes) or not self.meta["docs"]:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        # Postings slices of every query term in every segment
+        postings = []
+        df = np.zeros(len(hashes), dtype="int64")
+        for segment in self.segments:
+            seg_terms = segment["terms"]
+            pos = np.searchsorted(seg_terms, hashes)
+            pos_clipped = np.minimum(pos, len(seg_terms) - 1)
+            found = (pos < len(seg_terms)) & (seg_terms[pos_clipped] == hashes)
+            for qi in np.flatnonzero(found):
+                lo, hi = segment["indptr"][pos[qi]], segment["indptr"][pos[qi] + 1]
+                df[qi] += hi - lo
+                postings.append((qi, segment, lo, hi))
+        if not postings:
+            return np.empty(0, dtype="int64"), np.empty(0, dtype="float32")
+
+        n_docs = self.meta["docs"]
+        n_rows = self.meta["segments"][-1]["end"]
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype("float32")
+
+        # Common terms (long postings) can add at most idf * (k1 + 1) to any row. Score the
+        # rare terms first, then add common-term weights to those candidates only; if no row
+        # outside the candidates could still reach the top k, that result is exact.
+        common = df * DENSE_ACCUMULATE_RATIO > n_rows
+        rare_postings = [p for p in postings if not common[p[0]]]
+        common_postings = [p for p in postings if common[p[0]]]
+        if rare_postings and common_postings:
+            ids, scores = self._accumulate(rare_postings, idf, n_rows, live)
+            bound = float(idf[common].sum()) * (BM25_K1 + 1)
+            if len(ids) >= k:
+                # Rows that cannot reach the current k-th best score even with every common term
+                kth = np.partition(scores, len(scores) - k)[len(scores) - k]
+                keep = scores + bound >= kth
+                ids, scores = ids[keep], scores[keep]
+                scores += self._score_rows(ids, common_postings, idf)
+                if np.partition(scores, len(scores) - k)[len(scores) - k] >= bound:
+                    return _top_k(ids, scores, k)
+        return _top_k(*self._accumulate(postings, idf, n_rows, live), k)
+
+    def _accumulate(self, postings, idf, n_rows, live):
+        """Summed BM25 scores of every (live) row in the given postings."""
+        docs = np.concatenate([segment["docs"][lo:hi] for _, segment, lo, hi in postings])
+        contributions = np.concatenate([idf[qi] * segment["impacts"][lo:hi].astype("float32")
+                                        for qi, segment, lo, hi in postings])
+        if len(docs) * DENSE_ACCUMULATE_RATIO > n_rows:
+            # Long postings: one pass over a corpus-sized array beats sorting them
+            scores = np.bincount(docs, weights=contributions, minlength=n_rows)
+            ids = np.flatnonzero(scores)
+            scores = scores[ids].astype("float32")
+        else:
+            # Short postings: sum per row without touching a corpus-sized array
+            ids, inverse = np.unique(docs, return_inverse=True)
+            ids = ids.astype("int64")
+            scores = np.bincount(inverse, weights=contributions).astype("float32")
+        if live is not None:
+            keep = ids < len(live)
+            keep[keep] = live[ids[keep]]
+            ids, scores = ids[keep], scores[keep]
+        return ids, scores
+
+    def _score_rows(self, ids, postings, idf):
+        """Scores of the given rows for the given postings, by binary search in each posting list."""
+        scores = np.zeros(len(ids), dtype="float32")
+        for qi, segment, lo, hi in postings:
+            docs = segment["docs"][lo:hi]
+            rows = ids.astype(docs.dtype)  # matching dtypes keep searchsorted from converting the postings
+            pos = np.searchsorted(docs, rows)
+            hit = pos < len(docs)
+            hit[hit] = docs[pos[hit]] == rows[hit]
+            scores[hit] += idf[qi] * segment["impacts"][lo:hi][pos[hit]].astype("float32")
+        return scores
+
+
+def _top_k(ids, scores, k):
+    if len(ids) > k:
+        top = np.argpartition(-scores, k - 1)[:k]
+        ids, scores = ids[top], scores[top]
+    order = np.argsort(-scores, kind="stable")
+    return ids[order], scores[order]
+
+def build_lexical_index(path, store, batch_size=BUILD_BATCH):
+    """(Re)builds the lexical index at path from every row of a chunk store."""
+    if os.path.exists(path):
+        shutil.rmtree(path)
+    lexical = LexicalIndex(path)
+    for start in range(0, len(store), batch_size):
+        ids = range(start, min(start + batch_size, len(store)))
+        lexical.add([store.text(i) for i in ids], start)
+    lexical.merge()
+    print(f"🔤 Built lexical index over {len(lexical)} chunks")
+    return lexical
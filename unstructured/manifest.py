@@ -0,0 +1,99 @@
+# manifest.py
+
+import hashlib
+import json
+import os
+
+import numpy as np
+
+
+def file_fingerprint(file_path):
+    """Size, mtime and SHA-256 of a document, used to detect edits."""
+    h = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    stat = os.stat(file_path)
+    return {"sha256": h.hexdigest(), "mtime": stat.st_mtime, "size": stat.st_size}
+
+
+def is_unchanged(file_path, entry):
+    """
+    Cheap check first (mtime + size), hash only when those differ.
+    A touched-but-identical file updates entry's mtime in place.
+    """
+    stat = os.stat(file_path)
+    if entry.get("mtime") == stat.st_mtime and entry.get("size") == stat.st_size:
+        return True
+    if "sha256" in entry and entry["sha256"] == file_fingerprint(file_path)["sha256"]:
+        entry["mtime"] = stat.st_mtime
+        entry["size"] = stat.st_size
+        return True
+    return False
+
+
+def load_manifest(path):
+    """
+    Loads the manifest: {"files": {filename: {"sha256", "mtime", "size", "ids": [[start, end], ...]}}}.
+    "ids" are half-open ranges of chunk-store row ids (= FAISS ids) holding that file's chunks.
+    """
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(path, manifest):
+    """Writes the manifest atomically."""
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(tmp, path)
+
+
+def ranges_to_ids(ranges):
+    if not ranges:
+        return np.empty(0, dtype="int64")
+    return np.concatenate([np.arange(start, end, dtype="int64") for start, end in ranges])
+
+
+def ids_to_ranges(ids):
+    """Compresses sorted ids into half-open [start, end) ranges."""
+    ids = np.asarray(ids, dtype="int64")
+    if len(ids) == 0:
+        return []
+    breaks = np.flatnonzero(np.diff(ids) != 1) + 1
+    starts = np.concatenate([[0], breaks])
+    ends = np.concatenate([breaks, [len(ids)]])
+    return [[int(ids[s]), int(ids[e - 1]) + 1] for s, e in zip(starts, ends)]
+
+
+def live_ids(manifest):
+    """Sorted ids of every chunk that belongs to a document still in the manifest."""
+    ids = [ranges_to_ids(entry["ids"]) for entry in manifest["files"].values()]
+    return np.sort(np.concatenate(ids)) if ids else np.empty(0, dtype="int64")
+
+
+def live_mask(manifest, n):
+    """Boolean mask over n store rows, True for chunks of documents still in the manifest."""
+    mask = np.zeros(n, dtype=bool)
+    ids = live_ids(manifest)
+    mask[ids[ids < n]] = True
+    return mask
+
+
+def manifest_from_store(store, docs_folder):
+    """
+    Bootstraps a manifest for an index built before manifests existed,
+    assuming the index matches the documents currently on disk.
+    """
+    files = {}
+    if len(store):
+        codes = np.asarray(store.column("source"))
+        for code, source in enumerate(store.values("source")):
+            entry = {"ids": ids_to_ranges(np.flatnonzero(codes == code))}
+            file_path = os.path.join(docs_folder, source)
+            if os.path.isfile(file_path):
+                entry.update(file_fingerprint(file_path))
+            files[source] = entry
+    return {"files": files}
@@ -0,0 +1,128 @@
+# model_registry.py
+
+import threading
+import time
+
+import numpy as np
+
+# ==== CONFIG ====
+EMBED_MODEL = "all-MiniLM-L6-v2"   # Default embedding model for ingest + retrieval
+ENCODE_BATCH_SIZE = 256            # Large batches amortize per-call overhead across documents
+# ================
+
+# One SentenceTransformer (or CrossEncoder) per (model_name, device), shared by the whole process
+_models = {}
+_stats = {}
+_lock = threading.Lock()
+
+
+def get_embedder(model_name=EMBED_MODEL, device=None):
+    """
+    Returns the process-wide SentenceTransformer for (model_name, device),
+    loading it on first use only.
+    """
+    key = (model_name, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            # Imported here so processes that never embed (e.g. ingest workers) skip torch
+            from sentence_transformers import SentenceTransformer
+
+            start = time.perf_counter()
+            model = SentenceTransformer(model_name, device=device)
+            load_seconds = time.perf_counter() - start
+            print(f"⚙️ Loaded embedding model {model_name} on {model.device} in {load_seconds:.2f}s")
+            _models[key] = model
+            _stats[key] = {"load_seconds": load_seconds, "encoded": 0, "encode_seconds": 0.0}
+    return model
+
+
+def get_cross_encoder(model_name, device=None):
+    """
+    Returns the process-wide CrossEncoder for (model_name, device), loading
+    it on first use only.
+    """
+    key = ("cross-encoder", model_name, device)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        model = _models.get(key)
+        if model is None:
+            from sentence_transformers import CrossEncoder
+
+            start = time.perf_counter()
+            model = CrossEncoder(model_name, device=device)
+            print(f"⚙️ Loaded cross-encoder {model_name} in {time.perf_counter() - start:.2f}s")
+            _models[key] = model
+    return model
+
+
+def get_tokenizer(model_name=EMBED_MODEL):
+    """
+    Returns the process-wide tokenizer of an embedding model, without
+    loading the model itself (and torch).
+    """
+    key = ("tokenizer", model_name)
+    tokenizer = _models.get(key)
+    if tokenizer is not None:
+        return tokenizer
+
+    with _lock:
+        tokenizer = _models.get(key)
+        if tokenizer is None:
+            from transformers import AutoTokenizer
+
+            # Short sentence-transformers names ("all-MiniLM-L6-v2") live under that organisation
+            repo = model_name if "/" in model_name else f"sentence-transformers/{model_name}"
+            tokenizer = _models[key] = AutoTokenizer.from_pretrained(repo)
+    return tokenizer
+
+
+def encode(texts, model_name=EMBED_MODEL, device=None, batch_size=ENCODE_BATCH_SIZE, report=False):
+    """
+    Encodes texts with the shared model in large batches.
+
+    Args:
+        texts (List[str]): Texts to embed, possibly drawn from many documents.
+        batch_size (int): Number of texts per forward pass.
+        report (bool): Print encode throughput when True.
+
+    Returns:
+        np.ndarray: float32 array of shape (len(texts), dim).
+    """
+    model = get_embedder(model_name, device)
+    if len(texts) == 0:
+        return np.empty((0, model.get_sentence_embedding_dimension()), dtype="float32")
+
+    start = time.perf_counter()
+    embeddings = model.encode(texts, batch_size=batch_size, convert_to_numpy=True).astype("float32")
+    elapsed = time.perf_counter() - start
+
+    stats = _stats[(model_name, device)]
+    with _lock:
+        stats["encoded"] += len(texts)
+        stats["encode_seconds"] += elapsed
+
+    if report:
+        print(f"⚡ Encoded {len(texts)} texts in {elapsed:.2f}s ({len(texts) / max(elapsed, 1e-9):.1f} texts/s)")
+    return embeddings
+
+
+def registry_stats():
+    """Returns load time and encode throughput for every loaded model."""
+    report = {}
+    for (model_name, device), stats in _stats.items():
+        seconds = stats["encode_seconds"]
+        report[f"{model_name}@{device or 'auto'}"] = {
+            "load_seconds": round(stats["load_seconds"], 3),
+            "encoded": stats["encoded"],
+            "encode_seconds": round(seconds, 3),
+            "texts_per_second": round(stats["encoded"] / seconds, 1) if seconds else 0.0,
+        }
+    return report
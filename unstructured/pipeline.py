@@ -0,0 +1,158 @@
+# pipeline.py
+
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from .embedder import chunk_document
+from .index_factory import INDEX_KIND, STORAGE, build_index
+from .lexical_index import LexicalIndex
+from .manifest import file_fingerprint
+from .snapshots import INDEX_ROOT, SnapshotWriter
+
+# ==== CONFIG ====
+WORKERS = max(1, (os.cpu_count() or 2) - 1)   # extract + chunk processes
+MAX_PENDING_PER_WORKER = 2                    # documents parsed but not yet embedded, per worker
+EMBED_BATCH_SIZE = 1024                       # chunks handed to the embedding stage at once
+# ================
+
+
+def _extract_and_chunk(file_path):
+    """Worker-process stage: fingerprint one document, parse it page by page and split it into chunks."""
+    return file_fingerprint(file_path), chunk_document(file_path)
+
+
+def iter_chunked_documents(file_paths, workers=WORKERS, max_pending=None):
+    """
+    Extracts and chunks documents in a process pool, yielding results as they finish.
+
+    At most max_pending documents are submitted or waiting to be consumed at
+    any time, which bounds memory and applies back-pressure when the
+    embedding stage is the bottleneck.
+
+    Yields:
+        (file_path, (fingerprint, (chunks, metadata)), error): the result is None when the document failed.
+    """
+    max_pending = max_pending or workers * MAX_PENDING_PER_WORKER
+    paths = iter(file_paths)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = {}
+        for path in paths:
+            pending[pool.submit(_extract_and_chunk, path)] = path
+            if len(pending) >= max_pending:
+                break
+
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                path = pending.pop(future)
+                # Refill the window before handing work to the (slower) consumer
+                next_path = next(paths, None)
+                if next_path is not None:
+                    pending[pool.submit(_extract_and_chunk, next_path)] = next_path
+                try:
+                    yield path, future.result(), None
+                except Exception as e:
+                    yield path, None, e
+
+
+class IndexWriter:
+    """
+    Appends embedded batches (texts, metadata and vectors) to the chunk store
+    and the lexical index of a new snapshot as they arrive, so nothing
+    accumulates in memory. On
+    close the FAISS index is built from the store's memory-mapped vectors,
+    once the corpus size is known for automatic index selection and IVF
+    training, and the snapshot is published atomically.
+    """
+
+    def __init__(self, root, index_kind=INDEX_KIND, storage=STORAGE):
+        self.snapshot = SnapshotWriter(root, derive=False)
+        self.store = self.snapshot.open_store()
+        self.lexical = LexicalIndex(self.snapshot.lexical_path)
+        self.index_kind = index_kind
+        self.storage = storage
+
+    @property
+    def manifest(self):
+        return self.snapshot.manifest
+
+    def add(self, embeddings, texts, metadata):
+        start = self.store.append(texts, metadata, vectors=embeddings)
+        self.lexical.add(texts, start)
+
+    def close(self):
+        if not len(self.store):
+            self.store.close()
+            self.snapshot.abort()
+            return None
+        index = build_index(self.store.vectors(), kind=self.index_kind, storage=self.storage)
+        self.lexical.merge()
+        self.store.close()
+        self.snapshot.write_index(index)
+        return self.snapshot.commit()
+
+
+def build_vector_store(file_paths, root=INDEX_ROOT, workers=WORKERS,
+                       max_pending=None, batch_size=EMBED_BATCH_SIZE, index_kind=INDEX_KIND, storage=STORAGE):
+    """
+    Pipelined index build: a process pool extracts and chunks documents while
+    a single embedding stage encodes full batches and appends them to the index.
+
+    Returns:
+        dict: per-stage timings and counts.
+    """
+    from .embedder import embed_chunks  # only the parent process loads the embedding model
+
+    writer = IndexWriter(root, index_kind=index_kind, storage=storage)
+    next_id = 0
+    stats = {"documents": 0, "failed": 0, "chunks": 0, "embed_seconds": 0.0}
+    buffer_texts, buffer_metadata = [], []
+
+    def flush():
+        start = time.perf_counter()
+        embeddings, _ = embed_chunks(buffer_texts)
+        stats["embed_seconds"] += time.perf_counter() - start
+        writer.add(embeddings, list(buffer_texts), list(buffer_metadata))
+        stats["chunks"] += len(buffer_texts)
+        buffer_texts.clear()
+        buffer_metadata.clear()
+
+    start = time.perf_counter()
+    try:
+        for path, result, error in iter_chunked_documents(file_paths, workers=workers, max_pending=max_pending):
+            filename = os.path.basename(path)
+            if error is not None:
+                print(f"❌ Failed to process {filename}: {error}")
+                stats["failed"] += 1
+                continue
+
+            fingerprint, (chunks, chunk_metadata) = result
+            print(f"🔍 Processed {filename} ({len(chunks)} chunks)")
+            stats["documents"] += 1
+            # Chunks are appended in buffer order, so each document gets one contiguous id range
+            ranges = [[next_id, next_id + len(chunks)]] if chunks else []
+            writer.manifest["files"][filename] = {**fingerprint, "ids": ranges}
+            next_id += len(chunks)
+            buffer_texts.extend(chunks)
+            buffer_metadata.extend({"source": filename, **m} for m in chunk_metadata)
+            if len(buffer_texts) >= batch_size:
+                flush()
+
+        if buffer_texts:
+            flush()
+        stats["snapshot"] = writer.close()
+    except BaseException:
+        # Releases the root's writer lock too
+        writer.snapshot.abort()
+        raise
+
+    stats["total_seconds"] = time.perf_counter() - start
+    stats["embed_seconds"] = round(stats["embed_seconds"], 3)
+    stats["total_seconds"] = round(stats["total_seconds"], 3)
+    try:
+        import resource
+        stats["peak_rss_mb"] = round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+    except ImportError:  # not available on Windows
+        pass
+    return stats
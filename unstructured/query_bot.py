@@ -1,55 +1,23 @@
 # query_bot.py
 
-import pickle
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from transformers import pipeline
+import threading
+
+from .answer_cache import get_answer_cache
+from .context_packer import pack_context
+from .retriever import format_source, get_retriever
+from . import t5_generator
+from common.tracing import traced
 
 # ==== CONFIG ====
-FAISS_PATH = "data/faiss_index/company_docs.index"
-META_PATH = "data/faiss_index/company_docs.pkl"
-EMBED_MODEL = "all-MiniLM-L6-v2"   # Embedding model for retrieval
+INDEX_ROOT = "data/faiss_index"    # Live snapshot is read from INDEX_ROOT/CURRENT
 HF_MODEL = "google/flan-t5-base"   # Free Hugging Face LLM
 # HF_MODEL = "MBZUAI/LaMini-T5-738M"       # Better small instruction model
 
 TOP_K = 3
+MAX_INPUT_TOKENS = 512             # flan-t5 input length; the packed prompt never exceeds it
 # ================
 
-# Load FAISS index
-index = faiss.read_index(FAISS_PATH)
-
-# Load metadata
-with open(META_PATH, "rb") as f:
-    meta_data = pickle.load(f)
-all_texts = meta_data["texts"]
-all_metadata = meta_data["metadata"]
-
-# Load embedding model
-embedder = SentenceTransformer(EMBED_MODEL)
-
-# Load Hugging Face model pipeline
-generator = pipeline("text2text-generation", model=HF_MODEL)
-
-def retrieve(query, k=TOP_K):
-    """Retrieve top-k chunks from FAISS."""
-    query_vec = embedder.encode([query], convert_to_numpy=True).astype("float32")
-    distances, indices = index.search(query_vec, k)
-    
-    results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        results.append({
-            "text": all_texts[idx],
-            "source": all_metadata[idx]["source"],
-            "distance": float(dist)
-        })
-    return results
-
-def generate_answer(question, context_chunks):
-    """Use Hugging Face model to generate an answer based on retrieved context."""
-    context_text = "\n\n".join([c["text"] for c in context_chunks])
-    
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a helpful and engaging assistant. 
 Answer the question **only** using the provided context below. 
 If the context does not contain enough information to fully answer, 
@@ -64,8 +32,96 @@ Context:
 
 Answer:
 """
-    response = generator(prompt, max_length=200, truncation=True)
-    return response[0]["generated_text"]
+
+# Nothing heavy happens at import: the retriever is shared with the OpenAI bot
+# and the generator is only loaded the first time an answer is generated.
+_generator = None
+_generation_queue = None
+_generator_lock = threading.Lock()
+
+
+def get_generator():
+    """Loads the generator (see unstructured/t5_generator.py for backend and decoding) once per process, on first use."""
+    global _generator, _generation_queue
+    if _generator is None:
+        with _generator_lock:
+            if _generator is None:
+                print(f"🔌 Loading generator {HF_MODEL}...")
+                generator = t5_generator.T5Generator(HF_MODEL)
+                _generation_queue = t5_generator.GenerationQueue(generator)
+                _generator = generator
+    return _generator
+
+
+def _cache_engine():
+    # Quantized or beam-searched answers can differ from fp32 greedy ones, so they are cached apart
+    return f"hf:{HF_MODEL}:{t5_generator.BACKEND}:beams={t5_generator.NUM_BEAMS}"
+
+
+def get_generation_queue():
+    """Queue batching the prompts of concurrent answers into one generate() call."""
+    get_generator()
+    return _generation_queue
+
+
+def retrieve(query, k=TOP_K, nprobe=None, ef_search=None, filters=None):
+    """
+    Retrieve top-k chunks from FAISS.
+    nprobe (IVF indexes) and ef_search (HNSW) trade speed for recall per query.
+    filters limits the search to matching documents, e.g. {"source": ["Handout-2.1.pdf"]}.
+    """
+    return get_retriever(INDEX_ROOT).retrieve(query, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+
+def retrieve_many(queries, k=TOP_K, nprobe=None, ef_search=None, filters=None):
+    """Retrieve top-k chunks for a list of queries with one batched encode and search."""
+    return get_retriever(INDEX_ROOT).retrieve_many(queries, k=k, nprobe=nprobe, ef_search=ef_search,
+                                                   filters=filters)
+
+@traced("generate_answer.hf")
+def generate_answer(question, context_chunks, use_cache=True, snapshot=None):
+    """
+    Use Hugging Face model to generate an answer based on retrieved context.
+    Repeated or reworded questions over the same chunks are answered from the answer cache,
+    keyed to `snapshot` (the chunks' index snapshot; the live one under INDEX_ROOT by default).
+    """
+    if not use_cache:
+        return _generate_answer(question, context_chunks)
+    if snapshot is None:
+        snapshot = get_retriever(INDEX_ROOT).snapshot
+    return get_answer_cache().get_or_generate(_cache_engine(), question, context_chunks, snapshot, _generate_answer)
+
+def stream_answer(question, context_chunks, use_cache=True, snapshot=None):
+    """
+    Like generate_answer, but yields the answer text piece by piece as the
+    model decodes it. A cached answer is yielded in one piece.
+    """
+    if not use_cache:
+        return _stream_answer(question, context_chunks)
+    if snapshot is None:
+        snapshot = get_retriever(INDEX_ROOT).snapshot
+    return get_answer_cache().stream_or_generate(_cache_engine(), question, context_chunks, snapshot, _stream_answer)
+
+def build_prompt(question, context_chunks):
+    """
+    Prompt asking the model to answer only from the retrieved chunks. The
+    context is packed to fit flan-t5's input, so nothing is cut off.
+    """
+    tokenizer = get_generator().tokenizer
+    count_tokens = lambda text: len(tokenizer.encode(text, add_special_tokens=False))
+    # Room left for context once the instructions, question and end-of-sequence token are in
+    budget = MAX_INPUT_TOKENS - count_tokens(PROMPT_TEMPLATE.format(question=question, context_text="")) - 1
+    context_text, report = pack_context(context_chunks, count_tokens, budget=max(budget, 0))
+    print(f"✂️ Context {report['naive_tokens']} → {report['tokens']} tokens "
+          f"({report['chunks_used']}/{report['chunks']} chunks, saved {report['saved_tokens']})")
+    return PROMPT_TEMPLATE.format(question=question, context_text=context_text)
+
+@traced("llm.hf")
+def _generate_answer(question, context_chunks):
+    return get_generation_queue().generate(build_prompt(question, context_chunks))
+
+def _stream_answer(question, context_chunks):
+    # Decoded on the queue's worker thread, batched with other users' prompts
+    yield from get_generation_queue().stream(build_prompt(question, context_chunks))
 
 if __name__ == "__main__":
     while True:
@@ -76,14 +132,13 @@ if __name__ == "__main__":
         # 1. Retrieve from FAISS
         results = retrieve(query)
         
-        # 2. Generate synthesized answer
-        answer = generate_answer(query, results)
-        
-        # 3. Print answer
+        # 2. Stream the synthesized answer as it is generated
         print("\n💡 Answer:")
-        print(answer)
+        for piece in stream_answer(query, results):
+            print(piece, end="", flush=True)
+        print()
         
-        # 4. Show sources and distances
+        # 3. Show sources and distances
         print("\n📚 Sources:")
         for r in results:
-            print(f" - {r['source']} (distance: {r['distance']:.4f})")
+            print(f" - {format_source(r)} (distance: {r['distance']:.4f})")
@@ -1,64 +1,19 @@
-import pickle
-import faiss
-import numpy as np
-from sentence_transformers import SentenceTransformer
-from openai import OpenAI
+import threading
+
+from common.openai_client import DEFAULT_DEADLINE, MAX_RETRIES, get_async_client
+from common.tracing import traced
+from .answer_cache import get_answer_cache
+from .context_packer import pack_context, tiktoken_counter
+from .retriever import format_source, get_retriever
 
 # ==== CONFIG ====
-FAISS_PATH = "data/faiss_index/company_docs.index"
-META_PATH = "data/faiss_index/company_docs.pkl"
-EMBED_MODEL = "all-MiniLM-L6-v2"   # Still used for FAISS retrieval
+INDEX_ROOT = "data/faiss_index"    # Live snapshot is read from INDEX_ROOT/CURRENT
 OPENAI_MODEL = "gpt-4o-mini"       # Fast + cheaper; switch to "gpt-4o" for higher quality
 TOP_K = 3
+MAX_CONTEXT_TOKENS = 2000          # context budget per question (prompt tokens are billed)
 # ================
 
-from dotenv import load_dotenv
-import os
-from openai import OpenAI
-
-# Load .env file
-load_dotenv()
-
-# Get API key from env
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-
-# Initialize client with key
-client = OpenAI(api_key=OPENAI_API_KEY)
-
-
-# Load FAISS index
-index = faiss.read_index(FAISS_PATH)
-
-# Load metadata
-with open(META_PATH, "rb") as f:
-    meta_data = pickle.load(f)
-all_texts = meta_data["texts"]
-all_metadata = meta_data["metadata"]
-
-# Load embedding model (local SentenceTransformer)
-embedder = SentenceTransformer(EMBED_MODEL)
-
-
-def retrieve(query, k=TOP_K):
-    """Retrieve top-k chunks from FAISS."""
-    query_vec = embedder.encode([query], convert_to_numpy=True).astype("float32")
-    distances, indices = index.search(query_vec, k)
-
-    results = []
-    for dist, idx in zip(distances[0], indices[0]):
-        results.append({
-            "text": all_texts[idx],
-            "source": all_metadata[idx]["source"],
-            "distance": float(dist)
-        })
-    return results
-
-
-def generate_answer(question, context_chunks):
-    """Use OpenAI model to generate an answer based on retrieved context."""
-    context_text = "\n\n".join([c["text"] for c in context_chunks])
-
-    prompt = f"""
+PROMPT_TEMPLATE = """
 You are a helpful and engaging assistant.
 Answer the question **only** using the provided context below.
 If the context does not contain enough information to fully answer,
@@ -74,12 +29,127 @@ Context:
 Answer:
 """
 
-    response = client.chat.completions.create(
+from dotenv import load_dotenv
+import os
+
+# Load .env file
+load_dotenv()
+
+# Get API key from env
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+
+# The client is created on first use; the retriever is shared with the Hugging Face bot.
+_client = None
+_client_lock = threading.Lock()
+_token_counter = None
+
+
+def get_client():
+    """Creates the OpenAI client once per process, on first use."""
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import OpenAI
+                _client = OpenAI(api_key=OPENAI_API_KEY, max_retries=MAX_RETRIES, timeout=DEFAULT_DEADLINE)
+    return _client
+
+
+def retrieve(query, k=TOP_K, nprobe=None, ef_search=None, filters=None):
+    """
+    Retrieve top-k chunks from FAISS.
+    nprobe (IVF indexes) and ef_search (HNSW) trade speed for recall per query.
+    filters limits the search to matching documents, e.g. {"source": ["Handout-2.1.pdf"]}.
+    """
+    return get_retriever(INDEX_ROOT).retrieve(query, k=k, nprobe=nprobe, ef_search=ef_search, filters=filters)
+
+
+def retrieve_many(queries, k=TOP_K, nprobe=None, ef_search=None, filters=None):
+    """Retrieve top-k chunks for a list of queries with one batched encode and search."""
+    return get_retriever(INDEX_ROOT).retrieve_many(queries, k=k, nprobe=nprobe, ef_search=ef_search,
+                                                   filters=filters)
+
+
+@traced("generate_answer.openai")
+def generate_answer(question, context_chunks, use_cache=True, snapshot=None):
+    """
+    Use OpenAI model to generate an answer based on retrieved context.
+    Repeated or reworded questions over the same chunks are answered from the answer cache,
+    keyed to `snapshot` (the chunks' index snapshot; the live one under INDEX_ROOT by default).
+    """
+    if not use_cache:
+        return _generate_answer(question, context_chunks)
+    if snapshot is None:
+        snapshot = get_retriever(INDEX_ROOT).snapshot
+    return get_answer_cache().get_or_generate(f"openai:{OPENAI_MODEL}", question, context_chunks, snapshot, _generate_answer)
+
+
+def stream_answer(question, context_chunks, use_cache=True, snapshot=None):
+    """
+    Like generate_answer, but yields the answer text as the completion
+    streams in. A cached answer is yielded in one piece.
+    """
+    if not use_cache:
+        return _stream_answer(question, context_chunks)
+    if snapshot is None:
+        snapshot = get_retriever(INDEX_ROOT).snapshot
+    return get_answer_cache().stream_or_generate(f"openai:{OPENAI_MODEL}", question, context_chunks, snapshot, _stream_answer)
+
+
+async def agenerate_answer(question, context_chunks, use_cache=True, deadline=DEFAULT_DEADLINE, snapshot=None):
+    """
+    Async generate_answer through the shared OpenAI client layer: calls are
+    limited in concurrency and rate, retried with backoff and bounded by
+    `deadline` seconds. Batch jobs can asyncio.gather many of these.
+    """
+    async def agenerate(question, context_chunks):
+        response = await get_async_client().chat(
+            _messages(question, context_chunks),
+            model=OPENAI_MODEL,
+            deadline=deadline,
+            max_tokens=300,
+            temperature=0.2
+        )
+        return response.choices[0].message.content
+
+    if not use_cache:
+        return await agenerate(question, context_chunks)
+    if snapshot is None:
+        snapshot = get_retriever(INDEX_ROOT).snapshot
+    return await get_answer_cache().aget_or_generate(f"openai:{OPENAI_MODEL}", question, context_chunks, snapshot, agenerate)
+
+
+def build_prompt(question, context_chunks):
+    """
+    Prompt asking the model to answer only from the retrieved chunks, with
+    the context deduplicated and packed into MAX_CONTEXT_TOKENS.
+    """
+    context_text, report = pack_context(context_chunks, get_token_counter(), budget=MAX_CONTEXT_TOKENS)
+    print(f"✂️ Context {report['naive_tokens']} → {report['tokens']} tokens "
+          f"({report['chunks_used']}/{report['chunks']} chunks, saved {report['saved_tokens']})")
+    return PROMPT_TEMPLATE.format(question=question, context_text=context_text)
+
+
+def get_token_counter():
+    """Token counter for OPENAI_MODEL (tiktoken when installed)."""
+    global _token_counter
+    if _token_counter is None:
+        _token_counter = tiktoken_counter(OPENAI_MODEL)
+    return _token_counter
+
+
+def _messages(question, context_chunks):
+    return [
+        {"role": "system", "content": "You are a knowledgeable assistant."},
+        {"role": "user", "content": build_prompt(question, context_chunks)}
+    ]
+
+
+@traced("llm.openai")
+def _generate_answer(question, context_chunks):
+    response = get_client().chat.completions.create(
         model=OPENAI_MODEL,
-        messages=[
-            {"role": "system", "content": "You are a knowledgeable assistant."},
-            {"role": "user", "content": prompt}
-        ],
+        messages=_messages(question, context_chunks),
         max_tokens=300,
         temperature=0.2
     )
@@ -87,6 +157,19 @@ Answer:
     return response.choices[0].message.content
 
 
+def _stream_answer(question, context_chunks):
+    stream = get_client().chat.completions.create(
+        model=OPENAI_MODEL,
+        messages=_messages(question, context_chunks),
+        max_tokens=300,
+        temperature=0.2,
+        stream=True
+    )
+    for chunk in stream:
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
+
+
 if __name__ == "__main__":
     while True:
         query = input("\n❓ Enter your question (or type 'exit' to quit): ")
@@ -96,14 +179,13 @@ if __name__ == "__main__":
         # 1. Retrieve from FAISS
         results = retrieve(query)
 
-        # 2. Generate synthesized answer
-        answer = generate_answer(query, results)
-
-        # 3. Print answer
+        # 2. Stream the synthesized answer as it is generated
         print("\n💡 Answer:")
-        print(answer)
+        for piece in stream_answer(query, results):
+            print(piece, end="", flush=True)
+        print()
 
-        # 4. Show sources and distances
+        # 3. Show sources and distances
         print("\n📚 Sources:")
         for r in results:
-            print(f" - {r['source']} (distance: {r['distance']:.4f})")
+            print(f" - {format_source(r)} (distance: {r['distance']:.4f})")
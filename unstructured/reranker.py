@@ -0,0 +1,119 @@
+# reranker.py
+
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from .embedding_cache import text_key
+from .model_registry import get_cross_encoder
+
+# ==== CONFIG ====
+RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"   # small CPU cross-encoder
+RERANK_CANDIDATES = 50     # candidates over-fetched from FAISS/BM25 and reranked
+RERANK_BATCH_SIZE = 16     # (query, chunk) pairs scored per forward pass
+RERANK_BUDGET_MS = 300     # per-query time budget; past it the retrieval order is kept
+SCORE_CACHE_SIZE = 100000  # cached (query, chunk) scores, least recently used evicted
+# ================
+
+_rerankers = {}
+_lock = threading.Lock()
+
+
+class Reranker:
+    """
+    Reorders retrieved candidates by cross-encoder relevance to the query.
+
+    Pairs are scored in batches, cached scores first, until all candidates
+    are scored or the query's time budget runs out. A reranking that could
+    not finish falls back to the retrieval order, but the scores computed so
+    far are cached, so a repeated query gets further next time. Scores are
+    keyed by the query and the chunk's text, so they stay valid across index
+    snapshots.
+    """
+
+    def __init__(self, model_name=RERANK_MODEL, batch_size=RERANK_BATCH_SIZE,
+                 budget_ms=RERANK_BUDGET_MS, cache_size=SCORE_CACHE_SIZE):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.cache_size = cache_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats = {"queries": 0, "reranked": 0, "fallbacks": 0, "cached_pairs": 0, "scored_pairs": 0}
+
+    def _cached(self, keys):
+        with self._lock:
+            scores = []
+            for key in keys:
+                score = self._scores.get(key)
+                if score is not None:
+                    self._scores.move_to_end(key)
+                scores.append(score)
+            return scores
+
+    def _store(self, keys, scores):
+        with self._lock:
+            for key, score in zip(keys, scores):
+                self._scores[key] = float(score)
+                self._scores.move_to_end(key)
+            while len(self._scores) > self.cache_size:
+                self._scores.popitem(last=False)
+
+    def rerank(self, query, candidates, k, budget_ms=None):
+        """
+        Returns the k most relevant candidates.
+
+        Args:
+            candidates (List[dict]): Retrieved chunks (with "text"), best first.
+            budget_ms (float): Time budget for this query; defaults to the reranker's.
+
+        Returns:
+            List[dict]: k candidates with a "rerank_score", or the first k in
+            retrieval order when the budget ran out.
+        """
+        if not candidates:
+            return []
+        model = get_cross_encoder(self.model_name)  # loading is not charged to the budget
+        budget_ms = self.budget_ms if budget_ms is None else budget_ms
+        deadline = time.perf_counter() + budget_ms / 1000.0
+        query_key = text_key(query)
+        keys = [(self.model_name, query_key, text_key(c["text"])) for c in candidates]
+
+        scores = self._cached(keys)
+        todo = [i for i, score in enumerate(scores) if score is None]
+        self.stats["queries"] += 1
+        self.stats["cached_pairs"] += len(candidates) - len(todo)
+
+        if todo:
+            for start in range(0, len(todo), self.batch_size):
+                if time.perf_counter() >= deadline:
+                    break
+                batch = todo[start:start + self.batch_size]
+                batch_scores = model.predict([(query, candidates[i]["text"]) for i in batch],
+                                             batch_size=self.batch_size, show_progress_bar=False)
+                self._store([keys[i] for i in batch], batch_scores)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                self.stats["scored_pairs"] += len(batch)
+
+        if any(score is None for score in scores):
+            self.stats["fallbacks"] += 1
+            print(f"⏳ Rerank budget of {budget_ms:.0f}ms ran out, keeping retrieval order")
+            return candidates[:k]
+
+        self.stats["reranked"] += 1
+        order = np.argsort(-np.asarray(scores), kind="stable")[:k]
+        return [{**candidates[i], "rerank_score": scores[i]} for i in order]
+
+
+def get_reranker(model_name=RERANK_MODEL):
+    """Process-wide reranker (and score cache) for a cross-encoder model."""
+    reranker = _rerankers.get(model_name)
+    if reranker is None:
+        with _lock:
+            reranker = _rerankers.get(model_name)
+            if reranker is None:
+                reranker = _rerankers[model_name] = Reranker(model_name)
+    return reranker
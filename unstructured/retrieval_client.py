@@ -0,0 +1,78 @@
+# retrieval_client.py
+
+import os
+
+import httpx
+
+# ==== CONFIG ====
+SERVICE_URL_ENV = "RETRIEVAL_SERVICE_URL"   # set it to make main.py a thin client of retrieval_service
+TIMEOUT = httpx.Timeout(60.0, connect=5.0)  # answers can take a while; a dead service should fail fast
+# ================
+
+
+def service_url():
+    """Base URL of the retrieval service from the environment, or None to work in-process."""
+    return os.getenv(SERVICE_URL_ENV) or None
+
+
+class RetrievalClient:
+    """
+    Client of unstructured.retrieval_service with the same calls main.py
+    makes on the in-process retriever and bots, so the app only swaps the
+    object it talks to.
+    """
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self._http = httpx.Client(base_url=self.base_url, timeout=TIMEOUT)
+
+    def _post(self, path, body):
+        response = self._http.post(path, json=body)
+        response.raise_for_status()
+        return response.json()
+
+    def retrieve(self, query, k=None, filters=None, **options):
+        body = {"query": query, "filters": filters, **options}
+        if k is not None:
+            body["k"] = k
+        return self._post("/retrieve", body)["results"]
+
+    def retrieve_many(self, queries, k=None, filters=None, **options):
+        body = {"queries": list(queries), "filters": filters, **options}
+        if k is not None:
+            body["k"] = k
+        return self._post("/retrieve_many", body)["results"]
+
+    def generate_answer(self, engine, question, chunks):
+        return self._post("/answer", {"engine": engine, "question": question, "chunks": chunks})["answer"]
+
+    def stream_answer(self, engine, question, chunks):
+        """Yields answer text as the service generates it."""
+        body = {"engine": engine, "question": question, "chunks": chunks, "stream": True}
+        with self._http.stream("POST", "/answer", json=body) as response:
+            response.raise_for_status()
+            for piece in response.iter_text():
+                if piece:
+                    yield piece
+
+    def bot(self, engine):
+        """Object with a bot module's stream_answer/generate_answer, answering on the service."""
+        return RemoteBot(self, engine)
+
+    def documents(self):
+        return self._http.get("/documents").raise_for_status().json()["documents"]
+
+    def stats(self):
+        return self._http.get("/stats").raise_for_status().json()
+
+
+class RemoteBot:
+    def __init__(self, client, engine):
+        self.client = client
+        self.engine = engine
+
+    def generate_answer(self, question, context_chunks):
+        return self.client.generate_answer(self.engine, question, context_chunks)
+
+    def stream_answer(self, question, context_chunks):
+        return self.client.stream_answer(self.engine, question, context_chunks)
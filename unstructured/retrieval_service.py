@@ -0,0 +1,255 @@
+# retrieval_service.py
+# Run from the project root: python -m unstructured.retrieval_service [--host 127.0.0.1 --port 8765]
+# Then start the app as a thin client: RETRIEVAL_SERVICE_URL=http://127.0.0.1:8765 streamlit run main.py
+
+import argparse
+import asyncio
+import importlib
+import json
+import math
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+from fastapi import FastAPI, HTTPException
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from pydantic import BaseModel
+
+from .answer_cache import get_answer_cache
+from .retriever import HYBRID, RERANK, TOP_K, get_retriever
+from .snapshots import INDEX_ROOT, current_documents
+from common import tracing
+
+# ==== CONFIG ====
+SERVICE_HOST = "127.0.0.1"
+SERVICE_PORT = 8765
+BATCH_WINDOW_MS = 5        # how long the first query of a batch waits for others to join it
+MAX_BATCH_SIZE = 64        # queries per retrieve_many call
+GENERATE_WORKERS = 4       # answers generated concurrently (retrieval batches run on their own thread)
+# ================
+
+# Same engines as main.py's BOT_MODULES
+BOT_MODULES = {
+    "HuggingFace": "unstructured.query_bot",
+    "OpenAI": "unstructured.query_bot_openai",
+}
+
+
+class MicroBatcher:
+    """
+    Collects concurrent retrieve requests into retrieve_many batches.
+
+    The first request of a batch waits up to BATCH_WINDOW_MS for others;
+    requests with the same options then share one encode and one FAISS
+    search. Batches run one at a time on a dedicated thread, so requests
+    arriving while a batch is being searched simply form the next batch
+    and the event loop keeps accepting connections.
+    """
+
+    def __init__(self, retriever, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.retriever = retriever
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = asyncio.Queue()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="retrieve-batch")
+        self._task = None
+        self.stats = {"requests": 0, "batches": 0, "max_batch": 0, "search_seconds": 0.0}
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def retrieve(self, query, **options):
+        """Result list of one query, retrieved in a batch with concurrent requests."""
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((query, options, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            groups = {}
+            for query, options, future in batch:
+                key = json.dumps(options, sort_keys=True, default=str)
+                groups.setdefault(key, (options, []))[1].append((query, future))
+            for options, requests in groups.values():
+                queries = [query for query, _ in requests]
+                start = time.perf_counter()
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, lambda: self.retriever.retrieve_many(queries, **options))
+                except Exception as e:
+                    for _, future in requests:
+                        if not future.done():
+                            future.set_exception(e)
+                    continue
+                self.stats["search_seconds"] += time.perf_counter() - start
+                self.stats["requests"] += len(queries)
+                self.stats["batches"] += 1
+                self.stats["max_batch"] = max(self.stats["max_batch"], len(queries))
+                for (_, future), result in zip(requests, results):
+                    if not future.done():
+                        future.set_result(result)
+
+
+def _number(value):
+    """NumPy scalars as plain floats; NaN (BM25-only hits without stored vectors) as null."""
+    value = float(value)
+    return None if math.isnan(value) else value
+
+
+def _jsonable(results):
+    jsonable = []
+    for hits in results:
+        hits = [{**r, "id": int(r["id"]), "distance": _number(r["distance"])} for r in hits]
+        for r in hits:
+            if "rerank_score" in r:
+                r["rerank_score"] = _number(r["rerank_score"])
+        jsonable.append(hits)
+    return jsonable
+
+
+class RetrieveRequest(BaseModel):
+    query: str
+    k: int = TOP_K
+    filters: Optional[dict] = None
+    hybrid: bool = HYBRID
+    rerank: bool = RERANK
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+
+class RetrieveManyRequest(BaseModel):
+    queries: List[str]
+    k: int = TOP_K
+    filters: Optional[dict] = None
+    hybrid: bool = HYBRID
+    rerank: bool = RERANK
+    nprobe: Optional[int] = None
+    ef_search: Optional[int] = None
+
+
+class AnswerRequest(BaseModel):
+    question: str
+    engine: str = "OpenAI"
+    chunks: Optional[List[dict]] = None   # retrieved beforehand; retrieved here when missing
+    k: int = TOP_K
+    filters: Optional[dict] = None
+    stream: bool = False
+
+
+def create_app(root=INDEX_ROOT):
+    state = {}
+    generate_pool = ThreadPoolExecutor(max_workers=GENERATE_WORKERS, thread_name_prefix="generate")
+
+    @asynccontextmanager
+    async def lifespan(app):
+        # Load the index snapshot and the embedding model once, before the first request
+        retriever = await asyncio.get_running_loop().run_in_executor(None, get_retriever, root)
+        state["retriever"] = retriever
+        state["batcher"] = MicroBatcher(retriever)
+        state["batcher"].start()
+        yield
+        await state["batcher"].stop()
+        generate_pool.shutdown(wait=False)
+
+    app = FastAPI(title="Document retrieval service", lifespan=lifespan)
+
+    def _bot(engine):
+        if engine not in BOT_MODULES:
+            raise HTTPException(status_code=400, detail=f"Unknown engine {engine!r}; expected one of {list(BOT_MODULES)}")
+        return importlib.import_module(BOT_MODULES[engine])
+
+    @app.post("/retrieve")
+    async def retrieve(request: RetrieveRequest):
+        options = request.model_dump(exclude={"query"})
+        try:
+            results = await state["batcher"].retrieve(request.query, **options)
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"results": _jsonable([results])[0]}
+
+    @app.post("/retrieve_many")
+    async def retrieve_many(request: RetrieveManyRequest):
+        options = request.model_dump(exclude={"queries"})
+        retriever = state["retriever"]
+        try:
+            results = await asyncio.get_running_loop().run_in_executor(
+                None, lambda: retriever.retrieve_many(request.queries, **options))
+        except (ValueError, TypeError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"results": _jsonable(results)}
+
+    @app.post("/answer")
+    async def answer(request: AnswerRequest):
+        bot = _bot(request.engine)
+        chunks = request.chunks
+        if chunks is None:
+            chunks = _jsonable([await state["batcher"].retrieve(request.question, k=request.k,
+                                                                 filters=request.filters)])[0]
+        # Cached answers are keyed to the snapshot of this service's root, not the bot's default root
+        snapshot = state["retriever"].snapshot
+        options = {"snapshot": snapshot, "use_cache": snapshot is not None}
+        if request.stream:
+            # A plain generator is iterated on Starlette's thread pool, one piece per chunk of the body
+            return StreamingResponse(bot.stream_answer(request.question, chunks, **options),
+                                     media_type="text/plain")
+        text = await asyncio.get_running_loop().run_in_executor(
+            generate_pool, lambda: bot.generate_answer(request.question, chunks, **options))
+        return {"answer": text, "chunks": chunks}
+
+    @app.get("/documents")
+    async def documents():
+        return {"documents": current_documents(root)}
+
+    @app.get("/stats")
+    async def stats():
+        batcher = state["batcher"].stats
+        snapshot = state["retriever"].snapshot
+        return {
+            "snapshot": snapshot.version if snapshot else None,
+            "batching": {**batcher, "mean_batch": batcher["requests"] / batcher["batches"] if batcher["batches"] else 0.0},
+            "answer_cache": get_answer_cache().stats(),
+        }
+
+    @app.get("/metrics", response_class=PlainTextResponse)
+    async def metrics():
+        # Prometheus scrape target; spans are recorded when RAG_TRACING=1
+        return tracing.export_prometheus()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Long-lived retrieval (and answer) service over the live index snapshot")
+    parser.add_argument("--host", default=SERVICE_HOST)
+    parser.add_argument("--port", type=int, default=SERVICE_PORT)
+    parser.add_argument("--root", default=INDEX_ROOT)
+    args = parser.parse_args()
+    # One process: the index, embedder and micro-batches are shared by every client
+    uvicorn.run(create_app(args.root), host=args.host, port=args.port, workers=1, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,222 @@
+# retriever.py
+
+import os
+import threading
+
+import numpy as np
+
+from .filters import EXACT_FILTER_ROWS
+from .index_factory import index_kind, rescore, search
+from .model_registry import encode, get_embedder
+from .reranker import RERANK_CANDIDATES, get_reranker
+from .snapshots import INDEX_ROOT, Snapshot, current_version, migrate_legacy_layout
+from common.tracing import count, span, traced
+
+# ==== CONFIG ====
+TOP_K = 3
+HYBRID = True          # fuse dense and BM25 results (needs a lexical index in the snapshot)
+FUSION_DEPTH = 20      # candidates taken from each ranking before fusion
+RRF_K = 60             # reciprocal rank fusion constant
+RERANK = True          # rerank RERANK_CANDIDATES retrieved chunks with a cross-encoder
+EXACT_RESCORE = True   # re-score quantized (fp16/int8/pq) indexes with the store's float32 vectors
+RESCORE_FACTOR = 4     # candidates over-fetched from a quantized index per result kept
+# ================
+
+_retrievers = {}
+_retrievers_lock = threading.Lock()
+
+
+class Retriever:
+    """
+    Hybrid (dense + BM25) retrieval over the live index snapshot.
+
+    Every query checks (with one stat call) whether CURRENT points to a new
+    snapshot and, if so, opens it and swaps it in. Queries already running
+    keep the snapshot object they started with, so the swap never blocks or
+    breaks them, and the embedding model comes from the shared registry so
+    it is never reloaded.
+    """
+
+    def __init__(self, root=INDEX_ROOT):
+        self.root = root
+        self._snapshot = None
+        self._current_mtime = None
+        self._swap_lock = threading.Lock()
+        if current_version(root) is None:
+            migrate_legacy_layout(root)
+        self.refresh()
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def refresh(self, block=True):
+        """
+        Swaps to the live snapshot if it changed. With block=False the call
+        returns immediately when another thread is already swapping.
+        """
+        current_file = os.path.join(self.root, "CURRENT")
+        try:
+            mtime = os.stat(current_file).st_mtime_ns
+        except FileNotFoundError:
+            return False
+        if mtime == self._current_mtime:
+            return False
+        if not self._swap_lock.acquire(blocking=block):
+            return False
+        try:
+            version = current_version(self.root)
+            if self._snapshot is None or version != self._snapshot.version:
+                snapshot = Snapshot(version, self.root)
+                get_embedder(snapshot.embed_model)  # load before publishing the swap
+                self._snapshot = snapshot
+                print(f"🔄 Retriever now serving snapshot {version} ({snapshot.index.ntotal} chunks)")
+            self._current_mtime = mtime
+            return True
+        finally:
+            self._swap_lock.release()
+
+    def retrieve(self, query, k=TOP_K, nprobe=None, ef_search=None, hybrid=HYBRID, rerank=RERANK, filters=None):
+        """
+        Retrieve top-k chunks from FAISS, fused with BM25 results when hybrid
+        and reordered by the cross-encoder when rerank.
+        nprobe (IVF indexes) and ef_search (HNSW) trade speed for recall per query.
+        filters restricts the search to matching documents, e.g.
+        {"source": ["Handout-2.1.pdf"], "uploaded_after": date(2026, 10, 12)} (see filters.FILTER_KEYS).
+        """
+        return self.retrieve_many([query], k=k, nprobe=nprobe, ef_search=ef_search,
+                                  hybrid=hybrid, rerank=rerank, filters=filters)[0]
+
+    @traced("retrieve")
+    def retrieve_many(self, queries, k=TOP_K, nprobe=None, ef_search=None, hybrid=HYBRID, rerank=RERANK,
+                      filters=None):
+        """
+        Retrieve top-k chunks for many queries at once: one batched encode and
+        one FAISS search for the whole list.
+
+        With hybrid=True (and a lexical index in the snapshot) the dense and
+        BM25 rankings are fused with reciprocal rank fusion, so exact terms
+        such as CVE ids, tool names or flags are found even when the
+        embedding misses them. With rerank=True, RERANK_CANDIDATES chunks are
+        retrieved and a cross-encoder picks the top k within a time budget.
+        With filters, FAISS and BM25 only consider the matching chunks.
+
+        Returns:
+            List[List[dict]]: per query, the same result dicts as retrieve().
+        """
+        self.refresh(block=False)
+        snapshot = self._snapshot  # pin one snapshot for the whole batch
+        if snapshot is None:
+            raise FileNotFoundError(f"No index snapshot found under {self.root}; build the vector DB first")
+        if not queries:
+            return []
+
+        hybrid = hybrid and snapshot.lexical is not None
+        n_candidates = max(k, RERANK_CANDIDATES) if rerank else k
+        depth = max(n_candidates, FUSION_DEPTH) if hybrid else n_candidates
+        live, selector = snapshot.live, None
+        if filters:
+            match = snapshot.filters.match(filters)
+            if not match.count:
+                return [[] for _ in queries]
+            live, selector = match.mask, match.selector
+
+        count("queries", len(queries))
+        with span("retrieve.embed"):
+            query_vecs = encode(list(queries), model_name=snapshot.embed_model)
+        vectors = snapshot.store.vectors()
+        with span("retrieve.search"):
+            if (selector is not None and vectors is not None and match.count <= EXACT_FILTER_ROWS
+                    and index_kind(snapshot.index) != "flat"):
+                # IVF lists and HNSW graphs hold few of a narrow filter's chunks; scoring those chunks
+                # directly is exact and cheaper than searching the index for them
+                rows = np.broadcast_to(match.rows(), (len(queries), match.count))
+                distances, indices = rescore(vectors, query_vecs, rows, depth)
+            elif EXACT_RESCORE and snapshot.storage != "float32" and vectors is not None:
+                # Approximate codes pick the candidates, full-precision vectors order them
+                _, candidates = search(snapshot.index, query_vecs, depth * RESCORE_FACTOR,
+                                       nprobe=nprobe, ef_search=ef_search, selector=selector)
+                distances, indices = rescore(vectors, query_vecs, candidates, depth)
+            else:
+                distances, indices = search(snapshot.index, query_vecs, depth, nprobe=nprobe, ef_search=ef_search,
+                                            selector=selector)
+
+        ranked = []  # per query: [(id, distance or None)] best first
+        with span("retrieve.lexical" if hybrid else "retrieve.rank"):
+            for query, dists, ids in zip(queries, distances, indices):
+                # FAISS pads with -1 when depth > ntotal
+                dense = [(int(idx), float(dist)) for dist, idx in zip(dists, ids) if idx >= 0]
+                if hybrid:
+                    lexical_ids, _ = snapshot.lexical.search(query, depth, live=live)
+                    ranked.append(_fuse(dense, lexical_ids.tolist(), n_candidates))
+                else:
+                    ranked.append(dense[:n_candidates])
+
+        # Fetch every needed row in one pass
+        unique_ids = sorted({idx for hits in ranked for idx, _ in hits})
+        with span("retrieve.fetch"):
+            rows = dict(zip(unique_ids, snapshot.store.get(unique_ids)))
+
+        results = []
+        for query_vec, hits in zip(query_vecs, ranked):
+            query_results = []
+            for idx, dist in hits:
+                if dist is None:
+                    # Found by BM25 only: measure its distance from the stored vector
+                    dist = float(np.sum((vectors[idx] - query_vec) ** 2)) if vectors is not None else float("nan")
+                text, metadata = rows[idx]
+                query_results.append({
+                    "id": idx,
+                    "text": text,
+                    "source": metadata["source"],
+                    "page_start": metadata.get("page_start") or None,
+                    "page_end": metadata.get("page_end") or None,
+                    "distance": dist
+                })
+            results.append(query_results)
+
+        if rerank:
+            reranker = get_reranker()
+            with span("retrieve.rerank"):
+                results = [reranker.rerank(query, candidates, k) for query, candidates in zip(queries, results)]
+        return results
+
+
+def format_source(result):
+    """Citation of a retrieved chunk: its file, plus the page(s) it spans for PDFs."""
+    first, last = result.get("page_start"), result.get("page_end")
+    if not first:
+        return result["source"]
+    pages = f"p. {first}" if last in (None, first) else f"pp. {first}–{last}"
+    return f"{result['source']}, {pages}"
+
+
+def _fuse(dense, lexical_ids, k):
+    """
+    Reciprocal rank fusion: score(id) = sum over rankings of 1 / (RRF_K + rank).
+
+    Returns:
+        [(id, distance or None)]: the top k, keeping FAISS distances where known.
+    """
+    scores = {}
+    for rank, (idx, _) in enumerate(dense):
+        scores[idx] = scores.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+    for rank, idx in enumerate(lexical_ids):
+        scores[idx] = scores.get(idx, 0.0) + 1.0 / (RRF_K + rank + 1)
+    distance = dict(dense)
+    best = sorted(scores, key=lambda idx: -scores[idx])[:k]
+    return [(idx, distance.get(idx)) for idx in best]
+
+
+def get_retriever(root=INDEX_ROOT):
+    """
+    Process-wide Retriever for an index root. Both bots (and any other
+    caller) share it, so the snapshot and embedding model are opened once.
+    """
+    retriever = _retrievers.get(root)
+    if retriever is None:
+        with _retrievers_lock:
+            retriever = _retrievers.get(root)
+            if retriever is None:
+                retriever = _retrievers[root] = Retriever(root)
+    return retriever
@@ -0,0 +1,306 @@
+# snapshots.py
+
+import datetime
+import os
+import shutil
+import time
+
+import faiss
+
+from .chunk_store import ChunkStore, load_chunk_store
+from .filters import FilterIndex
+from .index_factory import index_kind, index_storage
+from .lexical_index import LexicalIndex, build_lexical_index
+from .manifest import live_mask, load_manifest, save_manifest
+from .model_registry import EMBED_MODEL
+
+# ==== CONFIG ====
+INDEX_ROOT = "data/faiss_index"
+KEEP_SNAPSHOTS = 3      # older snapshots are pruned after each commit
+MMAP_INDEX = True       # map index codes from disk: processes share one copy in the page cache
+# ================
+
+# Layout:
+#   <root>/CURRENT                      name of the live snapshot (replaced atomically)
+#   <root>/snapshots/<version>/
+#       index.faiss                     FAISS index (IndexIDMap, ids = store rows)
+#       store/                          chunk store (see chunk_store.py)
+#       lexical/                        BM25 inverted index over the store rows (see lexical_index.py)
+#       manifest.json                   version, embedding model/dim, index kind/storage, per-file chunk ids
+INDEX_FILE = "index.faiss"
+STORE_DIR = "store"
+LEXICAL_DIR = "lexical"
+MANIFEST_FILE = "manifest.json"
+LOCK_FILE = "writer.lock"               # <root>/writer.lock, held by the one SnapshotWriter at work
+
+# Chunk-store files that are only ever appended to; a new snapshot hard-links these
+# from its parent instead of copying them. The parent's meta.json bounds what it
+# reads, so rows appended for the child are invisible to it. Lexical segments
+# (.npy) are never modified at all, so they are shared the same way.
+_APPEND_ONLY_SUFFIX = ".bin"
+_IMMUTABLE_SUFFIX = ".npy"
+
+
+def _snapshots_dir(root):
+    return os.path.join(root, "snapshots")
+
+
+def current_version(root=INDEX_ROOT):
+    """Name of the live snapshot, or None if nothing has been committed yet."""
+    try:
+        with open(os.path.join(root, "CURRENT"), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def snapshot_path(version, root=INDEX_ROOT):
+    return os.path.join(_snapshots_dir(root), version)
+
+
+def current_documents(root=INDEX_ROOT):
+    """Sorted names of the documents in the live snapshot (read from its manifest only)."""
+    version = current_version(root)
+    if version is None:
+        return []
+    manifest = load_manifest(os.path.join(snapshot_path(version, root), MANIFEST_FILE)) or {}
+    return sorted(manifest.get("files", {}))
+
+
+def _read_index(path):
+    """Reads a published (never modified) index, memory-mapping its codes when supported."""
+    flag = getattr(faiss, "IO_FLAG_MMAP_IFC", None) if MMAP_INDEX else None
+    if flag is not None:
+        try:
+            return faiss.read_index(path, flag)
+        except RuntimeError:
+            pass  # index type that cannot be mapped
+    return faiss.read_index(path)
+
+
+class Snapshot:
+    """A committed, read-only snapshot: index, chunk store and manifest opened together."""
+
+    def __init__(self, version, root=INDEX_ROOT):
+        self.version = version
+        self.path = snapshot_path(version, root)
+        self.manifest = load_manifest(os.path.join(self.path, MANIFEST_FILE))
+        self.index = _read_index(os.path.join(self.path, INDEX_FILE))
+        self.storage = index_storage(self.index)
+        self.store = ChunkStore(os.path.join(self.path, STORE_DIR))
+        lexical_path = os.path.join(self.path, LEXICAL_DIR)
+        self.lexical = LexicalIndex(lexical_path) if os.path.isdir(lexical_path) else None
+        # Rows of removed documents are gone from the FAISS index but not from the store
+        self.live = live_mask(self.manifest, len(self.store)) if "files" in self.manifest else None
+        self.filters = FilterIndex(self.manifest, self.store, self.live)
+
+    @property
+    def embed_model(self):
+        return self.manifest.get("embed_model", EMBED_MODEL)
+
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(f):
+    try:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _lock_writer(root):
+    """
+    Takes the exclusive writer lock of `root`, waiting while another writer
+    (the app's index job thread, a builder or updater CLI) holds it. The
+    lock is released when the returned file is closed, or by the OS when
+    its process dies.
+    """
+    f = open(os.path.join(root, LOCK_FILE), "a+")
+    if not _try_lock(f):
+        print("⏳ Another index writer is running; waiting for it to finish...")
+        while not _try_lock(f):
+            time.sleep(0.2)
+    return f
+
+
+class SnapshotWriter:
+    """
+    Builds the next snapshot in a temporary directory. Nothing is visible to
+    readers until commit(), which renames the directory into place and then
+    atomically repoints CURRENT; a crash before that leaves the live snapshot
+    untouched.
+
+    With derive=True the writer starts from the live snapshot: the index and
+    manifest are copied and the append-only chunk-store files are hard-linked,
+    so appending costs time proportional to the new rows only. Snapshots are
+    only ever derived from CURRENT, which is what keeps the shared files safe.
+
+    A writer holds the root's lock file from creation until commit() or
+    abort(), so writers in other threads or processes wait for it instead
+    of deriving from the same parent or deleting its temp directory.
+    """
+
+    def __init__(self, root=INDEX_ROOT, derive=True):
+        self.root = root
+        snapshots_dir = _snapshots_dir(root)
+        os.makedirs(snapshots_dir, exist_ok=True)
+        self._lock = _lock_writer(root)
+        try:
+            self._start(snapshots_dir, derive)
+        except BaseException:
+            self.abort()
+            raise
+
+    def _start(self, snapshots_dir, derive):
+        # The parent is read under the lock, so no other writer can publish in between
+        self.version = datetime.datetime.now().strftime("v%Y%m%d-%H%M%S-%f")
+        self.parent = current_version(self.root) if derive else None
+        # Holding the lock, any other temp dir is from a crashed run
+        for leftover in os.listdir(snapshots_dir):
+            if leftover.startswith(".tmp-"):
+                shutil.rmtree(os.path.join(snapshots_dir, leftover), ignore_errors=True)
+        self.path = os.path.join(snapshots_dir, f".tmp-{self.version}")
+        os.makedirs(self.path)
+        self.manifest = {"files": {}}
+
+        if self.parent:
+            root = self.root
+            parent_path = snapshot_path(self.parent, root)
+            shutil.copyfile(os.path.join(parent_path, INDEX_FILE), self.index_path)
+            self.manifest = load_manifest(os.path.join(parent_path, MANIFEST_FILE))
+            for subdir, shared_suffix in ((STORE_DIR, _APPEND_ONLY_SUFFIX), (LEXICAL_DIR, _IMMUTABLE_SUFFIX)):
+                parent_dir = os.path.join(parent_path, subdir)
+                if not os.path.isdir(parent_dir):
+                    continue
+                os.makedirs(os.path.join(self.path, subdir))
+                for name in os.listdir(parent_dir):
+                    src, dst = os.path.join(parent_dir, name), os.path.join(self.path, subdir, name)
+                    if name.endswith(shared_suffix):
+                        os.link(src, dst)
+                    elif not name.endswith(".tmp"):
+                        shutil.copyfile(src, dst)
+
+    @property
+    def index_path(self):
+        return os.path.join(self.path, INDEX_FILE)
+
+    @property
+    def store_path(self):
+        return os.path.join(self.path, STORE_DIR)
+
+    @property
+    def lexical_path(self):
+        return os.path.join(self.path, LEXICAL_DIR)
+
+    def open_lexical(self):
+        """The lexical index being written, or None if this snapshot has none yet."""
+        return LexicalIndex(self.lexical_path) if os.path.isdir(self.lexical_path) else None
+
+    def read_index(self):
+        return faiss.read_index(self.index_path) if os.path.exists(self.index_path) else None
+
+    def open_store(self):
+        return ChunkStore(self.store_path)
+
+    def write_index(self, index):
+        faiss.write_index(index, self.index_path)
+
+    def commit(self, embed_model=EMBED_MODEL):
+        """Publishes the snapshot and makes it the live one."""
+        if not os.path.exists(self.index_path):
+            raise ValueError("Cannot commit a snapshot without an index")
+        index = faiss.read_index(self.index_path)
+        self.manifest.update({
+            "version": self.version,
+            "parent": self.parent,
+            "created": datetime.datetime.now().isoformat(timespec="seconds"),
+            "embed_model": embed_model,
+            "dim": index.d,
+            "index_kind": index_kind(index),
+            "storage": index_storage(index),
+            "chunks": index.ntotal,
+        })
+        save_manifest(os.path.join(self.path, MANIFEST_FILE), self.manifest)
+
+        final_path = snapshot_path(self.version, self.root)
+        os.rename(self.path, final_path)
+        tmp = os.path.join(self.root, "CURRENT.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(self.version)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, os.path.join(self.root, "CURRENT"))
+        print(f"📸 Published snapshot {self.version}")
+        prune_snapshots(self.root)
+        self._release()
+        return self.version
+
+    def abort(self):
+        """Discards the snapshot being written."""
+        if getattr(self, "path", None):
+            shutil.rmtree(self.path, ignore_errors=True)
+        self._release()
+
+    def _release(self):
+        if self._lock is not None:
+            self._lock.close()
+            self._lock = None
+
+
+def prune_snapshots(root=INDEX_ROOT, keep=KEEP_SNAPSHOTS):
+    """
+    Deletes all but the newest `keep` snapshots. Readers still holding a
+    pruned snapshot keep working from their open file handles and maps.
+    """
+    snapshots_dir = _snapshots_dir(root)
+    live = current_version(root)
+    versions = sorted(v for v in os.listdir(snapshots_dir) if not v.startswith("."))
+    for version in versions[:-keep]:
+        if version != live:
+            shutil.rmtree(os.path.join(snapshots_dir, version), ignore_errors=True)
+
+
+def migrate_legacy_layout(root=INDEX_ROOT):
+    """
+    Publishes the pre-snapshot files (company_docs.index + company_docs_store
+    or company_docs.pkl) as the first snapshot. Returns its version, or None
+    if there is nothing to migrate.
+    """
+    legacy_index = os.path.join(root, "company_docs.index")
+    if current_version(root) or not os.path.exists(legacy_index):
+        return None
+
+    writer = SnapshotWriter(root, derive=False)
+    try:
+        if current_version(root):
+            writer.abort()  # another process migrated while we waited for the lock
+            return None
+        legacy_store = os.path.join(root, "company_docs_store")
+        if os.path.exists(os.path.join(legacy_store, "meta.json")):
+            shutil.copytree(legacy_store, writer.store_path)
+        else:
+            load_chunk_store(writer.store_path, legacy_pickle=os.path.join(root, "company_docs.pkl"),
+                             faiss_path=legacy_index)
+        shutil.copyfile(legacy_index, writer.index_path)
+        store = writer.open_store()
+        build_lexical_index(writer.lexical_path, store)
+        store.close()
+        legacy_manifest = load_manifest(os.path.join(root, "manifest.json"))
+        if legacy_manifest:
+            writer.manifest = legacy_manifest
+        else:
+            writer.manifest = {}  # no per-file data: the incremental updater bootstraps it
+        return writer.commit()
+    except BaseException:
+        writer.abort()
+        raise
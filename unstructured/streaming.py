@@ -0,0 +1,37 @@
+# streaming.py
+
+import time
+
+
+class StreamTimer:
+    """
+    Wraps a stream of answer pieces and records time-to-first-token
+    separately from the total generation time.
+
+    Both are measured from `start` (default: when the wrapper is created),
+    so passing the time the question was submitted gives user-perceived
+    latency including retrieval.
+    """
+
+    def __init__(self, pieces, start=None):
+        self.pieces = pieces
+        self.start = time.perf_counter() if start is None else start
+        self.ttft = None      # seconds until the first non-empty piece
+        self.total = None     # seconds until the stream was exhausted
+        self.text = ""
+
+    def __iter__(self):
+        parts = []
+        for piece in self.pieces:
+            if self.ttft is None and piece:
+                self.ttft = time.perf_counter() - self.start
+            parts.append(piece)
+            yield piece
+        self.total = time.perf_counter() - self.start
+        if self.ttft is None:
+            self.ttft = self.total
+        self.text = "".join(parts)
+        print(f"⏱ First token after {self.ttft:.2f}s, full answer after {self.total:.2f}s")
+
+    def timings(self):
+        return {"ttft_seconds": self.ttft, "total_seconds": self.total}
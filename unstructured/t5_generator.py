@@ -0,0 +1,197 @@
+# t5_generator.py
+
+import os
+import queue
+import threading
+import time
+
+# ==== CONFIG ====
+BACKEND = "int8"           # "torch" (fp32), "int8" (dynamically quantized linear layers) or "onnx" (ONNX Runtime)
+NUM_BEAMS = 1              # 1 = greedy decoding (answers stream); more beams search wider but only return whole answers
+MAX_LENGTH = 200           # generated tokens per answer
+MAX_INPUT_TOKENS = 512     # flan-t5 input length
+BATCH_WINDOW_MS = 20       # how long the first prompt of a batch waits for concurrent ones
+MAX_BATCH_SIZE = 8         # prompts per generate() call
+ONNX_DIR = "data/onnx"     # exported ONNX models, reused across restarts
+# ================
+
+BACKENDS = ("torch", "int8", "onnx")
+
+
+def _onnx_model(model_name, onnx_dir=None):
+    """ONNX Runtime seq2seq model, exported from the checkpoint once and reused after."""
+    from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+    export_dir = onnx_dir or os.path.join(ONNX_DIR, model_name.strip("/").replace("/", "--"))
+    if os.path.exists(os.path.join(export_dir, "config.json")):
+        return ORTModelForSeq2SeqLM.from_pretrained(export_dir)
+    print(f"📦 Exporting {model_name} to ONNX in {export_dir}...")
+    model = ORTModelForSeq2SeqLM.from_pretrained(model_name, export=True)
+    model.save_pretrained(export_dir)
+    return model
+
+
+class T5Generator:
+    """
+    A seq2seq model (flan-t5) and its tokenizer, set up for CPU inference.
+
+    "int8" replaces every nn.Linear with a dynamically quantized one: weights
+    are stored as int8 and activations are quantized on the fly, which is
+    where almost all of T5's CPU time goes. "onnx" runs the exported model on
+    ONNX Runtime (needs `optimum[onnxruntime]`; falls back to "int8" when it
+    is not installed). Prompts are decoded in padded batches.
+    """
+
+    def __init__(self, model_name, backend=BACKEND, num_beams=NUM_BEAMS, max_length=MAX_LENGTH, onnx_dir=None):
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown generator backend {backend!r}; expected one of {BACKENDS}")
+        import torch
+        from transformers import AutoModelForSeq2SeqLM, AutoTokenizer
+
+        start = time.perf_counter()
+        self.model_name = model_name
+        self.num_beams = num_beams
+        self.max_length = max_length
+        self.tokenizer = AutoTokenizer.from_pretrained(model_name)
+        if backend == "onnx":
+            try:
+                self.model = _onnx_model(model_name, onnx_dir)
+            except ImportError:
+                print("⚠️ optimum[onnxruntime] is not installed; using the int8 backend instead")
+                backend = "int8"
+        if backend != "onnx":
+            self.model = AutoModelForSeq2SeqLM.from_pretrained(model_name).eval()
+            if backend == "int8":
+                self.model = torch.ao.quantization.quantize_dynamic(self.model, {torch.nn.Linear}, dtype=torch.qint8)
+        self.backend = backend
+        print(f"⚙️ Loaded generator {model_name} ({backend}, num_beams={num_beams}) "
+              f"in {time.perf_counter() - start:.2f}s")
+
+    def generate(self, prompts, streamer=None):
+        """Answers for a batch of prompts; `streamer` receives the tokens of greedy decoding step by step."""
+        import torch
+
+        inputs = self.tokenizer(prompts, return_tensors="pt", padding=True, truncation=True,
+                                max_length=MAX_INPUT_TOKENS)
+        with torch.inference_mode():
+            output_ids = self.model.generate(**inputs, max_length=self.max_length, num_beams=self.num_beams,
+                                             do_sample=False, streamer=streamer if self.num_beams == 1 else None)
+        return self.tokenizer.batch_decode(output_ids, skip_special_tokens=True)
+
+
+class BatchStreamer:
+    """
+    Streamer for batched greedy decoding: splits each step's tokens by row
+    and hands every request its newly decoded text. Like transformers'
+    TextStreamer, text is released up to the last space so partial words
+    are never shown.
+    """
+
+    def __init__(self, tokenizer, requests):
+        self.tokenizer = tokenizer
+        self.requests = requests
+        self.tokens = [[] for _ in requests]
+        self.sent = [0] * len(requests)
+
+    def put(self, value):
+        rows = value.tolist()
+        for i, row in enumerate(rows):
+            self.tokens[i].extend(row if isinstance(row, list) else [row])
+            text = self.tokenizer.decode(self.tokens[i], skip_special_tokens=True)
+            end = text.rfind(" ") + 1
+            if end > self.sent[i]:
+                self.requests[i].pieces.put(text[self.sent[i]:end])
+                self.sent[i] = end
+
+    def end(self):
+        for i, request in enumerate(self.requests):
+            text = self.tokenizer.decode(self.tokens[i], skip_special_tokens=True)
+            if len(text) > self.sent[i]:
+                request.pieces.put(text[self.sent[i]:])
+                self.sent[i] = len(text)
+
+
+class _Request:
+    _DONE = object()
+
+    def __init__(self, prompt):
+        self.prompt = prompt
+        self.pieces = queue.Queue()
+
+    def finish(self, error=None):
+        self.pieces.put(error if error is not None else self._DONE)
+
+    def __iter__(self):
+        while True:
+            piece = self.pieces.get()
+            if piece is self._DONE:
+                return
+            if isinstance(piece, Exception):
+                raise piece
+            yield piece
+
+
+class GenerationQueue:
+    """
+    Batches prompts from concurrent callers into one generate() call.
+
+    A worker thread takes the first waiting prompt, waits up to
+    BATCH_WINDOW_MS for more (up to MAX_BATCH_SIZE), and decodes them
+    together. Callers either wait for their whole answer (generate) or
+    read it as it is decoded (stream); with beam search the answer arrives
+    in one piece when the batch finishes.
+    """
+
+    def __init__(self, generator, window_ms=BATCH_WINDOW_MS, max_batch_size=MAX_BATCH_SIZE):
+        self.generator = generator
+        self.window = window_ms / 1000.0
+        self.max_batch_size = max_batch_size
+        self._queue = queue.Queue()
+        self.stats = {"prompts": 0, "batches": 0, "max_batch": 0, "generate_seconds": 0.0}
+        self._worker = threading.Thread(target=self._run, name="generate-batch", daemon=True)
+        self._worker.start()
+
+    def submit(self, prompt):
+        request = _Request(prompt)
+        self._queue.put(request)
+        return request
+
+    def generate(self, prompt):
+        return "".join(self.submit(prompt))
+
+    def stream(self, prompt):
+        yield from self.submit(prompt)
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            streamer = BatchStreamer(self.generator.tokenizer, batch)
+            start = time.perf_counter()
+            try:
+                answers = self.generator.generate([request.prompt for request in batch], streamer=streamer)
+            except Exception as e:
+                for request in batch:
+                    request.finish(e)
+                continue
+            self.stats["generate_seconds"] += time.perf_counter() - start
+            self.stats["prompts"] += len(batch)
+            self.stats["batches"] += 1
+            self.stats["max_batch"] = max(self.stats["max_batch"], len(batch))
+            for i, (request, answer) in enumerate(zip(batch, answers)):
+                # Beam search does not stream: the whole answer is sent now
+                if streamer.sent[i] == 0 and not streamer.tokens[i]:
+                    request.pieces.put(answer)
+                request.finish()
@@ -1,30 +1,18 @@
 # test_query.py
+# Run from the project root: python -m unstructured.test_query
 
-import faiss
-import pickle
-from sentence_transformers import SentenceTransformer
-import numpy as np
+from .retriever import Retriever
 
-# Load the FAISS index
-index = faiss.read_index("data/faiss_index/company_docs.index")
+# Open the live index snapshot
+retriever = Retriever("data/faiss_index")
 
-# Load metadata
-with open("data/faiss_index/company_docs.pkl", "rb") as f:
-    data = pickle.load(f)
-    texts = data["texts"]
-    metadata = data["metadata"]
-
-# Embed a sample query
+# Search with a sample query
 query = "What is FatRat?"
-model = SentenceTransformer("all-MiniLM-L6-v2")
-query_embedding = model.encode([query]).astype("float32")
-
-# Search
 k = 3
-distances, indices = index.search(query_embedding, k)
+results = retriever.retrieve(query, k=k)
 
-for i, idx in enumerate(indices[0]):
+for i, r in enumerate(results):
     print(f"\n🔹 Result {i+1}")
-    print(f"📄 Source: {metadata[idx]['source']}")
-    print(f"🧠 Chunk: {texts[idx]}")
-    print(f"📏 Distance: {distances[0][i]}")
+    print(f"📄 Source: {r['source']}")
+    print(f"🧠 Chunk: {r['text']}")
+    print(f"📏 Distance: {r['distance']}")
@@ -0,0 +1,146 @@
+# text_splitter.py
+
+# ==== CONFIG ====
+SEPARATORS = ["\n\n", "\n", ".", " ", ""]  # priority of where to split
+# ================
+
+
+class RecursiveTextSplitter:
+    """
+    Recursive character splitter with the same output as LangChain's
+    RecursiveCharacterTextSplitter (separators kept at the start of the
+    following piece, chunks whitespace-stripped, empty chunks dropped).
+
+    Text is split on the first separator it contains; pieces shorter than
+    chunk_size are merged into chunks with up to chunk_overlap of overlap,
+    and longer pieces are split again with the remaining separators.
+
+    Everything works on (start, end) offsets into the original string, so
+    no intermediate pieces are built or concatenated; only the final
+    chunks are sliced out. length_function(text, start, end) measures a
+    span (characters by default, see token_length_function()).
+    """
+
+    def __init__(self, chunk_size=500, chunk_overlap=50, separators=None, length_function=None):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.separators = separators or SEPARATORS
+        self.length_function = length_function or _char_length
+
+    def split_text(self, text):
+        return [text[start:end] for start, end in self.split_spans(text)]
+
+    def split_spans(self, text, start=0, end=None):
+        """(start, end) offsets of the chunks of text[start:end]; text[start:end] of each is a chunk."""
+        end = len(text) if end is None else end
+        return self._split(text, start, end, self.separators)
+
+    def _split(self, text, start, end, separators):
+        # First separator present in the span; "" (split into characters) always matches
+        separator, rest = separators[-1], []
+        for i, sep in enumerate(separators):
+            if not sep:
+                separator = sep
+                break
+            if text.find(sep, start, end) != -1:
+                separator, rest = sep, separators[i + 1:]
+                break
+
+        if not separator and self.length_function is _char_length and self.chunk_size > 1:
+            return self._split_characters(text, start, end)
+
+        measure = self.length_function
+        chunks, good, good_lengths = [], [], []
+        for piece in _pieces(text, start, end, separator):
+            length = measure(text, *piece)
+            if length < self.chunk_size:
+                good.append(piece)
+                good_lengths.append(length)
+                continue
+            if good:
+                chunks.extend(self._merge(text, good, good_lengths))
+                good, good_lengths = [], []
+            if rest:
+                chunks.extend(self._split(text, piece[0], piece[1], rest))
+            else:
+                chunks.append(piece)
+        if good:
+            chunks.extend(self._merge(text, good, good_lengths))
+        return chunks
+
+    def _merge(self, text, pieces, lengths):
+        """Merges consecutive pieces into chunks of at most chunk_size, keeping up to chunk_overlap."""
+        # Separators stay on the pieces, so pieces are joined with "" (a zero-length separator)
+        # and pieces[first:i] is one contiguous span of the text.
+        sep_len = self.length_function("", 0, 0)
+        size, overlap = self.chunk_size, self.chunk_overlap
+        chunks, first, total = [], 0, 0
+        for i, length in enumerate(lengths):
+            if i > first and total + length + sep_len > size:
+                span = _strip(text, pieces[first][0], pieces[i - 1][1])
+                if span:
+                    chunks.append(span)
+                while total > overlap or (total + length + (sep_len if i > first else 0) > size and total > 0):
+                    total -= lengths[first] + (sep_len if i - first > 1 else 0)
+                    first += 1
+            total += length + (sep_len if i > first else 0)
+        span = _strip(text, pieces[first][0], pieces[-1][1]) if first < len(pieces) else None
+        if span:
+            chunks.append(span)
+        return chunks
+
+    def _split_characters(self, text, start, end):
+        """
+        _merge() of single characters in closed form: windows of chunk_size
+        characters, each starting chunk_size - overlap after the previous one.
+        """
+        step = self.chunk_size - min(self.chunk_overlap, self.chunk_size - 1)
+        chunks, pos = [], start
+        while pos < end:
+            span = _strip(text, pos, min(pos + self.chunk_size, end))
+            if span:
+                chunks.append(span)
+            if pos + self.chunk_size >= end:
+                break
+            pos += step
+        return chunks
+
+
+def _char_length(text, start, end):
+    return end - start
+
+
+def _pieces(text, start, end, separator):
+    """Non-empty pieces of text[start:end] split on separator, each starting with its separator."""
+    if not separator:
+        return [(i, i + 1) for i in range(start, end)]
+    pieces, piece_start = [], start
+    pos = text.find(separator, start, end)
+    while pos != -1:
+        if pos > piece_start:
+            pieces.append((piece_start, pos))
+        piece_start = pos
+        pos = text.find(separator, pos + len(separator), end)
+    if end > piece_start:
+        pieces.append((piece_start, end))
+    return pieces
+
+
+def _strip(text, start, end):
+    """Span of text[start:end].strip(), or None when it is all whitespace."""
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return (start, end) if end > start else None
+
+
+def token_length_function(tokenizer):
+    """Measures spans in tokenizer tokens (without special tokens) instead of characters."""
+    def length(text, start, end):
+        if start == end:
+            return 0
+        return len(tokenizer.encode(text[start:end], add_special_tokens=False))
+    return length
@@ -1,46 +1,50 @@
 # vector_store_builder.py
+# Run from the project root: python -m unstructured.vector_store_builder [--workers N]
 
+import argparse
 import os
-from ingest import extract_text
-from embedder import chunk_text, embed_chunks, save_to_faiss
+from .pipeline import EMBED_BATCH_SIZE, WORKERS, build_vector_store
+from .model_registry import registry_stats
+from .index_factory import INDEX_KIND, INDEX_KINDS, STORAGE, STORAGES
+from common import tracing
 
 DOCS_FOLDER = "data/documents"
-FAISS_PATH = "data/faiss_index/company_docs.index"
-META_PATH = "data/faiss_index/company_docs.pkl"
-
-all_embeddings = []
-all_texts = []
-all_metadata = []
-
-for filename in os.listdir(DOCS_FOLDER):
-    file_path = os.path.join(DOCS_FOLDER, filename)
-
-    if not os.path.isfile(file_path):
-        continue  # skip non-files
-
-    print(f"🔍 Processing {filename}...")
-    try:
-        text = extract_text(file_path)
-        chunks = chunk_text(text)
-        embeddings, chunk_texts = embed_chunks(chunks)
-
-        # Attach metadata (e.g. filename)
-        metadata = [{"source": filename} for _ in chunk_texts]
-
-        all_embeddings.extend(embeddings)
-        all_texts.extend(chunk_texts)
-        all_metadata.extend(metadata)
-
-    except Exception as e:
-        print(f"❌ Failed to process {filename}: {e}")
-
-# Save all embeddings to one FAISS index
-save_to_faiss(
-    all_embeddings,
-    all_texts,
-    faiss_path=FAISS_PATH,
-    metadata_path=META_PATH,
-    metadata=all_metadata
-)
-
-print("✅ Vector DB created with all documents.")
+INDEX_ROOT = "data/faiss_index"  # snapshots are published under INDEX_ROOT/snapshots
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild the vector DB from every file in DOCS_FOLDER.")
+    parser.add_argument("--workers", type=int, default=WORKERS, help="extract/chunk worker processes")
+    parser.add_argument("--max-pending", type=int, default=None,
+                        help="max documents parsed but not yet embedded (bounds peak memory)")
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE, help="chunks per embedding batch")
+    parser.add_argument("--index-kind", default=INDEX_KIND, choices=("auto",) + INDEX_KINDS,
+                        help="FAISS index type; 'auto' picks one from the chunk count")
+    parser.add_argument("--storage", default=STORAGE, choices=STORAGES,
+                        help="vector codes in the index: float32, fp16/int8 (scalar quantized) or pq")
+    args = parser.parse_args()
+
+    file_paths = [
+        os.path.join(DOCS_FOLDER, f) for f in sorted(os.listdir(DOCS_FOLDER))
+        if os.path.isfile(os.path.join(DOCS_FOLDER, f))  # skip non-files
+    ]
+
+    stats = build_vector_store(
+        file_paths,
+        root=INDEX_ROOT,
+        workers=args.workers,
+        max_pending=args.max_pending,
+        batch_size=args.batch_size,
+        index_kind=args.index_kind,
+        storage=args.storage,
+    )
+
+    print(f"📊 Build stats: {stats}")
+    print(f"📊 Embedding stats: {registry_stats()}")
+    if tracing.write_metrics():
+        print(f"📈 Metrics written to {tracing.METRICS_FILE}")
+    print("✅ Vector DB created with all documents.")
+
+
+if __name__ == "__main__":
+    main()
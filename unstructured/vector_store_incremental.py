@@ -1,90 +1,224 @@
 # vector_store_incremental.py
+# Run from the project root: python -m unstructured.vector_store_incremental
 
 import os
-import pickle
+import shutil
 import faiss
 import numpy as np
-from .ingest import extract_text
-from .embedder import chunk_text, embed_chunks
+from .embedder import chunk_document, embed_chunks
+from .chunk_store import ChunkStore
+from .index_factory import STORAGE, build_index, index_kind, index_storage, remove_ids
+from .lexical_index import build_lexical_index
+from .manifest import (
+    file_fingerprint, ids_to_ranges, is_unchanged, live_ids, manifest_from_store, ranges_to_ids,
+)
+from .model_registry import EMBED_MODEL
+from .snapshots import INDEX_ROOT, SnapshotWriter, current_version, migrate_legacy_layout
+from common import tracing
 
 # ==== CONFIG ====
 DOCS_FOLDER = "data/documents"  # folder with all your PDFs/DOCs
-FAISS_PATH = "data/faiss_index/company_docs.index"
-META_PATH = "data/faiss_index/company_docs.pkl"
+COMPACT_DEAD_FRACTION = 0.25    # compact once this share of stored chunks belongs to removed files
+COMPACT_BATCH = 8192            # rows copied per step while compacting
 # ================
 
-# Load existing FAISS index & metadata if they exist
-if os.path.exists(FAISS_PATH) and os.path.exists(META_PATH):
-    print("📂 Loading existing FAISS index...")
-    index = faiss.read_index(FAISS_PATH)
-
-    with open(META_PATH, "rb") as f:
-        meta_data = pickle.load(f)
-    all_texts = meta_data["texts"]
-    all_metadata = meta_data["metadata"]
-
-    processed_files = {m["source"] for m in all_metadata if "source" in m}
-else:
-    print("🆕 No existing index found. Creating a new one...")
-    index = None
-    all_texts = []
-    all_metadata = []
-    processed_files = set()
-
-# Go through documents and find unprocessed ones
-new_files = [
-    f for f in os.listdir(DOCS_FOLDER)
-    if os.path.isfile(os.path.join(DOCS_FOLDER, f)) and f not in processed_files
-]
-
-if not new_files:
-    print("✅ No new documents to process.")
-else:
-    print(f"📄 Found {len(new_files)} new document(s) to process: {new_files}")
-
-    all_new_embeddings = []
-    all_new_texts = []
-    all_new_metadata = []
-
-    for filename in new_files:
-        file_path = os.path.join(DOCS_FOLDER, filename)
-        try:
-            print(f"🔍 Processing {filename}...")
-            text = extract_text(file_path)
-            chunks = chunk_text(text)
-            embeddings, chunk_texts = embed_chunks(chunks)
 
-            # Attach metadata
-            metadata = [{"source": filename} for _ in chunk_texts]
 
-            all_new_embeddings.extend(embeddings)
-            all_new_texts.extend(chunk_texts)
-            all_new_metadata.extend(metadata)
+def scan_documents(docs_folder, manifest):
+    """
+    Compares the documents folder with the manifest.
+
+    Returns:
+        (new, modified, deleted): lists of filenames.
+    """
+    on_disk = sorted(
+        f for f in os.listdir(docs_folder) if os.path.isfile(os.path.join(docs_folder, f))
+    )
+    known = manifest["files"]
+    new = [f for f in on_disk if f not in known]
+    modified = [f for f in on_disk if f in known and not is_unchanged(os.path.join(docs_folder, f), known[f])]
+    deleted = sorted(set(known) - set(on_disk))
+    return new, modified, deleted
+
+
+def compact(store, manifest, index_kind="auto", storage=STORAGE):
+    """
+    Rewrites the chunk store with only live chunks and rebuilds the index
+    from their stored vectors. Ids are renumbered, so the manifest ranges
+    are remapped in place.
+
+    Returns:
+        (store, index): the compacted store and its new index.
+    """
+    keep = live_ids(manifest)
+    tmp_path = store.path + ".compacting"
+    if os.path.exists(tmp_path):
+        shutil.rmtree(tmp_path)
+    new_store = ChunkStore(tmp_path)
+    vectors = store.vectors()
+    for start in range(0, len(keep), COMPACT_BATCH):
+        ids = keep[start:start + COMPACT_BATCH]
+        rows = store.get(ids)
+        new_store.append([t for t, _ in rows], [m for _, m in rows], vectors=vectors[ids])
+
+    # old id -> new id is the rank of the old id among the kept ids
+    for entry in manifest["files"].values():
+        entry["ids"] = ids_to_ranges(np.searchsorted(keep, ranges_to_ids(entry["ids"])))
+
+    dim = store.dim
+    store.close()
+    new_store.close()
+    shutil.rmtree(store.path)
+    os.replace(tmp_path, store.path)
+    store = ChunkStore(store.path)
+    if len(store):
+        index = build_index(store.vectors(), kind=index_kind, storage=storage)
+    else:
+        index = faiss.IndexIDMap(faiss.IndexFlatL2(dim))  # every document was deleted
+    print(f"🧹 Compacted store to {len(store)} live chunks")
+    return store, index
+
+
+def update_index(docs_folder=DOCS_FOLDER, root=INDEX_ROOT, on_progress=None):
+    """
+    Brings the index in line with docs_folder: indexes new and edited files,
+    drops the vectors of edited and deleted files, and compacts once enough
+    dead chunks pile up. Work is proportional to the changed files only.
+
+    Changes are written to a new snapshot derived from the live one and
+    published atomically, so running retrievers switch over only once the
+    update is complete.
+
+    on_progress(filename, state) is called as each changed document moves
+    through "extracting", "embedding", "indexed", "removed" or "failed".
+
+    Returns:
+        dict: counts of new, modified, deleted files and chunks added, plus the published snapshot.
+    """
+    if current_version(root) is None:
+        migrate_legacy_layout(root)
+
+    writer = SnapshotWriter(root)
+    try:
+        stats = _apply_changes(writer, docs_folder, on_progress or (lambda filename, state: None))
+    except BaseException:
+        writer.abort()
+        raise
+    if stats["snapshot"] is None:
+        writer.abort()
+    return stats
+
+
+def _apply_changes(writer, docs_folder, on_progress):
+    manifest = writer.manifest
+    if manifest.get("embed_model", EMBED_MODEL) != EMBED_MODEL:
+        raise ValueError(f"Live snapshot was embedded with {manifest['embed_model']}, not {EMBED_MODEL}; "
+                         "run vector_store_builder for a full rebuild")
+
+    # Chunk store of the new snapshot (memory-mapped, nothing is loaded up front)
+    store = writer.open_store()
+    lexical = writer.open_lexical()
+    index = writer.read_index()
+    if index is not None:
+        print("📂 Loading existing FAISS index...")
+    else:
+        print("🆕 No existing index found. Creating a new one...")
+
+    if index is not None and "files" not in manifest:
+        manifest["files"] = manifest_from_store(store, docs_folder)["files"]
+
+    upgraded = compacted = False
+    if index is not None and not isinstance(faiss.downcast_index(index), faiss.IndexIDMap):
+        # Index from before stable chunk ids: rebuild it from the stored vectors once
+        if store.vectors() is None:
+            raise ValueError("Index has no chunk ids and the store has no vectors; run vector_store_builder")
+        store, index = compact(store, manifest, index_kind=index_kind(index), storage=index_storage(index))
+        upgraded = compacted = True
+
+    new, modified, deleted = scan_documents(docs_folder, manifest)
+    stats = {"new": len(new), "modified": len(modified), "deleted": len(deleted),
+             "added_chunks": 0, "snapshot": None}
+    if not (new or modified or deleted):
+        print("✅ No new, modified or deleted documents.")
+        if upgraded:
+            build_lexical_index(writer.lexical_path, store)
+            store.close()
+            writer.write_index(index)
+            stats["snapshot"] = writer.commit()
+        return stats
+    print(f"📄 New: {new}  ✏️ Modified: {modified}  🗑 Deleted: {deleted}")
+
+    # Extract and chunk new + edited files
+    new_texts, new_metadata, per_file = [], [], []
+    for filename in new + modified:
+        file_path = os.path.join(docs_folder, filename)
+        try:
+            print(f"🔍 Processing {filename}...")
+            on_progress(filename, "extracting")
+            chunks, chunk_metadata = chunk_document(file_path)
+            per_file.append((filename, file_fingerprint(file_path), len(chunks)))
+            new_texts.extend(chunks)
+            new_metadata.extend({"source": filename, **m} for m in chunk_metadata)
         except Exception as e:
             print(f"❌ Failed to process {filename}: {e}")
-
-    # Update FAISS index
-    if all_new_embeddings:
-        new_embeddings_np = np.array(all_new_embeddings).astype("float32")
+            on_progress(filename, "failed")
+
+    # Drop the chunks of deleted files, and of edited files whose new chunks were produced;
+    # an edited file that failed to extract keeps its old chunks (and is retried next update)
+    replaced = {filename for filename, _, _ in per_file}
+    stale = [ranges_to_ids(manifest["files"].pop(f)["ids"]) for f in deleted + [f for f in modified if f in replaced]]
+    stale = np.concatenate(stale) if stale else np.empty(0, dtype="int64")
+    needs_rebuild = index is not None and not remove_ids(index, stale)
+    for filename in deleted:
+        on_progress(filename, "removed")
+
+    next_id = len(store)
+    if new_texts:
+        for filename, _, _ in per_file:
+            on_progress(filename, "embedding")
+        # One cross-document embedding pass; unchanged chunks of edited files hit the embedding cache
+        new_embeddings_np, _ = embed_chunks(new_texts)
+
+        # Append only the new chunks to the store (existing rows are untouched)
+        next_id = store.append(new_texts, new_metadata, vectors=new_embeddings_np)
+        if lexical is not None and not compacted:
+            lexical.add(new_texts, next_id)
+        new_ids = np.arange(next_id, next_id + len(new_texts), dtype="int64")
 
         if index is None:
-            # Create new FAISS index
-            dim = len(new_embeddings_np[0])
-            index = faiss.IndexFlatL2(dim)
-
-        index.add(new_embeddings_np)
-
-        # Append new data to metadata lists
-        all_texts.extend(all_new_texts)
-        all_metadata.extend(all_new_metadata)
+            # Create new FAISS index (type chosen from the corpus size)
+            index = build_index(new_embeddings_np, ids=new_ids)
+        elif not needs_rebuild:
+            index.add_with_ids(new_embeddings_np, new_ids)
+        stats["added_chunks"] = len(new_texts)
 
-        # Save updated FAISS index
-        faiss.write_index(index, FAISS_PATH)
+    for filename, fingerprint, n_chunks in per_file:
+        manifest["files"][filename] = {**fingerprint, "ids": [[next_id, next_id + n_chunks]] if n_chunks else []}
+        next_id += n_chunks
 
-        # Save updated metadata
-        with open(META_PATH, "wb") as f:
-            pickle.dump({"texts": all_texts, "metadata": all_metadata}, f)
-
-        print(f"✅ Added {len(all_new_texts)} new chunks to the index.")
-    else:
+    if index is None:
         print("⚠ No new embeddings generated.")
+        return stats
+
+    # Reclaim space once enough chunks belong to removed files (or the index cannot delete in place)
+    n_live = len(live_ids(manifest))
+    if needs_rebuild or (len(store) and 1 - n_live / len(store) > COMPACT_DEAD_FRACTION):
+        # Keep the index kind (hnsw, ivf_*) and its fp16/int8/pq codes
+        store, index = compact(store, manifest, index_kind=index_kind(index), storage=index_storage(index))
+        compacted = True
+    if compacted or lexical is None:
+        # Row ids changed (or the snapshot predates lexical search): index every row again
+        build_lexical_index(writer.lexical_path, store)
+    store.close()
+
+    writer.write_index(index)
+    stats["snapshot"] = writer.commit()
+    for filename, _, _ in per_file:
+        on_progress(filename, "indexed")
+    print(f"✅ Added {stats['added_chunks']} chunks, removed {len(stale)} stale chunks.")
+    return stats
+
+
+if __name__ == "__main__":
+    update_index()
+    tracing.write_metrics()  # RAG_METRICS_FILE, e.g. for a node_exporter textfile collector